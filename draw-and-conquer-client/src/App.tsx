@@ -13,6 +13,9 @@ const MATCH_MAKING_HOST: String = process.env.REACT_APP_MATCH_MAKING_HOST ? proc
 const MATCH_MAKING_PORT: String = process.env.REACT_APP_MATCH_MAKING_PORT ? process.env.REACT_APP_MATCH_MAKING_PORT : '9437'
 const GAME_HOST: String = process.env.REACT_APP_GAME_HOST ? process.env.REACT_APP_GAME_HOST : 'localhost'
 const GAME_PORT: String = process.env.REACT_APP_GAME_PORT ? process.env.REACT_APP_GAME_PORT : '9438'
+// The paths select the server when both run on a single port; separate servers accept any path
+const MATCH_MAKING_URL: string = 'ws://' + MATCH_MAKING_HOST + ':' + MATCH_MAKING_PORT + '/matchmaker'
+const GAME_URL: string = 'ws://' + GAME_HOST + ':' + GAME_PORT + '/game'
 
 /**
  * Application 
@@ -24,6 +27,8 @@ export default function App(): React.JSX.Element {
   const [uuid] = useState(() => uuidv4());
   const matchMakingSocketRef = useRef<WebSocket | null>(null);
   const gameSocketRef = useRef<WebSocket | null>(null);
+  // Matchmaker connection the server moved into the game session, reused for the game
+  const carriedSocketRef = useRef<WebSocket | null>(null);
   const [state, setState] = useState<State>(State.QUEUE)
 
   /**
@@ -44,12 +49,32 @@ export default function App(): React.JSX.Element {
    */
   const [scoreboardData, setScoreboardData] = useState([])
 
+  /**
+   * Position in the matchmaking queue and estimated wait in seconds, from heartbeat replies
+   */
+  const [queuePosition, setQueuePosition] = useState<{position: number | null, estimatedWait: number | null}>({position: null, estimatedWait: null})
+
+  /**
+   * Counts matchmaker connections, so the queue sees a replaced socket
+   */
+  const [, setMatchMakingConnections] = useState(0)
+
+  /**
+   * Whether the finished game's players can still vote for a rematch
+   */
+  const [rematchOpen, setRematchOpen] = useState(false)
+
+  /**
+   * Whether this player has voted in the open rematch, which allows one vote
+   */
+  const [rematchVoted, setRematchVoted] = useState(false)
+
   /**
    * Determines the App's current view/UI
    */
   const body: () => React.JSX.Element = () => {
     if (state === State.QUEUE) 
-      return <Queue uuid={uuid} socket={matchMakingSocketRef.current} queueLength={game['numberOfPlayers']} />
+      return <Queue uuid={uuid} socket={matchMakingSocketRef.current} queueLength={game['numberOfPlayers']} queuePosition={queuePosition} />
 
     else if (state === State.GAME) 
        return <DenyAndConquerGame 
@@ -69,7 +94,7 @@ export default function App(): React.JSX.Element {
        />
 
     else if (state === State.SCOREBOARD) 
-      return <ScoreBoard players={scoreboardData} currentPlayerId={uuid} />
+      return <ScoreBoard players={scoreboardData} currentPlayerId={uuid} onRematch={rematchOpen ? requestRematch : undefined} rematchVoted={rematchVoted} />
     
     else 
       return <div style={{'display': 'block', 'margin': '50vw auto 0 auto'}}>404: Something went wrong!</div>
@@ -77,9 +102,10 @@ export default function App(): React.JSX.Element {
 
   /**
    * Handles matchmaking websocket connection with the server
+   * @param existing connection the server already queued this player on, instead of a new one
    */
-  function matchMakingSocketConnection() {
-    const ws = new WebSocket('ws://' + MATCH_MAKING_HOST + ':' + MATCH_MAKING_PORT)
+  function matchMakingSocketConnection(existing?: WebSocket) {
+    const ws = existing ?? new WebSocket(MATCH_MAKING_URL)
     matchMakingSocketRef.current = ws;
 
     ws.onmessage = (event: MessageEvent) => {
@@ -90,18 +116,36 @@ export default function App(): React.JSX.Element {
           const arr: string[] = Array(data.board_size).fill('#ffffff')
           setGame({...game, 'uuid': data.game_session_uuid, squares: arr, numberOfPlayers: data.lobby_size, boardSize: data.board_size})
           setState(State.GAME)
-          ws.close()
+          if (data.same_connection) {
+            // The server routes this connection to the game session from now on
+            carriedSocketRef.current = ws
+            matchMakingSocketRef.current = null
+          } else {
+            ws.close()
+          }
           break
         case 'heartbeat_timeout':
           console.log('heartbeat timed out!')
           break
+        case 'queue_length':
+          // Pushed by the server whenever the queue changes
+          setGame(prev => ({...prev, "numberOfPlayers": data.queue_length}))
+          break
+        case 'reconnect':
+          // The server is restarting; the new server holds our place in the queue
+          setTimeout(() => {
+            ws.close()
+            matchMakingSocketConnection()
+            setMatchMakingConnections(n => n + 1)
+          }, data.after * 1000)
+          break
       }
 
       switch (data.status) {
         case 'success':
           if (data.queue_length) {
-            //NOTE At the moment no other data is sent with success responses
             setGame({...game, "numberOfPlayers": data?.queue_length})
+            setQueuePosition({position: data.position ?? null, estimatedWait: data.estimated_wait ?? null})
             matchMakerHeartBeat()
           }
           break
@@ -120,16 +164,20 @@ export default function App(): React.JSX.Element {
    * Handles game websocket connection with the server
    */
   function gameSocketConnection() {
-    const ws = new WebSocket('ws://' + GAME_HOST + ':' + GAME_PORT)
+    const carried = carriedSocketRef.current
+    carriedSocketRef.current = null
+    const ws = carried ?? new WebSocket(GAME_URL)
     gameSocketRef.current = ws;
 
-    ws.onopen = () => {
+    const requestColour = () => {
       ws.send(JSON.stringify({
         'game_session_uuid': game.uuid,
         uuid,
         'command': 'pen_colour_request'
       }))
     }
+    if (carried) requestColour()
+    else ws.onopen = requestColour
 
     ws.onmessage = (event: MessageEvent) => {
       const data = JSON.parse(event.data)
@@ -168,8 +216,42 @@ export default function App(): React.JSX.Element {
             setScoreboardData(data.players)
           }
           setState(State.SCOREBOARD)
+          // Keep the connection open while a rematch can still be voted for
+          if (data.rematch_window) {
+            setRematchVoted(false)
+            setRematchOpen(true)
+          } else {
+            ws.close()
+          }
+          break
+        case 'rematch_start':
+          // Everyone accepted, the new game runs on this same connection
+          setRematchOpen(false)
+          setGame(prev => ({...prev, 'uuid': data.game_session_uuid, colour: '', players: {}, squares: Array(data.board_size).fill('#ffffff'), numberOfPlayers: data.lobby_size, boardSize: data.board_size}))
+          setState(State.GAME)
+          ws.send(JSON.stringify({
+            'game_session_uuid': data.game_session_uuid,
+            uuid,
+            'command': 'pen_colour_request'
+          }))
+          break
+        case 'rematch_cancelled':
+          setRematchOpen(false)
           ws.close()
           break
+        case 'requeued':
+          // Back to the matchmaking queue, where this player is queued first
+          setRematchOpen(false)
+          gameSocketRef.current = null
+          if (data.same_connection) {
+            // Already queued again on this connection, which now reaches the matchmaker
+            matchMakingSocketConnection(ws)
+          } else {
+            ws.close()
+            matchMakingSocketRef.current = null
+          }
+          setState(State.QUEUE)
+          break
         case 'scoreboard':
           setScoreboardData(data.players)
           console.log('scoreboard data', data.players)
@@ -183,6 +265,16 @@ export default function App(): React.JSX.Element {
     }
   }
 
+  function requestRematch(): void {
+    setRematchVoted(true)
+    gameSocketRef.current?.send(JSON.stringify({
+      'game_session_uuid': game.uuid,
+      uuid,
+      'command': 'rematch',
+      'accept': true
+    }))
+  }
+
   function matchMakerHeartBeat(): void {
     if (state === State.QUEUE) {
       setTimeout(() => {
@@ -191,7 +283,7 @@ export default function App(): React.JSX.Element {
           uuid,
           'command': 'queue_heartbeat'
         }))
-      }, 1000)
+      }, 10000)
     }
   }
 
@@ -3,10 +3,11 @@ import React, { useRef, useEffect, useState } from "react"
 type PlayerQueueDisplayProps = {
     playerName: string,
     queueLength: Number,
+    queuePosition: {position: number | null, estimatedWait: number | null},
     ready: boolean
 }
 
-export default function PlayerQueueDisplay({ playerName, queueLength, ready }: PlayerQueueDisplayProps): React.JSX.Element {
+export default function PlayerQueueDisplay({ playerName, queueLength, queuePosition, ready }: PlayerQueueDisplayProps): React.JSX.Element {
     const [searchingText, setSearchingText] = useState('Searching for other players')
 
     useEffect(() => {
@@ -30,5 +31,10 @@ export default function PlayerQueueDisplay({ playerName, queueLength, ready }: P
         <h3 style={{'marginTop': '32px'}}>
             {(queueLength && ready) ? queueLength.toString() + ' players are ready to play' : 'Click the button to queue for a game'} 
         </h3>
+        {(ready && queuePosition.position) ?
+            <p>
+                You are #{queuePosition.position}
+                {queuePosition.estimatedWait !== null ? ', estimated wait ' + Math.ceil(queuePosition.estimatedWait) + 's' : ''}
+            </p> : null}
     </div>)
 }
\ No newline at end of file
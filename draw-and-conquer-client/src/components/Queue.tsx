@@ -1,4 +1,4 @@
-import React, { useState } from "react"
+import React, { useEffect, useState } from "react"
 import NameInput from './NameInput'
 import PlayerQueueDisplay from './PlayerQueueDisplay'
 import ReadyButton from './ReadyButton'
@@ -6,14 +6,25 @@ import ReadyButton from './ReadyButton'
 type QueueProps = {
     uuid: string,
     socket: WebSocket | null,
-    queueLength: Number
+    queueLength: Number,
+    queuePosition: {position: number | null, estimatedWait: number | null}
 }
 
 export default function Queue(props: QueueProps): React.JSX.Element {
     const [ready, setReady] = useState<boolean>(false)
     const [playerName, setPlayerName] = useState<string>("")
     const [hasEnteredName, setHasEnteredName] = useState<boolean>(false)
-    const {uuid, socket, queueLength} = props
+    const {uuid, socket, queueLength, queuePosition} = props
+
+    // Rejoin the queue when the matchmaker connection is replaced after a server restart
+    useEffect(() => {
+        if (!ready || !socket) return
+        socket.addEventListener('open', () => socket.send(JSON.stringify({
+            uuid: uuid,
+            command: 'enqueue',
+            name: playerName
+        })), { once: true })
+    }, [socket])
 
     const handleNameSubmit = (name: string) => {
         setPlayerName(name);
@@ -47,7 +58,7 @@ export default function Queue(props: QueueProps): React.JSX.Element {
         return <NameInput onNameSubmit={handleNameSubmit} isVisible={true} />
     else
         return (<div>
-            <PlayerQueueDisplay playerName={playerName} queueLength={queueLength} ready={ready} />
+            <PlayerQueueDisplay playerName={playerName} queueLength={queueLength} queuePosition={queuePosition} ready={ready} />
             <ReadyButton ready={ready} toggleReady={toggleReady} />
         </div>)
 }
\ No newline at end of file
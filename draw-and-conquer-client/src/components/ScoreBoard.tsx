@@ -8,10 +8,14 @@ export type Player = {
 
 export type ScoreBoardProps = {
   players: Player[],
-  currentPlayerId: string
+  currentPlayerId: string,
+  // Votes for a rematch with the same players, while one is possible
+  onRematch?: () => void,
+  // Whether the player has already voted, which the server allows once
+  rematchVoted?: boolean
 }
 
-export default function ScoreBoard({ players, currentPlayerId }: ScoreBoardProps): React.JSX.Element {
+export default function ScoreBoard({ players, currentPlayerId, onRematch, rematchVoted = false }: ScoreBoardProps): React.JSX.Element {
   // Calculate total score as number of players squared
   const totalScore = players.length ** 2
   // Sort players by score descending
@@ -73,6 +77,7 @@ export default function ScoreBoard({ players, currentPlayerId }: ScoreBoardProps
         </table>
       </div>
       <div style={{'margin': 'auto'}}>
+        {onRematch && <button onClick={onRematch} disabled={rematchVoted}>Rematch</button>}
         <button onClick={() => window.location.reload()}>Play Again</button>
       </div>
     </div>
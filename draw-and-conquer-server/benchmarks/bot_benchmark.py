@@ -0,0 +1,97 @@
+"""
+Game logic load test driven by server-side bots.
+
+Creates game sessions filled entirely with bots in a GameServerState and
+lets one BotEngine thread play every game to the end (a win, or a full
+board without a winner) with no think or draw time, so the numbers show how many bot moves (pen downs and pen ups) the
+engine and the GameSession logic sustain on one thread. No sockets are
+involved; the bots' broadcasts have no recipients.
+
+Run from the draw-and-conquer-server directory:
+
+    python -m benchmarks.bot_benchmark
+"""
+
+import argparse
+import threading
+import time
+import uuid
+
+from bots import BotEngine
+from game_server import GameServerState
+
+
+def run(sessions: int, lobby_size: int, num_tiles: int, timeout: float) -> dict:
+    """
+    Play games with bots until every game has ended.
+
+    Args:
+        sessions (int): Number of concurrent games
+        lobby_size (int): Bots per game
+        num_tiles (int): Tiles per game
+        timeout (float): Seconds to wait for the games to end
+
+    Returns:
+        dict: Bots, games won, moves, elapsed seconds and moves per second
+    """
+    game_state = GameServerState()
+    engine = BotEngine(game_state, think_time=0, draw_time=0, seed=1)
+    for _ in range(sessions):
+        game_session_uuid = str(uuid.uuid4())
+        bot_names = engine.create_bot_ids(lobby_size)
+        game_state.create_game_session(
+            game_session_uuid, list(bot_names), bot_names, num_tiles, 60
+        )
+        engine.add_bots(game_state.get_game_session(game_session_uuid), list(bot_names))
+
+    started = time.perf_counter()
+    threading.Thread(target=engine.run, name="bots", daemon=True).start()
+    while engine.get_stats()["active_bots"] and time.perf_counter() - started < timeout:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - started
+
+    stats = engine.get_stats()
+    won = sum(1 for session in game_state.game_sessions.values() if session.game_ended)
+    return {
+        "bots": sessions * lobby_size,
+        "won": won,
+        "moves": stats["moves"],
+        "elapsed": elapsed,
+        "rate": stats["moves"] / elapsed,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "--sessions",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000],
+        help="Numbers of concurrent games",
+    )
+    parser.add_argument("--lobby-size", type=int, default=4, help="Bots per game")
+    parser.add_argument("--num-tiles", type=int, default=64, help="Tiles per game")
+    parser.add_argument(
+        "--timeout", type=float, default=60.0, help="Seconds to wait for games to end"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    print(f"{args.lobby_size} bots per game, {args.num_tiles} tiles")
+    print(f"{'games':>6} {'bots':>6} {'won':>6} {'moves':>9} {'s':>6} {'moves/s':>10}")
+    for sessions in args.sessions:
+        result = run(sessions, args.lobby_size, args.num_tiles, args.timeout)
+        print(
+            f"{sessions:>6} {result['bots']:>6} {result['won']:>6} "
+            f"{result['moves']:>9} {result['elapsed']:>6.2f} {result['rate']:>10,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Pen latency with and without the event log.
+
+Plays one game per client thread through game_server_request_handler:
+each thread's two players take turns sending pen_down and
+pen_up_tile_claimed for the next free tile, and the time of every request
+is measured, including JSON parsing and the broadcasts to fake sockets.
+This runs once without persistence and once with an EventLog in a
+temporary directory, whose background writer group-commits and fsyncs the
+lock and claim events while the requests run. The p99 difference is what
+persistence adds to pen latency; the target is under 50 µs.
+
+Run from the draw-and-conquer-server directory:
+
+    python -m benchmarks.event_log_benchmark
+"""
+
+import argparse
+import json
+import shutil
+import tempfile
+import threading
+import time
+from typing import List, Optional
+
+from event_log import EventLog
+from game_server import GameServerState, game_server_request_handler
+from replay import FakeSocket
+from server import WebSocketInterface
+
+
+class NullSocket(FakeSocket):
+    """
+    Fake socket that discards what is sent to it, so memory stays flat.
+    """
+
+    def sendall(self, data: bytes) -> None:
+        pass
+
+
+def percentile(samples: List[int], fraction: float) -> float:
+    """
+    Get a percentile of latency samples in microseconds.
+
+    Args:
+        samples (List[int]): Sorted latencies in nanoseconds
+        fraction (float): Percentile as a fraction, such as 0.99
+
+    Returns:
+        float: The percentile in microseconds
+    """
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))] / 1000
+
+
+def run(event_log: Optional[EventLog], threads: int, tiles: int) -> List[int]:
+    """
+    Measure pen request latency.
+
+    Args:
+        event_log (Optional[EventLog]): Started event log, or None for no persistence
+        threads (int): Number of concurrent games, one client thread each
+        tiles (int): Tiles claimed per game
+
+    Returns:
+        List[int]: Sorted request latencies in nanoseconds
+    """
+    state = GameServerState(event_log)
+    latencies: List[List[int]] = [[] for _ in range(threads)]
+    go = threading.Event()
+
+    def client(index: int) -> None:
+        game_session_uuid = f"game-{index}"
+        players = [f"{game_session_uuid}-a", f"{game_session_uuid}-b"]
+        # One tile more than the claims, so nobody reaches the winning count
+        state.create_game_session(
+            game_session_uuid,
+            list(players),
+            {player_id: player_id for player_id in players},
+            2 * tiles + 1,
+            60,
+        )
+        sockets = {player_id: WebSocketInterface(NullSocket()) for player_id in players}
+        addr = ("127.0.0.1", 40000 + index)
+
+        def request(player_id: str, **fields) -> str:
+            return json.dumps(
+                {"game_session_uuid": game_session_uuid, "uuid": player_id, **fields}
+            )
+
+        for player_id in players:
+            game_server_request_handler(
+                sockets[player_id],
+                addr,
+                request(player_id, command="pen_colour_request"),
+                state,
+            )
+
+        pen_requests = []
+        for tile_index in range(tiles):
+            player_id = players[tile_index % 2]
+            for command in ("pen_down", "pen_up_tile_claimed"):
+                pen_requests.append(
+                    (
+                        sockets[player_id],
+                        request(player_id, command=command, index=tile_index),
+                    )
+                )
+
+        samples = latencies[index]
+        go.wait()
+        for ws, message in pen_requests:
+            start = time.perf_counter_ns()
+            game_server_request_handler(ws, addr, message, state)
+            samples.append(time.perf_counter_ns() - start)
+
+    workers = [
+        threading.Thread(target=client, args=(index,), daemon=True)
+        for index in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    # Let every thread finish its setup before timing starts
+    time.sleep(0.2)
+    go.set()
+    for worker in workers:
+        worker.join()
+
+    return sorted(sample for samples in latencies for sample in samples)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        nargs="+",
+        default=[1, 8],
+        help="Numbers of concurrent games, one client thread each",
+    )
+    parser.add_argument(
+        "--tiles", type=int, default=5000, help="Tiles claimed per game"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    print(
+        f"{'threads':>7} {'p50 µs':>8} {'p99 µs':>8} "
+        f"{'logged p50':>11} {'logged p99':>11} {'added p99':>10}"
+    )
+    for threads in args.threads:
+        baseline = run(None, threads, args.tiles)
+
+        directory = tempfile.mkdtemp(prefix="event-log-benchmark-")
+        try:
+            event_log = EventLog(directory)
+            event_log.start()
+            logged = run(event_log, threads, args.tiles)
+            event_log.close()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        added = percentile(logged, 0.99) - percentile(baseline, 0.99)
+        print(
+            f"{threads:>7} {percentile(baseline, 0.5):>8.1f} "
+            f"{percentile(baseline, 0.99):>8.1f} {percentile(logged, 0.5):>11.1f} "
+            f"{percentile(logged, 0.99):>11.1f} {added:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Throughput benchmark for queue heartbeats in the matchmaker.
+
+Fills a MatchmakerState with queued players and has 1, 8 and 64 client
+threads send queue_heartbeat requests for random players as fast as they
+can through matchmaker_request_handler, including JSON parsing and the
+reply sent to a fake socket. This is compared with the original handler
+path of four locked calls (is_player_in_queue, heartbeat_player,
+get_queue_length and get_position). A watchdog thread scans the queue
+under the lock once per scan interval, as QueueWatchdog does, and a push
+thread takes the queue_length snapshot every push interval, as
+QueueLengthWatchdog does, so the locked path sees realistic contention
+and the handler serves positions cached by the pushes.
+
+Run from the draw-and-conquer-server directory:
+
+    python -m benchmarks.heartbeat_benchmark
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+
+import json_codec
+from matchmaker import MatchmakerState, matchmaker_request_handler
+from replay import FakeSocket
+from server import WebSocketInterface
+
+ADDR = ("127.0.0.1", 40000)
+
+
+class NullSocket(FakeSocket):
+    """
+    Fake socket that discards what is sent to it, so memory stays flat.
+    """
+
+    def sendall(self, data: bytes) -> None:
+        pass
+
+
+def locked_heartbeat(
+    state: MatchmakerState, ws: WebSocketInterface, request: str
+) -> None:
+    """
+    Heartbeat as matchmaker_request_handler originally handled it.
+    """
+    player_id = json_codec.decode(request)["uuid"]
+    if not state.is_player_in_queue(player_id):
+        raise ValueError("Player not in queue")
+    state.heartbeat_player(player_id)
+    queue_length = state.get_queue_length()
+    position, estimated_wait = state.get_position(player_id)
+    reply = {
+        "status": "success",
+        "queue_length": queue_length,
+        "position": position,
+        "estimated_wait": estimated_wait,
+    }
+    ws.send(json_codec.encode(reply))
+
+
+def handler_heartbeat(
+    state: MatchmakerState, ws: WebSocketInterface, request: str
+) -> None:
+    """
+    Heartbeat through the request handler and its lock-free fast path.
+    """
+    matchmaker_request_handler(ws, ADDR, request, state)
+
+
+def run(
+    heartbeat,
+    state: MatchmakerState,
+    threads: int,
+    duration: float,
+    scan: float,
+    push: float,
+) -> float:
+    """
+    Measure heartbeat throughput.
+
+    Args:
+        heartbeat: Heartbeat function to call
+        state (MatchmakerState): Populated matchmaker state
+        threads (int): Number of concurrent client threads
+        duration (float): Seconds to run for
+        scan (float): Seconds between watchdog scans of the queue
+        push (float): Seconds between queue_length snapshots
+
+    Returns:
+        float: Heartbeats per second across all threads
+    """
+    player_ids = list(state.matchmaking_queue)
+    counts = [0] * threads
+    go = threading.Event()
+    stop = threading.Event()
+
+    def client(index: int) -> None:
+        rng = random.Random(index)
+        ids = rng.sample(player_ids, min(len(player_ids), 64))
+        requests = [
+            json.dumps({"uuid": player_id, "command": "queue_heartbeat"})
+            for player_id in ids
+        ]
+        ws = WebSocketInterface(NullSocket())
+        done = 0
+        go.wait()
+        while not stop.is_set():
+            for request in requests:
+                heartbeat(state, ws, request)
+            done += len(requests)
+        counts[index] = done
+
+    def watchdog() -> None:
+        while not stop.wait(scan):
+            now = time.time()
+            with state.lock:
+                for player_id in list(state.matchmaking_queue):
+                    now - state.player_last_heartbeat[player_id].last
+
+    def pusher() -> None:
+        while not stop.wait(push):
+            state.get_queue_snapshot()
+
+    workers = [threading.Thread(target=client, args=(i,)) for i in range(threads)]
+    workers.append(threading.Thread(target=watchdog))
+    workers.append(threading.Thread(target=pusher))
+    # Start every thread before any of them runs, or starting the rest would
+    # have to compete for the GIL with the threads already spinning
+    for worker in workers:
+        worker.start()
+    started = time.perf_counter()
+    go.set()
+    time.sleep(duration)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    return sum(counts) / (time.perf_counter() - started)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "--players", type=int, default=20000, help="Players in the queue"
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        nargs="+",
+        default=[1, 8, 64],
+        help="Numbers of concurrent client threads",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=3.0, help="Seconds per measurement"
+    )
+    parser.add_argument(
+        "--scan-interval",
+        type=float,
+        default=1.0,
+        help="Seconds between watchdog scans of the queue",
+    )
+    parser.add_argument(
+        "--push-interval",
+        type=float,
+        default=0.25,
+        help="Seconds between queue_length snapshots",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    state = MatchmakerState(lobby_size=3, heartbeat_timeout=30)
+    for i in range(args.players):
+        state.enqueue_player(str(uuid.uuid4()), f"Player {i}", object())
+    state.get_queue_snapshot()
+
+    print(f"{args.players} queued players")
+    print(f"{'threads':>7} {'locked /s':>12} {'handler /s':>11} {'speedup':>8}")
+    for threads in args.threads:
+        locked, handler = (
+            run(
+                heartbeat,
+                state,
+                threads,
+                args.duration,
+                args.scan_interval,
+                args.push_interval,
+            )
+            for heartbeat in (locked_heartbeat, handler_heartbeat)
+        )
+        print(
+            f"{threads:>7} {locked:>12,.0f} {handler:>11,.0f} {handler / locked:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
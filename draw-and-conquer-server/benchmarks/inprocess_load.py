@@ -0,0 +1,286 @@
+"""
+In-process load test of the full server over in-memory pipes.
+
+Starts a matchmaker and a game TCPServer on PipeListeners, so connections,
+handshakes, framing, request handlers and disconnect handlers all run as in
+production but without ports, certificates or kernel round trips. Every
+player is a client thread: it connects to the matchmaker, enqueues, waits
+for game_start, connects to the game server and requests a colour. The
+QueueWatchdog and GameSessionWatchdog are ticked from one driver thread
+every --tick seconds instead of once a second. Once every game is running,
+the players press pen down and lift the pen on random tiles, always waiting
+for the reply, and the test reports requests sent and messages received
+(replies and broadcasts) per second. Pen ups never claim, so games run for
+the whole measurement. With --trace-file the players' way into their games
+is traced as on a production server, and the spans can be summarized with
+tracing.py.
+
+Run from the draw-and-conquer-server directory:
+
+    python -m benchmarks.inprocess_load --players 64 256
+    python -m benchmarks.inprocess_load --players 256 --trace-file /tmp/trace.jsonl
+    python tracing.py /tmp/trace.jsonl
+"""
+
+import argparse
+import logging
+import random
+import threading
+import time
+import uuid
+from typing import Optional
+
+import json_codec
+from game_server import (
+    GameServerState,
+    game_server_disconnect_handler,
+    game_server_request_handler,
+)
+from matchmaker import (
+    MatchmakerState,
+    matchmaker_disconnect_handler,
+    matchmaker_request_handler,
+)
+from server import TCPServer, WebSocketInterface
+from tracing import MatchTracer
+from transport import PipeListener
+from watchdog import GameSessionWatchdog, QueueWatchdog
+
+
+def start_server(
+    port: int, request_handler, server_state, disconnect_handler, connections: int
+) -> PipeListener:
+    """
+    Start a TCPServer accepting in-memory connections.
+
+    Args:
+        port (int): Port number, only used to name the server's threads
+        request_handler: Request handler of the server
+        server_state: Shared state of the server
+        disconnect_handler: Disconnect handler of the server
+        connections (int): Connection limit, overall and per address
+
+    Returns:
+        PipeListener: Listener clients connect through
+    """
+    server = TCPServer(
+        host="127.0.0.1",
+        port=port,
+        request_handler=request_handler,
+        server_state=server_state,
+        disconnect_handler=disconnect_handler,
+        max_connections=connections,
+        max_connections_per_ip=connections,
+        tls=False,
+    )
+    server.listener = PipeListener()
+    threading.Thread(target=server.start, name=f"accept-{port}", daemon=True).start()
+    return server.listener
+
+
+def open_websocket(listener: PipeListener) -> WebSocketInterface:
+    """
+    Connect to a server over a pipe and perform the WebSocket handshake.
+
+    Args:
+        listener (PipeListener): The server's listener
+
+    Returns:
+        WebSocketInterface: The client's end of the connection
+    """
+    ws = WebSocketInterface(listener.connect())
+    if not ws.connect():
+        raise ConnectionError("WebSocket handshake failed")
+    return ws
+
+
+def run(
+    players: int,
+    lobby_size: int,
+    num_tiles: int,
+    tick: float,
+    duration: float,
+    tracer: Optional[MatchTracer] = None,
+):
+    """
+    Matchmake players into games over pipes, then measure play.
+
+    Args:
+        players (int): Number of players, a multiple of the lobby size
+        lobby_size (int): Players per game
+        num_tiles (int): Tiles per game
+        tick (float): Seconds between watchdog ticks
+        duration (float): Seconds of play to measure
+        tracer (Optional[MatchTracer]): Tracer of the players' way into games
+
+    Returns:
+        dict: Matchmaking seconds, requests and messages per second
+    """
+    matchmaker_state = MatchmakerState(lobby_size, heartbeat_timeout=60, tracer=tracer)
+    game_state = GameServerState(tracer=tracer)
+    matchmaker_listener = start_server(
+        1,
+        matchmaker_request_handler,
+        matchmaker_state,
+        matchmaker_disconnect_handler,
+        2 * players,
+    )
+    game_listener = start_server(
+        2,
+        game_server_request_handler,
+        game_state,
+        game_server_disconnect_handler,
+        2 * players,
+    )
+    queue_watchdog = QueueWatchdog(matchmaker_state, game_state, num_tiles, 60)
+    game_watchdog = GameSessionWatchdog(game_state)
+
+    ready = threading.Barrier(players + 1)
+    finished = threading.Barrier(players)
+    go = threading.Event()
+    stop = threading.Event()
+    requests = [0] * players
+    received = [0] * players
+
+    def player(index: int) -> None:
+        rng = random.Random(index)
+        player_id = str(uuid.uuid4())
+
+        ws = open_websocket(matchmaker_listener)
+        ws.send(
+            json_codec.encode(
+                {"command": "enqueue", "uuid": player_id, "name": f"Player {index}"}
+            )
+        )
+        while True:
+            message = json_codec.decode(ws.receive())
+            if message.get("command") == "game_start":
+                break
+        ws.close()
+        game_session_uuid = message["game_session_uuid"]
+
+        ws = open_websocket(game_listener)
+        ws.send(
+            json_codec.encode(
+                {
+                    "command": "pen_colour_request",
+                    "game_session_uuid": game_session_uuid,
+                    "uuid": player_id,
+                }
+            )
+        )
+        while json_codec.decode(ws.receive()).get("command") != "current_players":
+            pass
+        ready.wait()
+
+        go.wait()
+        while not stop.is_set():
+            tile_index = rng.randrange(num_tiles)
+            for command in ("pen_down", "pen_up_tile_not_claimed"):
+                ws.send(
+                    json_codec.encode(
+                        {
+                            "command": command,
+                            "game_session_uuid": game_session_uuid,
+                            "uuid": player_id,
+                            "index": tile_index,
+                        }
+                    )
+                )
+                requests[index] += 1
+                # Broadcasts may arrive before the reply, which has no command
+                while True:
+                    received[index] += 1
+                    if "command" not in json_codec.decode(ws.receive()):
+                        break
+        # Closing ends games with too few players left, so wait for the others
+        finished.wait()
+        ws.close()
+
+    def drive_watchdogs() -> None:
+        while not stop.is_set():
+            queue_watchdog.tick()
+            game_watchdog.tick()
+            time.sleep(tick)
+
+    started = time.perf_counter()
+    for index in range(players):
+        threading.Thread(
+            target=player, args=(index,), name=f"player-{index}", daemon=True
+        ).start()
+    threading.Thread(target=drive_watchdogs, name="watchdogs", daemon=True).start()
+    ready.wait()
+    matchmaking = time.perf_counter() - started
+
+    started = time.perf_counter()
+    go.set()
+    time.sleep(duration)
+    stop.set()
+    elapsed = time.perf_counter() - started
+    return {
+        "matchmaking": matchmaking,
+        "requests": sum(requests) / elapsed,
+        "messages": sum(received) / elapsed,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "--players",
+        type=int,
+        nargs="+",
+        default=[16, 64, 256],
+        help="Numbers of players, each a multiple of the lobby size",
+    )
+    parser.add_argument("--lobby-size", type=int, default=4, help="Players per game")
+    parser.add_argument("--num-tiles", type=int, default=256, help="Tiles per game")
+    parser.add_argument(
+        "--tick", type=float, default=0.01, help="Seconds between watchdog ticks"
+    )
+    parser.add_argument(
+        "--duration", type=float, default=3.0, help="Seconds of play per measurement"
+    )
+    parser.add_argument(
+        "--trace-file",
+        type=str,
+        default=None,
+        help="JSONL file to write match start spans to (disabled if unset)",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    tracer = None
+    if args.trace_file:
+        tracer = MatchTracer(args.trace_file)
+        tracer.start()
+
+    print(f"{args.lobby_size} players per game, {args.num_tiles} tiles, no TLS")
+    print(
+        f"{'players':>7} {'games':>6} {'matchmaking s':>13} "
+        f"{'requests/s':>11} {'messages/s':>11}"
+    )
+    for players in args.players:
+        if players % args.lobby_size:
+            raise SystemExit(
+                f"{players} players do not fill lobbies of {args.lobby_size}"
+            )
+        result = run(
+            players, args.lobby_size, args.num_tiles, args.tick, args.duration, tracer
+        )
+        print(
+            f"{players:>7} {players // args.lobby_size:>6} "
+            f"{result['matchmaking']:>13.2f} {result['requests']:>11,.0f} "
+            f"{result['messages']:>11,.0f}"
+        )
+    if tracer is not None:
+        tracer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Encode/decode benchmark for the JSON codec backends.
+
+Times every backend in json_codec.BACKENDS on the messages the game server
+sends most: pen_down_broadcast (once per stroke, to every player),
+current_players (once per game, sized by the player count) and game_win
+(the final scoreboard). Also times the previous path, json.dumps followed by
+str.encode in WebSocketInterface.send, for comparison.
+
+Run from the draw-and-conquer-server directory:
+
+    python -m benchmarks.json_codec_benchmark
+"""
+
+import argparse
+import json
+import time
+import uuid
+from typing import Callable, Dict, List, Tuple
+
+import json_codec
+from game_server import generate_palette
+
+
+def make_messages(players: int) -> Dict[str, Dict]:
+    """
+    Build the benchmarked messages for a game of the given size.
+
+    Args:
+        players (int): Number of players in the game
+
+    Returns:
+        Dict[str, Dict]: Message name to message
+    """
+    player_ids = [str(uuid.uuid4()) for _ in range(players)]
+    colours = generate_palette(players)
+    return {
+        "pen_down_broadcast": {
+            "command": "pen_down_broadcast",
+            "index": 57,
+            "colour": colours[-1],
+        },
+        f"current_players[{players}]": {
+            "command": "current_players",
+            "players": {
+                pid: {"colour": colour, "name": f"Player {i}"}
+                for i, (pid, colour) in enumerate(zip(player_ids, colours))
+            },
+        },
+        f"game_win[{players}]": {
+            "command": "game_win",
+            "players": [
+                {"uuid": pid, "name": f"Player {i}", "score": i % 17}
+                for i, pid in enumerate(player_ids)
+            ],
+        },
+    }
+
+
+def time_per_call(function: Callable, argument, iterations: int) -> float:
+    """
+    Get the average time of one call, in microseconds.
+
+    Args:
+        function (Callable): Function to time
+        argument: Argument passed on every call
+        iterations (int): Number of calls
+
+    Returns:
+        float: Microseconds per call
+    """
+    started = time.perf_counter()
+    for _ in range(iterations):
+        function(argument)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "--players",
+        type=int,
+        nargs="+",
+        default=[4, 300],
+        help="Game sizes for current_players and game_win",
+    )
+    parser.add_argument(
+        "--iterations", type=int, default=20000, help="Calls per measurement"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    backends: List[Tuple[str, Callable, Callable]] = [
+        ("dumps+encode", lambda obj: json.dumps(obj).encode("utf-8"), json.loads)
+    ]
+    backends += [(name, *codec) for name, codec in json_codec.BACKENDS.items()]
+    print(f"Default backend: {json_codec.BACKEND}")
+
+    messages = {}
+    for players in args.players:
+        messages.update(make_messages(players))
+
+    print(
+        f"{'message':<24} {'backend':<13} {'bytes':>7} {'encode us':>10} {'decode us':>10}"
+    )
+    for name, message in messages.items():
+        iterations = max(100, args.iterations * 16 // len(json.dumps(message)))
+        for backend, encode, decode in backends:
+            data = encode(message)
+            assert decode(data) == message
+            encode_us = time_per_call(encode, message, iterations)
+            decode_us = time_per_call(decode, data, iterations)
+            print(
+                f"{name:<24} {backend:<13} {len(data):>7} "
+                f"{encode_us:>10.2f} {decode_us:>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
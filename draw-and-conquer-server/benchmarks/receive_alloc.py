@@ -0,0 +1,190 @@
+"""
+Allocation benchmark for the WebSocket receive path.
+
+Feeds masked text frames of several sizes through WebSocketInterface.receive
+from an in-memory socket and uses tracemalloc to measure the peak memory
+allocated while receiving each message, including the message itself and
+the temporary copies made while unmasking, next to a copy of the original
+receive implementation (a fresh bytes per recv, sliced mask and payload and
+a list comprehension for unmasking). Time per message is measured in a
+separate run without tracing.
+
+Run from the draw-and-conquer-server directory:
+
+    python -m benchmarks.receive_alloc
+"""
+
+import argparse
+import os
+import time
+import tracemalloc
+from typing import List, Optional
+
+from server import WebSocketInterface
+from transport import Transport
+
+
+def mask_frame(payload: bytes) -> bytes:
+    """
+    Encode a payload as a masked client text frame.
+
+    Args:
+        payload (bytes): Frame payload
+
+    Returns:
+        bytes: The complete frame
+    """
+    header = bytearray([0x81])
+    if len(payload) < 126:
+        header.append(0x80 | len(payload))
+    elif len(payload) < 65536:
+        header.append(0x80 | 126)
+        header += len(payload).to_bytes(2, "big")
+    else:
+        header.append(0x80 | 127)
+        header += len(payload).to_bytes(8, "big")
+    mask = os.urandom(4)
+    return bytes(header) + mask + bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+
+class StreamSocket(Transport):
+    """
+    In-memory transport returning a fixed byte stream, at most one frame per call.
+    """
+
+    def __init__(self, frames: List[bytes]):
+        self.frames = frames
+        self.index = 0
+        self.offset = 0
+
+    def _next(self, size: int) -> memoryview:
+        frame = self.frames[self.index % len(self.frames)]
+        chunk = memoryview(frame)[self.offset : self.offset + size]
+        self.offset += len(chunk)
+        if self.offset == len(frame):
+            self.index += 1
+            self.offset = 0
+        return chunk
+
+    def recv(self, size: int) -> bytes:
+        return self._next(size).tobytes()
+
+    def recv_into(self, buffer) -> int:
+        chunk = self._next(len(buffer))
+        buffer[: len(chunk)] = chunk
+        return len(chunk)
+
+
+class LegacyReceiver:
+    """
+    The receive path as it was before buffered, in-place frame parsing.
+    """
+
+    def __init__(self, conn: StreamSocket):
+        self.conn = conn
+
+    def receive(self) -> Optional[str]:
+        data = self.conn.recv(4096)
+        if len(data) < 2:
+            return None
+        payload_len = data[1] & 0x7F
+        mask_start = 2
+        if payload_len == 126:
+            payload_len = int.from_bytes(data[2:4], "big")
+            mask_start = 4
+        elif payload_len == 127:
+            payload_len = int.from_bytes(data[2:10], "big")
+            mask_start = 10
+        if len(data) < mask_start + 4 + payload_len:
+            return None
+        masks = data[mask_start : mask_start + 4]
+        payload = data[mask_start + 4 : mask_start + 4 + payload_len]
+        decoded = bytes([payload[i] ^ masks[i % 4] for i in range(len(payload))])
+        return decoded.decode("utf-8")
+
+
+def measure(receiver, messages: int) -> float:
+    """
+    Get the average peak allocation while receiving one message.
+
+    Args:
+        receiver: Object with a receive() method
+        messages (int): Messages to receive
+
+    Returns:
+        float: Average bytes allocated at peak per message, including the
+            returned message, or NaN if the receiver cannot handle the message
+    """
+    if receiver.receive() is None:
+        return float("nan")
+    tracemalloc.start()
+    total = 0
+    for _ in range(messages):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        message = receiver.receive()
+        total += tracemalloc.get_traced_memory()[1] - before
+        del message
+    tracemalloc.stop()
+    return total / messages
+
+
+def throughput(receiver, messages: int) -> float:
+    """
+    Get the average time to receive one message, in microseconds.
+
+    Args:
+        receiver: Object with a receive() method
+        messages (int): Messages to receive
+
+    Returns:
+        float: Microseconds per message, or NaN if the receiver cannot handle the message
+    """
+    if receiver.receive() is None:
+        return float("nan")
+    started = time.perf_counter()
+    for _ in range(messages):
+        receiver.receive()
+    return (time.perf_counter() - started) / messages * 1e6
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[64, 512, 4000, 60000],
+        help="Payload sizes in bytes; the original receive path only handles up to ~4 KB",
+    )
+    parser.add_argument(
+        "--messages", type=int, default=2000, help="Messages received per size"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    print(
+        f"{'size':>6} {'legacy B/msg':>13} {'buffered B/msg':>15} "
+        f"{'legacy us':>10} {'buffered us':>12}"
+    )
+    for size in args.sizes:
+        payload = ('{"command":"pen_down","index":1,"pad":"' + "x" * size)[:size]
+        frames = [mask_frame(payload.encode("utf-8")) for _ in range(16)]
+
+        results = []
+        for make in (LegacyReceiver, WebSocketInterface):
+            results.append(measure(make(StreamSocket(frames)), args.messages))
+        for make in (LegacyReceiver, WebSocketInterface):
+            results.append(throughput(make(StreamSocket(frames)), args.messages))
+        print(
+            f"{size:>6} {results[0]:>13,.0f} {results[1]:>15,.0f} "
+            f"{results[2]:>10.1f} {results[3]:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
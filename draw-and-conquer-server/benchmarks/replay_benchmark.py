@@ -0,0 +1,167 @@
+"""
+Replay-based regression benchmark for the game server.
+
+Replays every recording in a corpus directory as fast as possible and checks
+that each one is deterministic. With --synthesize, a large contended game is
+generated first so the benchmark can run without any recorded traffic.
+
+Run from the draw-and-conquer-server directory:
+
+    python -m benchmarks.replay_benchmark --synthesize --corpus /tmp/corpus
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import uuid
+
+from recorder import RECORDING_SUFFIX
+from replay import ReplayEngine
+
+
+def synthesize_recording(
+    path: str, num_players: int, num_tiles: int, seed: int = 0
+) -> None:
+    """
+    Write a recording of a randomly played, contended game.
+
+    Players pick random unclaimed tiles, so pen_down requests collide on locked
+    tiles and some pen_up requests abandon the tile, as in a live game.
+
+    Args:
+        path (str): Recording file to write
+        num_players (int): Number of players in the session
+        num_tiles (int): Number of tiles on the board
+        seed (int): Random seed, so the same corpus is generated every time
+    """
+    rng = random.Random(seed)
+    game_session_uuid = str(uuid.UUID(int=rng.getrandbits(128)))
+    player_ids = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(num_players)]
+
+    lines = [
+        {
+            "session": {
+                "game_session_uuid": game_session_uuid,
+                "player_ids": player_ids,
+                "player_names": {
+                    pid: f"Player {i}" for i, pid in enumerate(player_ids)
+                },
+                "num_tiles": num_tiles,
+                "colour_selection_timeout": 60,
+            }
+        }
+    ]
+    t = 0.0
+
+    def message(player_id: str, command: str, **fields) -> None:
+        nonlocal t
+        t += rng.expovariate(1000.0)
+        data = {"game_session_uuid": game_session_uuid, "uuid": player_id}
+        data.update(command=command, **fields)
+        lines.append(
+            {
+                "t": t,
+                "conn": f"10.0.0.{player_ids.index(player_id) + 1}:50000",
+                "data": json.dumps(data),
+            }
+        )
+
+    for player_id in player_ids:
+        message(player_id, "pen_colour_request")
+
+    tiles_to_win = num_tiles // num_players + 1
+    scores = {pid: 0 for pid in player_ids}
+    unclaimed = list(range(num_tiles))
+    held = {}
+    while unclaimed and max(scores.values()) < tiles_to_win:
+        player_id = rng.choice(player_ids)
+        if player_id in held:
+            tile = held.pop(player_id)
+            if rng.random() < 0.8 and tile in unclaimed:
+                unclaimed.remove(tile)
+                scores[player_id] += 1
+                message(player_id, "pen_up_tile_claimed", index=tile)
+            else:
+                message(player_id, "pen_up_tile_not_claimed", index=tile)
+        else:
+            tile = rng.choice(unclaimed)
+            if tile not in held.values():
+                held[player_id] = tile
+            message(player_id, "pen_down", index=tile)
+
+    with open(path, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(json.dumps(line) + "\n")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "--corpus",
+        type=str,
+        required=True,
+        help="Directory of recordings to replay",
+    )
+    parser.add_argument(
+        "--synthesize",
+        action="store_true",
+        help="Generate a synthetic recording into the corpus first",
+    )
+    parser.add_argument(
+        "--num-players",
+        type=int,
+        default=8,
+        help="Players in the synthetic game",
+    )
+    parser.add_argument(
+        "--num-tiles",
+        type=int,
+        default=4096,
+        help="Tiles in the synthetic game",
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=3,
+        help="Replays per recording",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    os.makedirs(args.corpus, exist_ok=True)
+    if args.synthesize:
+        path = os.path.join(
+            args.corpus,
+            f"synthetic-{args.num_players}p-{args.num_tiles}t{RECORDING_SUFFIX}",
+        )
+        synthesize_recording(path, args.num_players, args.num_tiles)
+
+    failures = 0
+    for name in sorted(os.listdir(args.corpus)):
+        if not name.endswith(RECORDING_SUFFIX):
+            continue
+        engine = ReplayEngine(os.path.join(args.corpus, name))
+        deterministic, results = engine.verify_determinism(args.runs)
+        throughputs = sorted(r.throughput for r in results)
+        print(
+            f"{name}: {results[0].messages} messages, "
+            f"median {throughputs[len(throughputs) // 2]:,.0f} msg/s, "
+            f"best {throughputs[-1]:,.0f} msg/s, "
+            f"deterministic={'yes' if deterministic else 'NO'}"
+        )
+        if not deterministic:
+            failures += 1
+
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Soak benchmark for game session lifecycle and eviction.
+
+Plays a large number of short games through game_server_request_handler over
+fake sockets, abandoning a fraction of them mid-game, and runs session
+eviction as the GameSessionWatchdog would. RSS and live session counts are
+sampled as games complete; with eviction working, RSS stays flat.
+
+Run from the draw-and-conquer-server directory:
+
+    python -m benchmarks.session_soak --games 100000
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import resource
+import time
+import uuid
+
+from game_server import GameServerState, SessionLifecycle, game_server_request_handler
+from replay import FakeSocket
+from server import WebSocketInterface
+
+
+def rss_bytes() -> int:
+    """
+    Get the current resident set size of this process.
+
+    Returns:
+        int: RSS in bytes (peak RSS where /proc is not available)
+    """
+    try:
+        with open("/proc/self/statm", "r", encoding="utf-8") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def play_game(
+    game_state: GameServerState,
+    rng: random.Random,
+    num_players: int,
+    num_tiles: int,
+    abandon: bool,
+) -> None:
+    """
+    Create a session and play it to a win, or abandon it part way through.
+
+    Args:
+        game_state (GameServerState): State the session is created in
+        rng (random.Random): Source of tile choices
+        num_players (int): Players in the session
+        num_tiles (int): Tiles on the board
+        abandon (bool): Stop sending messages half way through the game
+    """
+    game_session_uuid = str(uuid.uuid4())
+    player_ids = [str(uuid.uuid4()) for _ in range(num_players)]
+    game_state.create_game_session(
+        game_session_uuid,
+        list(player_ids),
+        {pid: pid[:8] for pid in player_ids},
+        num_tiles,
+        60,
+    )
+    sockets = {
+        pid: (WebSocketInterface(FakeSocket()), ("127.0.0.1", port))
+        for port, pid in enumerate(player_ids, start=40000)
+    }
+
+    def send(player_id: str, command: str, **fields) -> None:
+        ws, addr = sockets[player_id]
+        message = {"game_session_uuid": game_session_uuid, "uuid": player_id}
+        message.update(command=command, **fields)
+        game_server_request_handler(ws, addr, json.dumps(message), game_state)
+        # Fake sockets keep every frame; drop them like a real socket would
+        ws.conn.sent.clear()
+
+    for player_id in player_ids:
+        send(player_id, "pen_colour_request")
+
+    tiles = list(range(num_tiles))
+    rng.shuffle(tiles)
+    stop_after = len(tiles) // 2 if abandon else len(tiles)
+    for tile in tiles[:stop_after]:
+        player_id = rng.choice(player_ids)
+        send(player_id, "pen_down", index=tile)
+        send(player_id, "pen_up_tile_claimed", index=tile)
+        session = game_state.get_game_session(game_session_uuid)
+        if session is None or session.game_ended:
+            break
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument("--games", type=int, default=100000, help="Games to play")
+    parser.add_argument("--num-players", type=int, default=3, help="Players per game")
+    parser.add_argument("--num-tiles", type=int, default=16, help="Tiles per game")
+    parser.add_argument(
+        "--abandon-rate",
+        type=float,
+        default=0.1,
+        help="Fraction of games abandoned mid-game",
+    )
+    parser.add_argument(
+        "--ended-ttl",
+        type=float,
+        default=0.5,
+        help="Seconds ended sessions are kept",
+    )
+    parser.add_argument(
+        "--idle-ttl",
+        type=float,
+        default=1.0,
+        help="Seconds before an abandoned running session is evicted",
+    )
+    parser.add_argument(
+        "--samples", type=int, default=10, help="Number of RSS samples to print"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    rng = random.Random(0)
+    game_state = GameServerState(
+        lifecycle=SessionLifecycle(ended_ttl=args.ended_ttl, idle_ttl=args.idle_ttl)
+    )
+
+    sample_every = max(1, args.games // args.samples)
+    started = time.perf_counter()
+    baseline = rss_bytes()
+    print(f"{'games':>8} {'live':>6} {'evicted':>8} {'rss MiB':>8} {'delta MiB':>9}")
+    for game in range(1, args.games + 1):
+        play_game(
+            game_state,
+            rng,
+            args.num_players,
+            args.num_tiles,
+            abandon=rng.random() < args.abandon_rate,
+        )
+        # Stand-in for the watchdog tick
+        for session, _phase in game_state.evict_expired_sessions():
+            session.release()
+
+        if game % sample_every == 0:
+            rss = rss_bytes()
+            print(
+                f"{game:>8} {len(game_state.game_sessions):>6} "
+                f"{game_state.evicted_sessions:>8} {rss / 2**20:>8.1f} "
+                f"{(rss - baseline) / 2**20:>9.1f}"
+            )
+
+    elapsed = time.perf_counter() - started
+    print(f"{args.games} games in {elapsed:.1f}s ({args.games / elapsed:,.0f} games/s)")
+    print(f"final phase counts: {game_state.lifecycle.phase_counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Thread scaling benchmark for the game server request path.
+
+Runs 1 to 32 request handler threads against one GameServerState, each
+thread acting as the connections of several players, and measures pen down
+and pen up requests per second through game_server_request_handler,
+including JSON parsing, session locking and broadcasts to every player over
+fake sockets. Player j of game k is driven by thread (k + j) % threads, so
+every game is shared by several threads and its players' requests contend
+on the session lock as they would with one thread per connection. Pen ups
+never claim, so games run for the whole measurement.
+
+On a GIL build the throughput stays flat as threads are added; on a
+free-threaded build (python3.13t or later) it should grow with the cores
+available. After each run the sessions are checked for leaked tile locks
+and the threads for exceptions, so the benchmark doubles as a stress test
+of the locking.
+
+Run from the draw-and-conquer-server directory, with either interpreter:
+
+    python -m benchmarks.thread_scaling
+    python3.13t -m benchmarks.thread_scaling --threads 1 2 4 8 16 32
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import sysconfig
+import threading
+import time
+import uuid
+
+from game_server import GameServerState, game_server_request_handler
+from replay import FakeSocket
+from server import WebSocketInterface
+
+
+class NullSocket(FakeSocket):
+    """
+    Fake socket that discards what is sent to it, so memory stays flat.
+    """
+
+    def sendall(self, data: bytes) -> None:
+        pass
+
+
+def gil_status() -> str:
+    """
+    Describe whether this interpreter runs with the GIL.
+
+    Returns:
+        str: e.g. "free-threaded build, GIL disabled"
+    """
+    if not sysconfig.get_config_var("Py_GIL_DISABLED"):
+        return "GIL build"
+    # A free-threaded build re-enables the GIL for extensions that need it
+    enabled = getattr(sys, "_is_gil_enabled", lambda: True)()
+    return f"free-threaded build, GIL {'enabled' if enabled else 'disabled'}"
+
+
+def run(threads: int, lobby_size: int, num_tiles: int, duration: float) -> tuple:
+    """
+    Measure request throughput with a number of handler threads.
+
+    Args:
+        threads (int): Number of request handler threads, and of games
+        lobby_size (int): Players per game
+        num_tiles (int): Tiles per game
+        duration (float): Seconds to run for
+
+    Returns:
+        tuple: Requests per second and a list of problems found afterwards
+    """
+    game_state = GameServerState()
+    # Players each thread drives, as (game session UUID, player ID, ws, addr)
+    assignments = [[] for _ in range(threads)]
+    for game in range(threads):
+        game_session_uuid = str(uuid.uuid4())
+        player_ids = [str(uuid.uuid4()) for _ in range(lobby_size)]
+        game_state.create_game_session(
+            game_session_uuid,
+            list(player_ids),
+            {pid: pid[:8] for pid in player_ids},
+            num_tiles,
+            60,
+        )
+        for j, player_id in enumerate(player_ids):
+            ws = WebSocketInterface(NullSocket())
+            addr = ("127.0.0.1", 40000 + game * lobby_size + j)
+            assignments[(game + j) % threads].append(
+                (game_session_uuid, player_id, ws, addr)
+            )
+            request = {
+                "game_session_uuid": game_session_uuid,
+                "uuid": player_id,
+                "command": "pen_colour_request",
+            }
+            game_server_request_handler(ws, addr, json.dumps(request), game_state)
+
+    counts = [0] * threads
+    errors = []
+    go = threading.Event()
+    stop = threading.Event()
+
+    def client(index: int) -> None:
+        rng = random.Random(index)
+        players = assignments[index]
+        done = 0
+        go.wait()
+        try:
+            while not stop.is_set():
+                for game_session_uuid, player_id, ws, addr in players:
+                    tile_index = rng.randrange(num_tiles)
+                    for command in ("pen_down", "pen_up_tile_not_claimed"):
+                        request = {
+                            "game_session_uuid": game_session_uuid,
+                            "uuid": player_id,
+                            "command": command,
+                            "index": tile_index,
+                        }
+                        game_server_request_handler(
+                            ws, addr, json.dumps(request), game_state
+                        )
+                    done += 2
+        except Exception as e:
+            errors.append(f"thread {index}: {e!r}")
+        counts[index] = done
+
+    workers = [threading.Thread(target=client, args=(i,)) for i in range(threads)]
+    # Start every thread before any of them runs, so the measurement does not
+    # include thread start-up
+    for worker in workers:
+        worker.start()
+    started = time.perf_counter()
+    go.set()
+    time.sleep(duration)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    problems = list(errors)
+    for game_session_uuid, session in game_state.game_sessions.items():
+        if session.tile_locks:
+            problems.append(
+                f"session {game_session_uuid}: {len(session.tile_locks)} leaked locks"
+            )
+        if len(session.player_websockets) != lobby_size:
+            problems.append(
+                f"session {game_session_uuid}: "
+                f"{len(session.player_websockets)} of {lobby_size} connections"
+            )
+    return sum(counts) / elapsed, problems
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8, 16, 32],
+        help="Numbers of request handler threads",
+    )
+    parser.add_argument("--lobby-size", type=int, default=4, help="Players per game")
+    parser.add_argument("--num-tiles", type=int, default=256, help="Tiles per game")
+    parser.add_argument(
+        "--duration", type=float, default=3.0, help="Seconds per measurement"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    print(
+        f"Python {sys.version.split()[0]}, {gil_status()}, {os.cpu_count()} CPUs, "
+        f"{args.lobby_size} players per game, {args.num_tiles} tiles"
+    )
+    print(f"{'threads':>7} {'requests/s':>12} {'speedup':>8} {'efficiency':>10}")
+    baseline = None
+    failed = False
+    for threads in args.threads:
+        rate, problems = run(threads, args.lobby_size, args.num_tiles, args.duration)
+        if baseline is None:
+            baseline = rate / threads
+        speedup = rate / baseline
+        print(
+            f"{threads:>7} {rate:>12,.0f} {speedup:>7.1f}x "
+            f"{speedup / threads:>10.0%}"
+        )
+        for problem in problems:
+            print(f"        {problem}")
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from game_server import (
+    GameServerState,
+    GameSession,
+    broadcast_game_win,
+    start_game_if_ready,
+)
+
+logger = logging.getLogger(__name__)
+
+# Random tiles a bot tries before scanning the board for a free one
+TILE_PICK_ATTEMPTS = 8
+
+
+class BotPlayer:
+    """
+    A server-side player in one game session, driven by the BotEngine.
+
+    Shared Object Handling: Only used by the BotEngine thread.
+    """
+
+    __slots__ = ("player_id", "session", "held_tile")
+
+    def __init__(self, player_id: str, session: GameSession):
+        self.player_id = player_id
+        self.session = session
+        # Tile the bot is drawing on, between its pen down and pen up
+        self.held_tile: Optional[int] = None
+
+
+class BotEngine:
+    """
+    Plays bot players in game sessions, all of them on one scheduler thread.
+
+    Bots have no connection. Each one is an entry in a min-heap of due times;
+    when it comes due the bot takes one step through the same GameSession
+    calls the request handler makes (assign_colour, lock_tile, unlock_tile)
+    and broadcasts the same messages, then is pushed back with its next due
+    time. A bot costs one small object and one heap entry, so a single
+    thread can run thousands of them, and a server full of bots doubles as
+    a network-free load generator for the game logic.
+
+    Shared Object Handling: The heap is guarded by a condition variable, so
+    the QueueWatchdog can add bots while the engine thread runs. Bots modify
+    their game session from the engine thread the same way request handler
+    threads do.
+    """
+
+    def __init__(
+        self,
+        game_state: GameServerState,
+        think_time: float = 1.0,
+        draw_time: float = 0.5,
+        claim_probability: float = 0.8,
+        seed: Optional[int] = None,
+    ):
+        """
+        Initialize the bot engine.
+
+        Args:
+            game_state (GameServerState): Game server state the bots play in
+            think_time (float): Mean seconds between a bot's moves
+            draw_time (float): Mean seconds a bot draws on a tile before pen up
+            claim_probability (float): Chance that a bot's pen up claims the tile
+            seed (Optional[int]): Seed for the bots' random choices
+        """
+        self.game_state = game_state
+        self.think_time = think_time
+        self.draw_time = draw_time
+        self.claim_probability = claim_probability
+        self.rng = random.Random(seed)
+
+        self.condition = threading.Condition()
+        self._heap: List[Tuple[float, int, BotPlayer]] = []
+        self._sequence = itertools.count()
+        self._names = itertools.count(1)
+
+        self.active_bots = 0
+        self.moves = 0
+
+    def create_bot_ids(self, count: int) -> Dict[str, str]:
+        """
+        Create IDs and display names for new bots.
+
+        Args:
+            count (int): Number of bots
+
+        Returns:
+            Dict[str, str]: Display names keyed by bot player ID
+        """
+        return {f"bot-{uuid.uuid4()}": f"Bot {next(self._names)}" for _ in range(count)}
+
+    def add_bots(self, session: GameSession, bot_ids: List[str]) -> None:
+        """
+        Start playing bots in a game session they are players of.
+
+        Args:
+            session (GameSession): The game session
+            bot_ids (List[str]): Player IDs of the bots
+        """
+        session.bot_ids.update(bot_ids)
+        self._record(session, "bots", {"players": list(bot_ids)})
+        now = time.monotonic()
+        with self.condition:
+            for bot_id in bot_ids:
+                bot = BotPlayer(bot_id, session)
+                self._push(now + self._jitter(self.think_time), bot)
+                self.active_bots += 1
+            self.condition.notify()
+        logger.info(
+            "Session %s: Added %d bots", session.game_session_uuid, len(bot_ids)
+        )
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get bot statistics.
+
+        Returns:
+            Dict[str, int]: Active bots and moves made
+        """
+        with self.condition:
+            return {"active_bots": self.active_bots, "moves": self.moves}
+
+    def _jitter(self, mean: float) -> float:
+        return self.rng.uniform(0.5, 1.5) * mean
+
+    def _push(self, due: float, bot: BotPlayer) -> None:
+        heapq.heappush(self._heap, (due, next(self._sequence), bot))
+
+    def run(self) -> None:
+        """
+        Run bots as they come due until the process exits. A bot whose step
+        raises is logged and dropped, and the others keep playing.
+        """
+        while True:
+            with self.condition:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    timeout = (
+                        self._heap[0][0] - time.monotonic() if self._heap else None
+                    )
+                    self.condition.wait(timeout)
+                _, _, bot = heapq.heappop(self._heap)
+
+            try:
+                delay = self._step(bot)
+            except Exception:
+                # Drop the bot rather than the engine thread and every other bot
+                logger.exception(
+                    "Session %s: Bot %s failed, removing it",
+                    bot.session.game_session_uuid,
+                    bot.player_id,
+                )
+                delay = None
+
+            with self.condition:
+                if delay is None:
+                    self.active_bots -= 1
+                else:
+                    self._push(time.monotonic() + delay, bot)
+
+    def _step(self, bot: BotPlayer) -> Optional[float]:
+        """
+        Take a bot's next action in its game.
+
+        Args:
+            bot (BotPlayer): The bot that came due
+
+        Returns:
+            Optional[float]: Seconds until the bot's next action, or None once
+                the bot is done playing
+        """
+        session = bot.session
+        if session.game_ended or bot.player_id not in session.player_ids:
+            return None
+        if self.game_state.get_game_session(session.game_session_uuid) is not session:
+            return None
+
+        if bot.player_id not in session.player_colours:
+            session.assign_colour(bot.player_id)
+            self._record(session, "bot_colour", {"player": bot.player_id})
+            start_game_if_ready(session, self.game_state.tracer)
+            return self._jitter(self.think_time)
+        if not session.game_started:
+            return self._jitter(self.think_time)
+
+        if bot.held_tile is not None:
+            tile_index, bot.held_tile = bot.held_tile, None
+            self._pen_up(bot, tile_index)
+            if session.game_ended:
+                if session.winner == bot.player_id:
+                    broadcast_game_win(session, self.game_state.rematch_window)
+                return None
+            return self._jitter(self.think_time)
+
+        # Nothing left to play for once every tile is owned without a winner
+        if len(session.tile_owners) >= session.num_tiles:
+            return None
+        tile_index = self._pick_tile(session)
+        if tile_index is None or not session.lock_tile(tile_index, bot.player_id):
+            return self._jitter(self.think_time)
+        bot.held_tile = tile_index
+        self.moves += 1
+        self._record(session, "bot_lock", {"tile": tile_index, "player": bot.player_id})
+        session.broadcast_tile_message(
+            {
+                "command": "pen_down_broadcast",
+                "index": tile_index,
+                "colour": session.player_colours[bot.player_id],
+            },
+            tile_index,
+        )
+        return self._jitter(self.draw_time)
+
+    def _pen_up(self, bot: BotPlayer, tile_index: int) -> None:
+        """
+        Lift a bot's pen from its tile, claiming it or not.
+
+        Args:
+            bot (BotPlayer): The bot
+            tile_index (int): The tile the bot locked
+        """
+        session = bot.session
+        claim = self.rng.random() < self.claim_probability
+        # The lock may have been released by a lease expiry in the meantime
+        if not session.unlock_tile(tile_index, bot.player_id, claim=claim):
+            return
+        self.moves += 1
+        self._record(
+            session,
+            "bot_unlock",
+            {"tile": tile_index, "player": bot.player_id, "claim": claim},
+        )
+        session.broadcast_tile_message(
+            {
+                "command": "pen_up_broadcast",
+                "index": tile_index,
+                "colour": session.player_colours[bot.player_id],
+                "status": (
+                    "pen_up_tile_claimed" if claim else "pen_up_tile_not_claimed"
+                ),
+            },
+            tile_index,
+        )
+
+    def _record(self, session: GameSession, kind: str, fields: Dict) -> None:
+        """
+        Record a bot's move in the session's recording, if recording is enabled.
+
+        Args:
+            session (GameSession): The game session
+            kind (str): Event kind
+            fields (Dict): Event payload
+        """
+        recorder = self.game_state.recorder
+        if recorder is not None:
+            recorder.record_event(session.game_session_uuid, kind, fields)
+
+    def _pick_tile(self, session: GameSession) -> Optional[int]:
+        """
+        Pick a random tile that is neither owned nor locked.
+
+        Args:
+            session (GameSession): The game session
+
+        Returns:
+            Optional[int]: Tile index, or None if every tile is taken
+        """
+        for _ in range(TILE_PICK_ATTEMPTS):
+            tile_index = self.rng.randrange(session.num_tiles)
+            if (
+                tile_index not in session.tile_owners
+                and tile_index not in session.tile_locks
+            ):
+                return tile_index
+        free = [
+            tile_index
+            for tile_index in range(session.num_tiles)
+            if tile_index not in session.tile_owners
+            and tile_index not in session.tile_locks
+        ]
+        return self.rng.choice(free) if free else None
@@ -0,0 +1,333 @@
+import json
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import json_codec
+
+logger = logging.getLogger(__name__)
+
+# Record header: payload length and CRC32 of the payload, both big-endian
+RECORD_HEADER = struct.Struct(">II")
+
+SEGMENT_PREFIX = "events-"
+SEGMENT_SUFFIX = ".log"
+SNAPSHOT_NAME = "snapshot.json"
+
+
+def apply_event(
+    sessions: Dict[str, Dict], game_session_uuid: str, kind: str, fields: Dict
+) -> None:
+    """
+    Apply a single session state transition to a dictionary of session records.
+
+    This is shared by the background writer (to keep the state it compacts into
+    snapshots) and by recovery (to replay log segments on top of a snapshot).
+    Sessions that end or are won are dropped, so they are compacted away.
+
+    Args:
+        sessions (Dict[str, Dict]): Session records keyed by game session UUID
+        game_session_uuid (str): Session the event belongs to
+        kind (str): Event kind (create, colour, lock, unlock, claim, win, remove_player, end)
+        fields (Dict): Event payload
+    """
+    if kind == "create":
+        sessions[game_session_uuid] = {
+            "player_ids": list(fields["player_ids"]),
+            "player_names": dict(fields["player_names"]),
+            "num_tiles": fields["num_tiles"],
+            "colour_selection_timeout": fields["colour_selection_timeout"],
+            "player_colours": {},
+            "tile_owners": {},
+            "tile_locks": {},
+        }
+        return
+
+    record = sessions.get(game_session_uuid)
+    if record is None:
+        return
+
+    if kind == "colour":
+        record["player_colours"][fields["player"]] = fields["colour"]
+    elif kind == "lock":
+        record["tile_locks"][str(fields["tile"])] = fields["player"]
+    elif kind == "unlock":
+        record["tile_locks"].pop(str(fields["tile"]), None)
+    elif kind == "claim":
+        record["tile_locks"].pop(str(fields["tile"]), None)
+        record["tile_owners"][str(fields["tile"])] = fields["player"]
+    elif kind == "remove_player":
+        player_id = fields["player"]
+        if player_id in record["player_ids"]:
+            record["player_ids"].remove(player_id)
+        record["player_colours"].pop(player_id, None)
+        record["tile_locks"] = {
+            tile: owner
+            for tile, owner in record["tile_locks"].items()
+            if owner != player_id
+        }
+    elif kind in ("win", "end"):
+        del sessions[game_session_uuid]
+
+
+class EventLog:
+    """
+    Append-only, length-prefixed log of game session state transitions.
+
+    Request threads only enqueue events; a background writer thread serializes
+    them, group-commits each batch with a single write and fsync, and
+    periodically compacts the log into a snapshot stored in the same directory.
+
+    Shared Object Handling: The event queue is the only structure shared with
+    request threads. Everything else is owned by the writer thread.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_batch: int = 512,
+        commit_interval: float = 0.005,
+        snapshot_interval: float = 60.0,
+    ):
+        """
+        Initialize the event log.
+
+        Args:
+            directory (str): Directory holding log segments and snapshots
+            max_batch (int): Maximum number of events committed in one batch
+            commit_interval (float): Maximum time in seconds an event waits before commit
+            snapshot_interval (float): Seconds between compacted snapshots
+        """
+        self.directory = directory
+        self.max_batch = max_batch
+        self.commit_interval = commit_interval
+        self.snapshot_interval = snapshot_interval
+
+        os.makedirs(directory, exist_ok=True)
+
+        self._events: "queue.SimpleQueue[Optional[Tuple[str, str, Dict]]]" = (
+            queue.SimpleQueue()
+        )
+        self._sessions: Dict[str, Dict] = {}
+        self._segment = 0
+        self._segment_file = None
+        self._events_since_snapshot = 0
+        self._thread: Optional[threading.Thread] = None
+        self._recovered = False
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(
+            self.directory, f"{SEGMENT_PREFIX}{segment:08d}{SEGMENT_SUFFIX}"
+        )
+
+    def _list_segments(self) -> List[int]:
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                try:
+                    segments.append(
+                        int(name[len(SEGMENT_PREFIX) : -len(SEGMENT_SUFFIX)])
+                    )
+                except ValueError:
+                    continue
+        return sorted(segments)
+
+    def recover(self) -> Dict[str, Dict]:
+        """
+        Rebuild session records from the latest snapshot and the log segments after it.
+
+        Called by start() if it has not been called already. A torn or corrupt
+        record at the tail of a segment ends replay of that segment.
+
+        Returns:
+            Dict[str, Dict]: Session records keyed by game session UUID
+        """
+        sessions: Dict[str, Dict] = {}
+        first_segment = 0
+
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_NAME)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            sessions = snapshot["sessions"]
+            first_segment = snapshot["next_segment"]
+
+        replayed = 0
+        segments = [s for s in self._list_segments() if s >= first_segment]
+        for segment in segments:
+            with open(self._segment_path(segment), "rb") as f:
+                data = f.read()
+
+            offset = 0
+            while offset + RECORD_HEADER.size <= len(data):
+                length, crc = RECORD_HEADER.unpack_from(data, offset)
+                start = offset + RECORD_HEADER.size
+                payload = data[start : start + length]
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    logger.warning(
+                        "Truncated record in segment %d at offset %d",
+                        segment,
+                        offset,
+                    )
+                    break
+
+                game_session_uuid, kind, fields = json_codec.decode(payload)
+                apply_event(sessions, game_session_uuid, kind, fields)
+                offset = start + length
+                replayed += 1
+
+        self._sessions = sessions
+        self._recovered = True
+        self._segment = max(segments + [first_segment - 1]) + 1
+        logger.info(
+            "Recovered %d sessions (%d events replayed)", len(sessions), replayed
+        )
+        return sessions
+
+    def start(self) -> None:
+        """
+        Start the background writer thread.
+
+        Recovered state is immediately compacted into a fresh snapshot so the
+        new process starts with an empty log segment.
+        """
+        if not self._recovered:
+            self.recover()
+        self._snapshot()
+
+        self._thread = threading.Thread(target=self._run, name="event-log", daemon=True)
+        self._thread.start()
+
+    def append(self, game_session_uuid: str, kind: str, fields: Dict) -> None:
+        """
+        Queue a state transition for the writer thread. Never blocks on disk.
+
+        Args:
+            game_session_uuid (str): Session the event belongs to
+            kind (str): Event kind
+            fields (Dict): Event payload, must be JSON serializable
+        """
+        self._events.put((game_session_uuid, kind, fields))
+
+    def close(self) -> None:
+        """
+        Commit all queued events and stop the writer thread.
+        """
+        if self._thread is None:
+            return
+        self._events.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        """
+        Writer loop: collect a bounded batch, commit it, snapshot when due.
+        """
+        last_snapshot = time.monotonic()
+        running = True
+        while running:
+            batch = []
+            try:
+                event = self._events.get(timeout=self.snapshot_interval)
+            except queue.Empty:
+                event = False
+
+            if event is None:
+                running = False
+            elif event:
+                batch.append(event)
+                deadline = time.monotonic() + self.commit_interval
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        event = (
+                            self._events.get(timeout=remaining)
+                            if remaining > 0
+                            else self._events.get_nowait()
+                        )
+                    except queue.Empty:
+                        break
+                    if event is None:
+                        running = False
+                        break
+                    batch.append(event)
+
+            if batch:
+                self._commit(batch)
+
+            if not running or (
+                self._events_since_snapshot
+                and time.monotonic() - last_snapshot >= self.snapshot_interval
+            ):
+                self._snapshot()
+                last_snapshot = time.monotonic()
+
+        self._segment_file.close()
+
+    def _commit(self, batch: List[Tuple[str, str, Dict]]) -> None:
+        """
+        Group commit: encode a batch, write it at once and fsync once.
+
+        Args:
+            batch (List[Tuple[str, str, Dict]]): Events to commit
+        """
+        buffer = bytearray()
+        for game_session_uuid, kind, fields in batch:
+            payload = json_codec.encode([game_session_uuid, kind, fields])
+            buffer += RECORD_HEADER.pack(len(payload), zlib.crc32(payload))
+            buffer += payload
+            apply_event(self._sessions, game_session_uuid, kind, fields)
+
+        try:
+            self._segment_file.write(buffer)
+            self._segment_file.flush()
+            os.fsync(self._segment_file.fileno())
+        except OSError as e:
+            logger.error("Event log commit of %d events failed: %s", len(batch), e)
+            return
+
+        self._events_since_snapshot += len(batch)
+        logger.debug("Committed %d events", len(batch))
+
+    def _snapshot(self) -> None:
+        """
+        Write a compacted snapshot of live sessions and drop the segments it covers.
+
+        The snapshot is written to a temporary file and atomically renamed, so a
+        crash at any point leaves either the old or the new snapshot usable.
+        """
+        if self._segment_file is not None:
+            self._segment_file.close()
+        covered = [s for s in self._list_segments() if s <= self._segment]
+        self._segment += 1
+        self._segment_file = open(self._segment_path(self._segment), "ab")
+
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_NAME)
+        tmp_path = snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"next_segment": self._segment, "sessions": self._sessions},
+                f,
+                separators=(",", ":"),
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, snapshot_path)
+
+        for segment in covered:
+            try:
+                os.remove(self._segment_path(segment))
+            except OSError:
+                pass
+
+        logger.info(
+            "Snapshot written: %d sessions, %d events compacted",
+            len(self._sessions),
+            self._events_since_snapshot,
+        )
+        self._events_since_snapshot = 0
@@ -1,16 +1,82 @@
-import json
+import colorsys
+import heapq
 import logging
+import sys
+import threading
 import time
-from typing import Dict, List, Optional, Set, Tuple
-
+import uuid
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import json_codec
+from event_log import EventLog
+from rate_limit import MESSAGE_BUCKET, RateLimiter
+from recorder import GameRecorder
+from regions import RegionIndex
 from server import ServerState, WebSocketInterface
+from tracing import MatchTracer
 
 logger = logging.getLogger(__name__)
 
+# WebSocket path of the game server when served on a single port
+GAME_ROUTE = "/game"
+
+# Session lifecycle phases, in order
+PHASE_CREATED = "created"
+PHASE_COLOUR_SELECT = "colour_select"
+PHASE_RUNNING = "running"
+PHASE_ENDED = "ended"
+PHASE_EVICTED = "evicted"
+PHASES = [PHASE_CREATED, PHASE_COLOUR_SELECT, PHASE_RUNNING, PHASE_ENDED, PHASE_EVICTED]
+
+# pen_up_broadcast status for a tile lock released because its lease ran out
+PEN_UP_TIMEOUT = "pen_up_timeout"
+
+# Longest request accepted by the game server, in characters
+MAX_REQUEST_LENGTH = 4096
+
+# Colours understood by every client, handed out first
+NAMED_COLOURS = ["red", "blue", "green", "yellow", "purple", "orange", "pink", "cyan"]
+
+
+def generate_palette(num_colours: int) -> List[str]:
+    """
+    Build a palette with at least num_colours distinct colours.
+
+    The named colours come first. Further colours are "#rrggbb" strings whose
+    hues are spaced by the golden angle, with lightness alternating between
+    bands, so neighbouring entries stay distinguishable for large lobbies.
+
+    Args:
+        num_colours (int): Number of colours needed
+
+    Returns:
+        List[str]: Colour names followed by generated hex colours
+    """
+    palette = list(NAMED_COLOURS)
+    for i in range(num_colours - len(palette)):
+        hue = (i * 0.381966) % 1.0
+        lightness = (0.45, 0.6, 0.35)[i % 3]
+        red, green, blue = colorsys.hls_to_rgb(hue, lightness, 0.85)
+        palette.append(
+            f"#{round(red * 255):02x}{round(green * 255):02x}{round(blue * 255):02x}"
+        )
+    return palette
+
 
 class GameSession:
     """
     Manages a single game session including players, tiles, and game state.
+
+    Shared Object Handling: Request handler threads of every player, the bot
+    engine and the watchdogs modify the session concurrently. Its dicts and
+    sets are guarded by the session's own lock, so sessions never contend
+    with each other, and check-then-act sequences such as locking a tile or
+    handing out a colour are atomic even without a GIL. player_ids and
+    player_websockets are copy-on-write: they are replaced under the lock,
+    never modified in place, so broadcasts iterate them without the lock and
+    send with no lock held. Rematch votes are guarded by the GameServerState
+    lock. The session lock may be held while taking the GameServerState lock,
+    never the other way round.
     """
 
     def __init__(
@@ -20,6 +86,9 @@ class GameSession:
         player_names: Dict[str, str],
         num_tiles: int,
         colour_selection_timeout: int,
+        event_log: Optional[EventLog] = None,
+        tile_lease: Optional[float] = None,
+        region_size: Optional[int] = None,
     ):
         """
         Initialize a new game session.
@@ -30,6 +99,11 @@ class GameSession:
             player_names (Dict[str, str]): Mapping of player IDs to display names
             num_tiles (int): Total number of tiles in the game
             colour_selection_timeout (int): Timeout for colour selection phase in seconds
+            event_log (Optional[EventLog]): Log receiving the session's state transitions
+            tile_lease (Optional[float]): Seconds a tile lock is held before it expires,
+                locks never expire if None
+            region_size (Optional[int]): Width of the board regions tile events are
+                filtered by, every tile event goes to every player if None
         """
         self.game_session_uuid = game_session_uuid
         self.player_ids = player_ids
@@ -37,36 +111,174 @@ class GameSession:
         self.num_tiles = num_tiles
         self.colour_selection_timeout = colour_selection_timeout
         self.tiles_to_win = (num_tiles // len(player_ids)) + 1
+        # Reentrant, so locked methods can call each other
+        self.lock = threading.RLock()
 
         logger.info("Session %s: Game created", game_session_uuid)
 
-        self.available_colours = [
-            "red",
-            "blue",
-            "green",
-            "yellow",
-            "purple",
-            "orange",
-            "pink",
-            "cyan",
-        ]
+        self.available_colours = generate_palette(len(player_ids))
 
         self.player_colours: Dict[str, str] = {}
         self.player_websockets: Dict[str, WebSocketInterface] = {}
+        # Server-side bot players, which play without a connection
+        self.bot_ids: Set[str] = set()
         self.colours_requested: Set[str] = set()
         self.last_colour_request: Dict[str, float] = {}
 
         self.tile_owners: Dict[int, str] = {}
         self.tile_locks: Dict[int, str] = {}
+        # Lease deadline of each locked tile, when tile leases are enabled
+        self.tile_lease = tile_lease
+        self.lock_leases: Dict[int, float] = {}
+        # Called with (session, tile_index, deadline) when a lease is granted
+        self.lease_listener: Optional[Callable[["GameSession", int, float], None]] = (
+            None
+        )
+        self.lease_expiries = 0
+        self.lock_contention = 0
+
+        self.regions: Optional[RegionIndex] = None
+        if region_size:
+            self.regions = RegionIndex(num_tiles, region_size, player_ids)
 
         self.game_started = False
         self.game_ended = False
         self.winner: Optional[str] = None
+        # Rematch votes after the game ended, and whether a rematch is still possible
+        self.rematch_votes: Dict[str, bool] = {}
+        self.rematch_open = True
+
+        self.phase = PHASE_CREATED
+        self.phase_changed_at = time.monotonic()
+        self.last_activity = self.phase_changed_at
+        # Called with (session, old_phase) on every transition; set by GameServerState
+        self.phase_listener: Optional[Callable[["GameSession", str], None]] = None
+        # Deadline of this session's live entry in the lifecycle heap
+        self.lifecycle_deadline: Optional[float] = None
+        # Set on sessions restored after a restart until a player reconnects
+        self.reconnect_deadline: Optional[float] = None
 
         current_time = time.time()
         for player_id in player_ids:
             self.last_colour_request[player_id] = current_time
 
+        self.event_log = event_log
+        self._log_event(
+            "create",
+            {
+                "player_ids": list(player_ids),
+                "player_names": dict(player_names),
+                "num_tiles": num_tiles,
+                "colour_selection_timeout": colour_selection_timeout,
+            },
+        )
+
+    def _log_event(self, kind: str, fields: Dict) -> None:
+        """
+        Record a state transition in the event log, if persistence is enabled.
+
+        Args:
+            kind (str): Event kind
+            fields (Dict): Event payload
+        """
+        if self.event_log is not None:
+            self.event_log.append(self.game_session_uuid, kind, fields)
+
+    def restore(self, record: Dict) -> None:
+        """
+        Restore colours and claimed tiles from a recovered event log record.
+
+        Tile locks are not restored, since the players holding them were
+        disconnected when the previous process stopped.
+
+        Args:
+            record (Dict): Session record rebuilt by EventLog.recover
+        """
+        for player_id, colour in record["player_colours"].items():
+            self.player_colours[player_id] = colour
+            self.colours_requested.add(player_id)
+            if colour in self.available_colours:
+                self.available_colours.remove(colour)
+
+        for tile_index, owner in record["tile_owners"].items():
+            self.tile_owners[int(tile_index)] = owner
+
+        self.game_started = self.all_colours_assigned()
+        if self.game_started:
+            self.phase = PHASE_RUNNING
+        elif self.colours_requested:
+            self.phase = PHASE_COLOUR_SELECT
+
+    def set_phase(self, phase: str) -> None:
+        """
+        Move the session to a new lifecycle phase and notify the listener.
+
+        Args:
+            phase (str): The new phase
+        """
+        if phase == self.phase:
+            return
+        old_phase = self.phase
+        self.phase = phase
+        self.phase_changed_at = time.monotonic()
+        logger.debug(
+            "Session %s: Phase %s -> %s", self.game_session_uuid, old_phase, phase
+        )
+        if self.phase_listener is not None:
+            self.phase_listener(self, old_phase)
+
+    def touch(self) -> None:
+        """
+        Record client activity, pushing back the abandonment deadline.
+        """
+        self.last_activity = time.monotonic()
+
+    def start_game(self) -> None:
+        """
+        Mark the game as started once every player has a colour.
+        """
+        with self.lock:
+            self.game_started = True
+            self.set_phase(PHASE_RUNNING)
+
+    def release(self) -> None:
+        """
+        Drop per-game data and connection references once the session is evicted.
+        """
+        with self.lock:
+            self.player_websockets = {}
+            self.tile_owners.clear()
+            self.tile_locks.clear()
+            self.lock_leases.clear()
+            self.last_colour_request.clear()
+
+    def memory_estimate(self) -> int:
+        """
+        Estimate the bytes held by the session's containers.
+
+        Only the container objects are measured; keys and values are mostly
+        small ints and strings shared with other structures.
+
+        Returns:
+            int: Approximate size in bytes
+        """
+        return sys.getsizeof(self) + sum(
+            sys.getsizeof(container)
+            for container in (
+                self.__dict__,
+                self.player_ids,
+                self.player_names,
+                self.available_colours,
+                self.player_colours,
+                self.player_websockets,
+                self.colours_requested,
+                self.last_colour_request,
+                self.tile_owners,
+                self.tile_locks,
+                self.lock_leases,
+            )
+        )
+
     def broadcast_message(
         self,
         message: Dict,
@@ -79,15 +291,81 @@ class GameSession:
             message (Dict): Message json to send
             exclude_player (str): Player ID to exclude from broadcast
         """
+        data = json_codec.encode(message)
         for player_id, player_ws in self.player_websockets.items():
             if exclude_player and player_id == exclude_player:
                 continue
 
             try:
-                player_ws.send(json.dumps(message))
+                player_ws.send(data)
             except (ConnectionError, OSError, BrokenPipeError):
                 pass
 
+    def broadcast_tile_message(
+        self,
+        message: Dict,
+        tile_index: int,
+        exclude_player: Optional[str] = None,
+    ) -> None:
+        """
+        Broadcast a tile event to the players watching the tile's region.
+
+        Without regions this is the same as broadcast_message.
+
+        Args:
+            message (Dict): Message json to send
+            tile_index (int): Index of the tile the event is about
+            exclude_player (str): Player ID to exclude from broadcast
+        """
+        if self.regions is None:
+            self.broadcast_message(message, exclude_player)
+            return
+
+        data = json_codec.encode(message)
+        with self.lock:
+            recipients = self.regions.recipients(tile_index)
+        connections = self.player_websockets
+        for player_id in recipients:
+            if player_id == exclude_player:
+                continue
+            player_ws = connections.get(player_id)
+            if player_ws is None:
+                continue
+
+            try:
+                player_ws.send(data)
+            except (ConnectionError, OSError, BrokenPipeError):
+                pass
+
+    def set_viewport(
+        self, player_id: str, x: int, y: int, width: int, height: int
+    ) -> List[int]:
+        """
+        Subscribe a player to the tile events of the regions in their viewport.
+
+        Args:
+            player_id (str): Unique identifier for the player
+            x (int): Leftmost tile column of the viewport
+            y (int): Topmost tile row of the viewport
+            width (int): Viewport width in tiles
+            height (int): Viewport height in tiles
+
+        Returns:
+            List[int]: Region numbers the player is now subscribed to
+        """
+        if self.regions is None:
+            raise ValueError("Regions are not enabled")
+        regions = self.regions.regions_in_viewport(x, y, width, height)
+        with self.lock:
+            self.regions.subscribe(player_id, regions)
+        logger.debug(
+            "Session %s: Player %s watching %d regions",
+            self.game_session_uuid,
+            player_id,
+            len(regions),
+        )
+        return regions
+
     def assign_colour(self, player_id: str) -> str:
         """
         Assign a colour to a player.
@@ -98,35 +376,39 @@ class GameSession:
         Returns:
             str: The assigned colour for the player
         """
-        if player_id in self.player_colours:
-            logger.info(
-                "Session %s: Player %s already has colour %s",
-                self.game_session_uuid,
-                player_id,
-                self.player_colours[player_id],
-            )
-            return self.player_colours[player_id]
+        with self.lock:
+            if player_id in self.player_colours:
+                logger.info(
+                    "Session %s: Player %s already has colour %s",
+                    self.game_session_uuid,
+                    player_id,
+                    self.player_colours[player_id],
+                )
+                return self.player_colours[player_id]
 
-        if not self.available_colours:
-            logger.error(
-                "Session %s: No colours available for player %s",
+            if not self.available_colours:
+                logger.error(
+                    "Session %s: No colours available for player %s",
+                    self.game_session_uuid,
+                    player_id,
+                )
+                raise ValueError("No colours available")
+
+            colour = self.available_colours.pop(0)
+            self.player_colours[player_id] = colour
+            self.colours_requested.add(player_id)
+            self.last_colour_request[player_id] = time.time()
+            self._log_event("colour", {"player": player_id, "colour": colour})
+            if self.phase == PHASE_CREATED:
+                self.set_phase(PHASE_COLOUR_SELECT)
+
+            logger.info(
+                "Session %s: Assigned colour %s to player %s",
                 self.game_session_uuid,
+                colour,
                 player_id,
             )
-            raise ValueError("No colours available")
-
-        colour = self.available_colours.pop(0)
-        self.player_colours[player_id] = colour
-        self.colours_requested.add(player_id)
-        self.last_colour_request[player_id] = time.time()
-
-        logger.info(
-            "Session %s: Assigned colour %s to player %s",
-            self.game_session_uuid,
-            colour,
-            player_id,
-        )
-        return colour
+            return colour
 
     def all_colours_assigned(self) -> bool:
         """
@@ -145,16 +427,38 @@ class GameSession:
             player_id (str): Unique identifier for the player
             ws (WebSocketInterface): WebSocket connection for the player
         """
-        if (
-            player_id not in self.player_websockets
-            or self.player_websockets[player_id] != ws
-        ):
-            self.player_websockets[player_id] = ws
-            logger.debug(
-                "Session %s: WebSocket registered for player %s",
-                self.game_session_uuid,
-                player_id,
-            )
+        with self.lock:
+            if (
+                player_id not in self.player_websockets
+                or self.player_websockets[player_id] != ws
+            ):
+                self.player_websockets = {**self.player_websockets, player_id: ws}
+                self.reconnect_deadline = None
+                logger.debug(
+                    "Session %s: WebSocket registered for player %s",
+                    self.game_session_uuid,
+                    player_id,
+                )
+
+    def drop_websocket(self, player_id: str) -> Optional[WebSocketInterface]:
+        """
+        Forget a player's connection without touching the rest of their state.
+
+        Args:
+            player_id (str): Unique identifier for the player
+
+        Returns:
+            Optional[WebSocketInterface]: The connection, if one was registered
+        """
+        with self.lock:
+            player_ws = self.player_websockets.get(player_id)
+            if player_ws is not None:
+                self.player_websockets = {
+                    pid: other_ws
+                    for pid, other_ws in self.player_websockets.items()
+                    if pid != player_id
+                }
+            return player_ws
 
     def get_inactive_players(self) -> List[str]:
         """
@@ -163,24 +467,57 @@ class GameSession:
         Returns:
             List[str]: List of inactive player IDs
         """
-        if self.game_started:
-            return []
-
-        current_time = time.time()
-        inactive_players = []
-        for player_id in self.player_ids:
-            if player_id not in self.colours_requested:
-                time_since_request = current_time - self.last_colour_request[player_id]
-                if time_since_request > self.colour_selection_timeout:
-                    inactive_players.append(player_id)
-                    logger.warning(
-                        "Session %s: Player %s inactive (%ds)",
-                        self.game_session_uuid,
-                        player_id,
-                        time_since_request,
+        with self.lock:
+            if self.game_started:
+                return []
+
+            current_time = time.time()
+            inactive_players = []
+            for player_id in self.player_ids:
+                if player_id not in self.colours_requested:
+                    time_since_request = (
+                        current_time - self.last_colour_request[player_id]
                     )
+                    if time_since_request > self.colour_selection_timeout:
+                        inactive_players.append(player_id)
+                        logger.warning(
+                            "Session %s: Player %s inactive (%ds)",
+                            self.game_session_uuid,
+                            player_id,
+                            time_since_request,
+                        )
+
+            return inactive_players
+
+    def disconnect_player(self, player_id: str) -> List[int]:
+        """
+        Drop a player's connection and release every tile lock they hold.
 
-        return inactive_players
+        The player stays in the session, so their claimed tiles still count
+        and they can reconnect to a running game.
+
+        Args:
+            player_id (str): Unique identifier for the player
+
+        Returns:
+            List[int]: Indices of the tiles that were unlocked
+        """
+        with self.lock:
+            self.drop_websocket(player_id)
+            released = [
+                tile for tile, owner in self.tile_locks.items() if owner == player_id
+            ]
+            for tile in released:
+                self.unlock_tile(tile, player_id)
+
+        logger.info(
+            "Session %s: Player %s disconnected, released %d tiles (%d connected)",
+            self.game_session_uuid,
+            player_id,
+            len(released),
+            len(self.player_websockets),
+        )
+        return released
 
     def remove_player(self, player_id: str) -> None:
         """
@@ -189,41 +526,48 @@ class GameSession:
         Args:
             player_id (str): Unique identifier for the player to remove
         """
-        logger.info("Session %s: Removing player %s", self.game_session_uuid, player_id)
-
-        if player_id in self.player_ids:
-            self.player_ids.remove(player_id)
-        if player_id in self.player_websockets:
-            del self.player_websockets[player_id]
-        if player_id in self.player_colours:
-            del self.player_colours[player_id]
-        if player_id in self.colours_requested:
-            self.colours_requested.remove(player_id)
-        if player_id in self.last_colour_request:
-            del self.last_colour_request[player_id]
-
-        # Remove any tile locks held by this player
-        tiles_to_unlock = [
-            tile for tile, owner in self.tile_locks.items() if owner == player_id
-        ]
-        if tiles_to_unlock:
+        with self.lock:
+            logger.info(
+                "Session %s: Removing player %s", self.game_session_uuid, player_id
+            )
+
+            if player_id in self.player_ids:
+                self.player_ids = [pid for pid in self.player_ids if pid != player_id]
+            self.drop_websocket(player_id)
+            if player_id in self.player_colours:
+                del self.player_colours[player_id]
+            if player_id in self.colours_requested:
+                self.colours_requested.remove(player_id)
+            if player_id in self.last_colour_request:
+                del self.last_colour_request[player_id]
+            if self.regions is not None:
+                self.regions.unsubscribe(player_id)
+
+            # Remove any tile locks held by this player
+            tiles_to_unlock = [
+                tile for tile, owner in self.tile_locks.items() if owner == player_id
+            ]
+            if tiles_to_unlock:
+                logger.debug(
+                    "Session %s: Unlocked %d tiles for player %s",
+                    self.game_session_uuid,
+                    len(tiles_to_unlock),
+                    player_id,
+                )
+
+            for tile in tiles_to_unlock:
+                del self.tile_locks[tile]
+                self.lock_leases.pop(tile, None)
+
+            self._log_event("remove_player", {"player": player_id})
+
             logger.debug(
-                "Session %s: Unlocked %d tiles for player %s",
+                "Session %s: Player %s removed (%d remaining)",
                 self.game_session_uuid,
-                len(tiles_to_unlock),
                 player_id,
+                len(self.player_ids),
             )
 
-        for tile in tiles_to_unlock:
-            del self.tile_locks[tile]
-
-        logger.debug(
-            "Session %s: Player %s removed (%d remaining)",
-            self.game_session_uuid,
-            player_id,
-            len(self.player_ids),
-        )
-
     def lock_tile(self, tile_index: int, player_id: str) -> bool:
         """
         Lock a tile for a player.
@@ -235,24 +579,32 @@ class GameSession:
         Returns:
             bool: True if locking was successful, False otherwise
         """
-        if tile_index in self.tile_locks:
+        with self.lock:
+            if tile_index in self.tile_locks:
+                self.lock_contention += 1
+                logger.debug(
+                    "Session %s: Tile %d already locked by player %s, cannot lock for player %s",
+                    self.game_session_uuid,
+                    tile_index,
+                    self.tile_locks[tile_index],
+                    player_id,
+                )
+                return False
+
+            self.tile_locks[tile_index] = player_id
+            if self.tile_lease is not None:
+                deadline = time.monotonic() + self.tile_lease
+                self.lock_leases[tile_index] = deadline
+                if self.lease_listener is not None:
+                    self.lease_listener(self, tile_index, deadline)
+            self._log_event("lock", {"tile": tile_index, "player": player_id})
             logger.debug(
-                "Session %s: Tile %d already locked by player %s, cannot lock for player %s",
+                "Session %s: Player %s locked tile %d",
                 self.game_session_uuid,
-                tile_index,
-                self.tile_locks[tile_index],
                 player_id,
+                tile_index,
             )
-            return False
-
-        self.tile_locks[tile_index] = player_id
-        logger.debug(
-            "Session %s: Player %s locked tile %d",
-            self.game_session_uuid,
-            player_id,
-            tile_index,
-        )
-        return True
+            return True
 
     def unlock_tile(self, tile_index: int, player_id: str, claim: bool = False) -> bool:
         """
@@ -264,66 +616,323 @@ class GameSession:
             claim (bool): Whether to claim ownership of the tile
 
         Returns:
-            bool: True if unlocking was successful, False otherwise
+            bool: True if unlocking was successful, False otherwise
+        """
+        with self.lock:
+            if (
+                tile_index not in self.tile_locks
+                or self.tile_locks[tile_index] != player_id
+            ):
+                logger.debug(
+                    "Session %s: Cannot unlock tile %d for player %s, tile not locked by this player",
+                    self.game_session_uuid,
+                    tile_index,
+                    player_id,
+                )
+                return False
+
+            del self.tile_locks[tile_index]
+            self.lock_leases.pop(tile_index, None)
+
+            if claim:
+                self.tile_owners[tile_index] = player_id
+                self._log_event("claim", {"tile": tile_index, "player": player_id})
+                logger.info(
+                    "Session %s: Player %s claimed tile %d",
+                    self.game_session_uuid,
+                    player_id,
+                    tile_index,
+                )
+
+                # Check for win condition; a claim racing with the winning one
+                # does not win a second time
+                player_tiles = sum(
+                    1 for owner in self.tile_owners.values() if owner == player_id
+                )
+
+                if player_tiles >= self.tiles_to_win and not self.game_ended:
+                    self.game_ended = True
+                    self.winner = player_id
+                    self._log_event("win", {"player": player_id})
+                    self.set_phase(PHASE_ENDED)
+                    logger.info(
+                        "Session %s: Player %s wins with %d tiles.",
+                        self.game_session_uuid,
+                        player_id,
+                        player_tiles,
+                    )
+            else:
+                self._log_event("unlock", {"tile": tile_index, "player": player_id})
+                logger.debug(
+                    "Session %s: Player %s unlocked tile %d without claiming",
+                    self.game_session_uuid,
+                    player_id,
+                    tile_index,
+                )
+
+            return True
+
+    def is_valid_tile(self, tile_index) -> bool:
+        """
+        Check that a client supplied tile index is an integer on the board.
+
+        Args:
+            tile_index: Value of the request's index field
+
+        Returns:
+            bool: True if the index is an int in [0, num_tiles)
+        """
+        return (
+            isinstance(tile_index, int)
+            and not isinstance(tile_index, bool)
+            and 0 <= tile_index < self.num_tiles
+        )
+
+    def expire_lease(self, tile_index: int, deadline: float) -> Optional[str]:
+        """
+        Release a tile lock whose lease has run out.
+
+        Args:
+            tile_index (int): Index of the locked tile
+            deadline (float): Lease deadline that came due
+
+        Returns:
+            Optional[str]: Player that held the lock, or None if the lock was
+                already released or re-granted with a new lease
+        """
+        with self.lock:
+            if self.lock_leases.get(tile_index) != deadline:
+                return None
+            player_id = self.tile_locks[tile_index]
+            self.unlock_tile(tile_index, player_id)
+            self.lease_expiries += 1
+            logger.info(
+                "Session %s: Lease on tile %d held by player %s expired",
+                self.game_session_uuid,
+                tile_index,
+                player_id,
+            )
+            return player_id
+
+    def has_enough_players(self, min_players: int = 2) -> bool:
+        """
+        Check if the game session has enough players to continue.
+
+        Args:
+            min_players (int): Minimum number of players required
+
+        Returns:
+            bool: True if enough players, False otherwise
+        """
+        return len(self.player_ids) >= min_players
+
+    def has_human_players(self) -> bool:
+        """
+        Check if any player in the game session is not a bot.
+
+        Returns:
+            bool: True if at least one human player remains, False otherwise
+        """
+        return any(player_id not in self.bot_ids for player_id in self.player_ids)
+
+
+class SessionLifecycle:
+    """
+    Tracks session phases and evicts sessions when their phase deadline passes.
+
+    Deadlines live in a min-heap with at most one live entry per session, so
+    finding expired sessions costs O(log n) per expiry instead of a scan over
+    every session. Activity only moves a session's deadline later, which is
+    handled lazily: an entry that comes due early is re-pushed with the real
+    deadline. Transitions that move a deadline earlier push a new entry and
+    invalidate the old one. Heap entries hold session UUIDs rather than
+    sessions, and the heap is rebuilt once stale entries outnumber live ones,
+    so evicted sessions are never kept alive by the heap.
+
+    Shared Object Handling: Not synchronized itself; every method must be
+    called with the owning GameServerState lock held.
+    """
+
+    def __init__(self, ended_ttl: float = 30.0, idle_ttl: float = 600.0):
+        """
+        Initialize the lifecycle manager.
+
+        Args:
+            ended_ttl (float): Seconds an ended session is kept before eviction
+            idle_ttl (float): Seconds without activity before a running session is abandoned
+        """
+        self.ended_ttl = ended_ttl
+        self.idle_ttl = idle_ttl
+        self.phase_counts: Dict[str, int] = {phase: 0 for phase in PHASES}
+        self._sessions: Dict[str, GameSession] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._sequence = 0
+
+    def deadline(self, session: GameSession) -> float:
+        """
+        Get the monotonic time at which a session expires in its current phase.
+
+        Sessions still selecting colours are normally cleaned up by the
+        GameSessionWatchdog; twice the colour selection timeout is a backstop.
+        Sessions restored after a restart expire at their reconnect deadline
+        if no player has reconnected by then.
+
+        Args:
+            session (GameSession): The session
+
+        Returns:
+            float: Expiry deadline
+        """
+        if session.phase == PHASE_ENDED:
+            deadline = session.phase_changed_at + self.ended_ttl
+        elif session.phase == PHASE_RUNNING:
+            deadline = session.last_activity + self.idle_ttl
+        else:
+            deadline = session.last_activity + 2 * session.colour_selection_timeout
+        if session.reconnect_deadline is not None:
+            deadline = min(deadline, session.reconnect_deadline)
+        return deadline
+
+    def _push(self, session: GameSession, deadline: float) -> None:
+        session.lifecycle_deadline = deadline
+        self._sequence += 1
+        heapq.heappush(
+            self._heap, (deadline, self._sequence, session.game_session_uuid)
+        )
+
+        if len(self._heap) > 2 * len(self._sessions) + 64:
+            self._heap = [
+                (tracked.lifecycle_deadline, sequence, game_session_uuid)
+                for sequence, (game_session_uuid, tracked) in enumerate(
+                    self._sessions.items()
+                )
+                if tracked.lifecycle_deadline is not None
+            ]
+            heapq.heapify(self._heap)
+
+    def track(self, session: GameSession) -> None:
+        """
+        Start tracking a newly created or restored session.
+
+        Args:
+            session (GameSession): The session
+        """
+        self.phase_counts[session.phase] += 1
+        self._sessions[session.game_session_uuid] = session
+        self._push(session, self.deadline(session))
+
+    def transition(self, session: GameSession, old_phase: str) -> None:
+        """
+        Account for a phase change and bring the session's deadline forward if needed.
+
+        Args:
+            session (GameSession): The session
+            old_phase (str): Phase the session left
+        """
+        self.phase_counts[old_phase] -= 1
+        self.phase_counts[session.phase] += 1
+        if session.phase == PHASE_EVICTED:
+            session.lifecycle_deadline = None
+            self._sessions.pop(session.game_session_uuid, None)
+            return
+
+        deadline = self.deadline(session)
+        if session.lifecycle_deadline is None or deadline < session.lifecycle_deadline:
+            self._push(session, deadline)
+
+    def pop_expired(self, now: float) -> List[GameSession]:
+        """
+        Remove and return every session whose deadline has passed.
+
+        Args:
+            now (float): Current monotonic time
+
+        Returns:
+            List[GameSession]: Expired sessions, still registered with the server state
         """
-        if (
-            tile_index not in self.tile_locks
-            or self.tile_locks[tile_index] != player_id
-        ):
-            logger.debug(
-                "Session %s: Cannot unlock tile %d for player %s, tile not locked by this player",
-                self.game_session_uuid,
-                tile_index,
-                player_id,
-            )
-            return False
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, _, game_session_uuid = heapq.heappop(self._heap)
+            session = self._sessions.get(game_session_uuid)
+            if session is None or deadline != session.lifecycle_deadline:
+                # Superseded by an earlier entry, or the session was evicted
+                continue
 
-        del self.tile_locks[tile_index]
+            actual = self.deadline(session)
+            if actual > now:
+                self._push(session, actual)
+            else:
+                session.lifecycle_deadline = None
+                expired.append(session)
+        return expired
 
-        if claim:
-            self.tile_owners[tile_index] = player_id
-            logger.info(
-                "Session %s: Player %s claimed tile %d",
-                self.game_session_uuid,
-                player_id,
-                tile_index,
-            )
 
-            # Check for win condition
-            player_tiles = sum(
-                1 for owner in self.tile_owners.values() if owner == player_id
-            )
+class TileLeaseScheduler:
+    """
+    Deadline scheduler for tile lock leases.
 
-            if player_tiles >= self.tiles_to_win:
-                self.game_ended = True
-                self.winner = player_id
-                logger.info(
-                    "Session %s: Player %s wins with %d tiles.",
-                    self.game_session_uuid,
-                    player_id,
-                    player_tiles,
-                )
-        else:
-            logger.debug(
-                "Session %s: Player %s unlocked tile %d without claiming",
-                self.game_session_uuid,
-                player_id,
-                tile_index,
-            )
+    Leases are kept in a min-heap, so granting one and finding expired ones
+    each cost O(log n). Locks released before their lease runs out are not
+    removed from the heap; their entries are discarded when they come due,
+    which bounds the heap by the locks granted within one lease period.
 
-        return True
+    Shared Object Handling: The heap is shared between request threads
+    granting leases and the thread waiting for expiries, guarded by a
+    condition variable.
+    """
 
-    def has_enough_players(self, min_players: int = 2) -> bool:
+    def __init__(self):
         """
-        Check if the game session has enough players to continue.
+        Initialize the lease scheduler.
+        """
+        self.condition = threading.Condition()
+        self._heap: List[Tuple[float, int, str, int]] = []
+        self._sequence = 0
+
+    def schedule(self, session: GameSession, tile_index: int, deadline: float) -> None:
+        """
+        Add a lease deadline. Installed as every session's lease listener.
 
         Args:
-            min_players (int): Minimum number of players required
+            session (GameSession): Session the tile belongs to
+            tile_index (int): Index of the locked tile
+            deadline (float): Monotonic time the lease expires
+        """
+        with self.condition:
+            self._sequence += 1
+            heapq.heappush(
+                self._heap,
+                (deadline, self._sequence, session.game_session_uuid, tile_index),
+            )
+            if self._heap[0][1] == self._sequence:
+                self.condition.notify()
+
+    def wait_expired(self) -> List[Tuple[str, int, float]]:
+        """
+        Block until at least one lease deadline has passed.
 
         Returns:
-            bool: True if enough players, False otherwise
+            List[Tuple[str, int, float]]: Game session UUID, tile index and
+                deadline of every lease that came due
         """
-        return len(self.player_ids) >= min_players
+        with self.condition:
+            while True:
+                if not self._heap:
+                    self.condition.wait()
+                    continue
+                wait = self._heap[0][0] - time.monotonic()
+                if wait > 0:
+                    self.condition.wait(wait)
+                    continue
+
+                now = time.monotonic()
+                expired = []
+                while self._heap and self._heap[0][0] <= now:
+                    deadline, _, game_session_uuid, tile_index = heapq.heappop(
+                        self._heap
+                    )
+                    expired.append((game_session_uuid, tile_index, deadline))
+                return expired
 
 
 class GameServerState(ServerState):
@@ -332,15 +941,78 @@ class GameServerState(ServerState):
 
     Shared Object Handling: Contains a dictionary of game sessions that
     can be accessed by multiple threads representing different player
-    connections. All access is synchronized using the inherited lock.
+    connections. All modifications are synchronized using the inherited
+    lock. Looking up a session, which every request does, is a single
+    dictionary read and takes no lock, so request threads of different
+    games do not contend; dictionary reads are atomic with and without the
+    GIL. Each session is guarded by its own lock.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        event_log: Optional[EventLog] = None,
+        recorder: Optional[GameRecorder] = None,
+        lifecycle: Optional[SessionLifecycle] = None,
+        tile_lease: Optional[float] = None,
+        region_size: Optional[int] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        rematch_window: Optional[float] = None,
+        tracer: Optional[MatchTracer] = None,
+    ):
         """
         Initialize game server state.
+
+        Args:
+            event_log (Optional[EventLog]): Log that persists session state transitions
+            recorder (Optional[GameRecorder]): Recorder capturing inbound messages and
+                server-made transitions per session
+            lifecycle (Optional[SessionLifecycle]): Phase tracking and eviction deadlines
+            tile_lease (Optional[float]): Seconds a tile lock is held before it expires,
+                locks never expire if None
+            region_size (Optional[int]): Width of the board regions players subscribe
+                to, every tile event goes to every player if None
+            rate_limiter (Optional[RateLimiter]): Per-connection request rate limits,
+                requests are not rate limited if None
+            rematch_window (Optional[float]): Seconds after a game ends in which its
+                players can vote for a rematch, rematches are disabled if None
+            tracer (Optional[MatchTracer]): Tracer of players' way into games,
+                shared with the matchmaker state; no tracing if None
         """
         super().__init__()
         self.game_sessions: Dict[str, GameSession] = {}
+        self.event_log = event_log
+        self.recorder = recorder
+        self.lifecycle = lifecycle or SessionLifecycle()
+        self.evicted_sessions = 0
+        self.tile_lease = tile_lease
+        self.region_size = region_size
+        self.leases = TileLeaseScheduler()
+        self.lease_expiries = 0
+        self.lock_contention = 0
+        self.rate_limiter = rate_limiter
+        self.rejected: Dict[str, int] = {}
+        self.rematch_window = rematch_window
+        self.rematches = 0
+        self.tracer = tracer
+        # Called with (player_id, player_name, ws) for players going back to the
+        # matchmaking queue after a game; returns True if it took over the connection
+        self.requeue_listener: Optional[
+            Callable[[str, str, WebSocketInterface], bool]
+        ] = None
+        # Reverse index so a closed connection finds its session and player in O(1)
+        self.websocket_players: Dict[WebSocketInterface, Tuple[str, str]] = {}
+
+    def _phase_changed(self, session: GameSession, old_phase: str) -> None:
+        """
+        Phase listener installed on every session.
+
+        Args:
+            session (GameSession): The session that changed phase
+            old_phase (str): Phase the session left
+        """
+        with self.lock:
+            if session.game_session_uuid in self.game_sessions:
+                self.lifecycle.transition(session, old_phase)
 
     def create_game_session(
         self,
@@ -360,8 +1032,24 @@ class GameServerState(ServerState):
             num_tiles (int): Total number of tiles in the game
             colour_selection_timeout (int): Timeout for colour selection phase in seconds
         """
+        session = GameSession(
+            game_session_uuid,
+            player_ids,
+            player_names,
+            num_tiles,
+            colour_selection_timeout,
+            self.event_log,
+            self.tile_lease,
+            self.region_size,
+        )
+        session.phase_listener = self._phase_changed
+        session.lease_listener = self.leases.schedule
         with self.lock:
-            self.game_sessions[game_session_uuid] = GameSession(
+            self.game_sessions[game_session_uuid] = session
+            self.lifecycle.track(session)
+
+        if self.recorder is not None:
+            self.recorder.record_session(
                 game_session_uuid,
                 player_ids,
                 player_names,
@@ -369,6 +1057,46 @@ class GameServerState(ServerState):
                 colour_selection_timeout,
             )
 
+    def restore_game_sessions(
+        self, records: Dict[str, Dict], reconnect_window: float = 60.0
+    ) -> None:
+        """
+        Rebuild game sessions recovered from the event log after a restart.
+
+        Restored sessions have no connections. A session that none of its
+        players reconnects to within the reconnect window is evicted like an
+        abandoned one, which also ends it in the event log.
+
+        Args:
+            records (Dict[str, Dict]): Session records keyed by game session UUID
+            reconnect_window (float): Seconds players have to reconnect to a
+                restored session
+        """
+        reconnect_deadline = time.monotonic() + reconnect_window
+        with self.lock:
+            for game_session_uuid, record in records.items():
+                session = GameSession(
+                    game_session_uuid,
+                    list(record["player_ids"]),
+                    dict(record["player_names"]),
+                    record["num_tiles"],
+                    record["colour_selection_timeout"],
+                    tile_lease=self.tile_lease,
+                    region_size=self.region_size,
+                )
+                session.restore(record)
+                session.event_log = self.event_log
+                session.phase_listener = self._phase_changed
+                session.lease_listener = self.leases.schedule
+                session.reconnect_deadline = reconnect_deadline
+                self.game_sessions[game_session_uuid] = session
+                self.lifecycle.track(session)
+                logger.info(
+                    "Session %s: Game restored (%d tiles claimed)",
+                    game_session_uuid,
+                    len(session.tile_owners),
+                )
+
     def get_game_session(self, game_session_uuid: str) -> Optional[GameSession]:
         """
         Get a game session by UUID.
@@ -379,8 +1107,7 @@ class GameServerState(ServerState):
         Returns:
             Optional[GameSession]: Game session object or None if not found
         """
-        with self.lock:
-            return self.game_sessions.get(game_session_uuid)
+        return self.game_sessions.get(game_session_uuid)
 
     def remove_game_session(self, game_session_uuid: str) -> None:
         """
@@ -391,14 +1118,349 @@ class GameServerState(ServerState):
         """
         with self.lock:
             if game_session_uuid in self.game_sessions:
-                del self.game_sessions[game_session_uuid]
-                logger.info("Session %s: Game removed", game_session_uuid)
+                session = self.game_sessions.pop(game_session_uuid)
+                for player_ws in session.player_websockets.values():
+                    self.websocket_players.pop(player_ws, None)
+                old_phase = session.phase
+                session.phase = PHASE_EVICTED
+                self.lifecycle.transition(session, old_phase)
+                self.evicted_sessions += 1
+                self.lease_expiries += session.lease_expiries
+                self.lock_contention += session.lock_contention
+                if self.event_log is not None:
+                    self.event_log.append(game_session_uuid, "end", {})
+                if self.recorder is not None:
+                    self.recorder.close_session(
+                        game_session_uuid, session.tile_owners, session.winner
+                    )
+                logger.info(
+                    "Session %s: Game removed (%d lease expiries, %d contended locks)",
+                    game_session_uuid,
+                    session.lease_expiries,
+                    session.lock_contention,
+                )
             else:
                 logger.warning(
                     "Attempted to remove non-existent game session %s",
                     game_session_uuid,
                 )
 
+    def register_player_websocket(
+        self, session: GameSession, player_id: str, ws: WebSocketInterface
+    ) -> None:
+        """
+        Register a player's connection with their session and index it for disconnects.
+
+        Args:
+            session (GameSession): The player's game session
+            player_id (str): Unique identifier for the player
+            ws (WebSocketInterface): WebSocket connection for the player
+        """
+        session.register_websocket(player_id, ws)
+        with self.lock:
+            self.websocket_players[ws] = (session.game_session_uuid, player_id)
+
+    def unregister_websocket(
+        self, ws: WebSocketInterface
+    ) -> Optional[Tuple[GameSession, str]]:
+        """
+        Forget a connection, typically because it closed.
+
+        Args:
+            ws (WebSocketInterface): The connection
+
+        Returns:
+            Optional[Tuple[GameSession, str]]: The session and player the connection
+                belonged to, if the session still exists
+        """
+        with self.lock:
+            binding = self.websocket_players.pop(ws, None)
+            if binding is None:
+                return None
+            game_session_uuid, player_id = binding
+            session = self.game_sessions.get(game_session_uuid)
+        if session is None:
+            return None
+        return session, player_id
+
+    def end_game_insufficient_players(self, session: GameSession) -> None:
+        """
+        End a game session because too few players remain.
+
+        Removes the session, then notifies and disconnects the remaining players.
+
+        Args:
+            session (GameSession): The game session to end
+        """
+        game_session_uuid = session.game_session_uuid
+        logger.info(
+            "Session %s: Ending game, insufficient players",
+            game_session_uuid,
+        )
+
+        # Remove the game session first, so the disconnects caused by closing
+        # the remaining connections below find no session to act on
+        self.remove_game_session(game_session_uuid)
+
+        not_enough_players_message = {
+            "command": "not_enough_players",
+        }
+
+        # Notify remaining players
+        for player_id, player_ws in list(session.player_websockets.items()):
+            try:
+                player_ws.send(json_codec.encode(not_enough_players_message))
+                player_ws.close()
+                logger.debug("Insufficient players notice sent to player %s", player_id)
+            except (ConnectionError, OSError, BrokenPipeError):
+                logger.debug("Insufficient players notice failed: player %s", player_id)
+
+        session.release()
+
+    def expire_tile_lease(
+        self, game_session_uuid: str, tile_index: int, deadline: float
+    ) -> Optional[Tuple[GameSession, str]]:
+        """
+        Release a tile lock whose lease deadline came due.
+
+        Args:
+            game_session_uuid (str): Session the tile belongs to
+            tile_index (int): Index of the locked tile
+            deadline (float): Lease deadline that came due
+
+        Returns:
+            Optional[Tuple[GameSession, str]]: The session and the player whose
+                lock expired, or None if the lock was released in the meantime
+        """
+        session = self.get_game_session(game_session_uuid)
+        if session is None or session.game_ended:
+            return None
+        player_id = session.expire_lease(tile_index, deadline)
+        if player_id is None:
+            return None
+        if self.recorder is not None:
+            self.recorder.record_event(
+                game_session_uuid,
+                "lease_expired",
+                {"tile": tile_index, "player": player_id},
+            )
+        return session, player_id
+
+    def evict_expired_sessions(self) -> List[Tuple[GameSession, str]]:
+        """
+        Evict every session whose lifecycle deadline has passed.
+
+        Ended sessions are evicted after the ended TTL; sessions abandoned
+        before or during play are evicted after their inactivity deadline,
+        and restored sessions nobody reconnected to after their reconnect window.
+
+        Returns:
+            List[Tuple[GameSession, str]]: Evicted sessions and the phase they expired
+                in, with connection references still in place so the caller can close them
+        """
+        with self.lock:
+            expired = self.lifecycle.pop_expired(time.monotonic())
+
+        evicted = []
+        for session in expired:
+            phase = session.phase
+            if session.reconnect_deadline is not None:
+                logger.info(
+                    "Session %s: No player reconnected after the restart",
+                    session.game_session_uuid,
+                )
+            elif phase != PHASE_ENDED:
+                logger.info(
+                    "Session %s: Abandoned in phase %s",
+                    session.game_session_uuid,
+                    phase,
+                )
+            self.remove_game_session(session.game_session_uuid)
+            evicted.append((session, phase))
+        return evicted
+
+    def vote_rematch(
+        self, session: GameSession, player_id: str, accept: bool
+    ) -> Tuple[Optional[GameSession], List[str]]:
+        """
+        Record a player's rematch vote on an ended game.
+
+        The rematch starts once every player has accepted, as a new session
+        with the same players and connections. The first decline makes the
+        rematch impossible; every player who had already voted, the decliner
+        included, and every player who votes afterwards goes back to the
+        matchmaking queue.
+
+        Args:
+            session (GameSession): The ended game session
+            player_id (str): Unique identifier for the voting player
+            accept (bool): Whether the player wants a rematch
+
+        Returns:
+            Tuple[Optional[GameSession], List[str]]: The new session if this vote
+                completed the rematch, and the players to requeue
+        """
+        with self.lock:
+            if self.rematch_window is None or session.bot_ids:
+                raise ValueError("Rematch is disabled")
+            if not session.game_ended:
+                raise ValueError("Game has not ended")
+            if time.monotonic() > session.phase_changed_at + self.rematch_window:
+                raise ValueError("Rematch window closed")
+            if player_id in session.rematch_votes:
+                raise ValueError("Rematch vote already cast")
+            session.rematch_votes[player_id] = accept
+
+            if not session.rematch_open:
+                return None, [player_id]
+            if not accept:
+                session.rematch_open = False
+                return None, list(session.rematch_votes)
+            if len(session.rematch_votes) < len(session.player_ids):
+                return None, []
+            connected = all(
+                player_ws is not None and not player_ws.closed
+                for player_ws in (
+                    session.player_websockets.get(pid) for pid in session.player_ids
+                )
+            )
+            session.rematch_open = False
+            if not connected:
+                return None, list(session.rematch_votes)
+            self.rematches += 1
+
+        return self._start_rematch(session), []
+
+    def _start_rematch(self, session: GameSession) -> GameSession:
+        """
+        Create a new session for the players of an ended one, moving their connections.
+
+        Args:
+            session (GameSession): The ended game session, which is removed
+
+        Returns:
+            GameSession: The new game session
+        """
+        connections = dict(session.player_websockets)
+        self.remove_game_session(session.game_session_uuid)
+
+        rematch_uuid = str(uuid.uuid4())
+        self.create_game_session(
+            rematch_uuid,
+            list(session.player_ids),
+            dict(session.player_names),
+            session.num_tiles,
+            session.colour_selection_timeout,
+        )
+        rematch = self.get_game_session(rematch_uuid)
+        for player_id, player_ws in connections.items():
+            self.register_player_websocket(rematch, player_id, player_ws)
+        session.release()
+        logger.info(
+            "Session %s: Rematch started as session %s",
+            session.game_session_uuid,
+            rematch_uuid,
+        )
+        return rematch
+
+    def requeue_players(self, session: GameSession, player_ids: List[str]) -> None:
+        """
+        Send players of an ended game back to the matchmaking queue.
+
+        Players whose connection the requeue listener takes over are detached
+        from the session; the others are told to enqueue with the matchmaker.
+
+        Args:
+            session (GameSession): The ended game session
+            player_ids (List[str]): Players to requeue
+        """
+        for player_id in player_ids:
+            player_ws = session.player_websockets.get(player_id)
+            same_connection = False
+            if self.requeue_listener is not None and player_ws is not None:
+                same_connection = self.requeue_listener(
+                    player_id, session.player_names[player_id], player_ws
+                )
+            if same_connection:
+                session.drop_websocket(player_id)
+                with self.lock:
+                    self.websocket_players.pop(player_ws, None)
+            if player_ws is not None:
+                requeued_message = {
+                    "command": "requeued",
+                    "same_connection": same_connection,
+                }
+                player_ws.send(json_codec.encode(requeued_message))
+            logger.info(
+                "Session %s: Player %s requeued", session.game_session_uuid, player_id
+            )
+
+    def close_rematch(self, session: GameSession) -> None:
+        """
+        Give up on a rematch whose window passed, requeueing the players who accepted
+        and telling the others.
+
+        Args:
+            session (GameSession): An ended game session
+        """
+        with self.lock:
+            if (
+                self.rematch_window is None
+                or session.bot_ids
+                or not session.rematch_open
+                or time.monotonic() <= session.phase_changed_at + self.rematch_window
+            ):
+                return
+            session.rematch_open = False
+            accepted = [pid for pid, accept in session.rematch_votes.items() if accept]
+
+        self.requeue_players(session, accepted)
+        rematch_cancelled_message = {"command": "rematch_cancelled"}
+        for player_id, player_ws in list(session.player_websockets.items()):
+            if player_id not in accepted:
+                player_ws.send(json_codec.encode(rematch_cancelled_message))
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get session counts and estimated memory per lifecycle phase.
+
+        Returns:
+            Dict[str, int]: sessions_<phase> and bytes_<phase> entries, evicted,
+                lease expiry and lock contention totals, and rejected_<reason> counts
+        """
+        with self.lock:
+            stats = {
+                f"sessions_{phase}": count
+                for phase, count in self.lifecycle.phase_counts.items()
+                if phase != PHASE_EVICTED
+            }
+            stats.update({f"bytes_{phase}": 0 for phase in PHASES[:-1]})
+            for session in self.game_sessions.values():
+                stats[f"bytes_{session.phase}"] += session.memory_estimate()
+            stats["evicted"] = self.evicted_sessions
+            stats["lease_expiries"] = self.lease_expiries + sum(
+                session.lease_expiries for session in self.game_sessions.values()
+            )
+            stats["lock_contention"] = self.lock_contention + sum(
+                session.lock_contention for session in self.game_sessions.values()
+            )
+            stats["rematches"] = self.rematches
+            stats["rejected"] = sum(self.rejected.values())
+            stats.update(
+                {f"rejected_{reason}": count for reason, count in self.rejected.items()}
+            )
+        return stats
+
+    def reject(self, reason: str) -> None:
+        """
+        Count a request rejected before it was processed.
+
+        Args:
+            reason (str): Rejection reason, e.g. rate_limited or invalid_index
+        """
+        with self.lock:
+            self.rejected[reason] = self.rejected.get(reason, 0) + 1
+
     def is_player_in_session(self, game_session_uuid: str, player_id: str) -> bool:
         """
         Check if a player belongs to a game session.
@@ -414,6 +1476,83 @@ class GameServerState(ServerState):
         return session is not None and player_id in session.player_ids
 
 
+def start_game_if_ready(
+    session: GameSession, tracer: Optional[MatchTracer] = None
+) -> None:
+    """
+    Start the game and broadcast the players once every player has a colour.
+
+    Also called for colour requests in a running game, so a reconnecting
+    player receives the players again.
+
+    Args:
+        session (GameSession): The game session
+        tracer (Optional[MatchTracer]): Tracer marking the broadcast for each player
+    """
+    with session.lock:
+        if not session.all_colours_assigned():
+            return
+        # Prepare player infos for all players
+        players_info = {}
+        for pid in session.player_ids:
+            players_info[pid] = {
+                "colour": session.player_colours[pid],
+                "name": session.player_names[pid],
+            }
+    logger.info(
+        "Session %s: All players have colours assigned, starting game",
+        session.game_session_uuid,
+    )
+
+    # Broadcast current players to all
+    current_players_message = {
+        "command": "current_players",
+        "players": players_info,
+    }
+    if tracer is not None:
+        for pid in players_info:
+            tracer.mark(pid, "current_players", session.game_session_uuid)
+    session.broadcast_message(current_players_message)
+    session.start_game()
+    logger.info(
+        "Session %s: Game started with players: %s",
+        session.game_session_uuid,
+        list(players_info.keys()),
+    )
+
+
+def broadcast_game_win(
+    session: GameSession, rematch_window: Optional[float] = None
+) -> None:
+    """
+    Send the final scoreboard of an ended game to its players.
+
+    Args:
+        session (GameSession): The ended game session
+        rematch_window (Optional[float]): Seconds the players have to vote for a
+            rematch, included in the message if rematches are enabled
+    """
+    with session.lock:
+        owners = list(session.tile_owners.values())
+    scoreboard = []
+    for pid in session.player_ids:
+        score = sum(1 for owner in owners if owner == pid)
+        scoreboard.append(
+            {
+                "uuid": pid,
+                "name": session.player_names[pid],
+                "score": score,
+            }
+        )
+
+    game_win_message = {"command": "game_win", "players": scoreboard}
+    # Bots never vote, so games with bots offer no rematch
+    if rematch_window is not None and not session.bot_ids:
+        game_win_message["rematch_window"] = rematch_window
+    session.broadcast_message(game_win_message)
+    logger.info("Session %s: Game ended", session.game_session_uuid)
+
+
 def game_server_request_handler(
     ws: WebSocketInterface,
     addr: Tuple[str, int],
@@ -435,23 +1574,43 @@ def game_server_request_handler(
         server_state (GameServerState): Shared game server state
     """
     try:
-        request: Dict = json.loads(data)
+        # Bound the work a client can cause before parsing its message
+        rate_limiter = server_state.rate_limiter
+        if rate_limiter is not None and not rate_limiter.allow(ws, MESSAGE_BUCKET):
+            _reject_rate_limited(ws, addr, server_state)
+            return
+        if len(data) > MAX_REQUEST_LENGTH:
+            server_state.reject("oversized")
+            raise ValueError("Request too large")
+
+        request: Dict = json_codec.decode(data)
+        if not isinstance(request, dict):
+            server_state.reject("malformed")
+            raise ValueError("Request must be a JSON object")
 
         # Extract required fields
         game_session_uuid = request.get("game_session_uuid")
         player_id = request.get("uuid")
         command = request.get("command")
 
-        if not game_session_uuid:
+        if not game_session_uuid or not isinstance(game_session_uuid, str):
             logger.warning("Request missing game session UUID from %s", addr)
             raise ValueError("Missing game session UUID")
-        if not player_id:
+        if not player_id or not isinstance(player_id, str):
             logger.warning("Request missing player UUID from %s", addr)
             raise ValueError("Missing player UUID")
-        if not command:
+        if not command or not isinstance(command, str):
             logger.warning("Request missing command from %s", addr)
             raise ValueError("Missing command")
 
+        if rate_limiter is not None and not rate_limiter.allow(ws, command):
+            _reject_rate_limited(ws, addr, server_state)
+            return
+
+        # Replays run without rate limits, so only messages past them are recorded
+        if server_state.recorder is not None:
+            server_state.recorder.record_message(game_session_uuid, addr, data)
+
         # Verify player belongs to game session
         if not server_state.is_player_in_session(game_session_uuid, player_id):
             logger.warning(
@@ -471,7 +1630,37 @@ def game_server_request_handler(
             raise ValueError("Game session not found")
 
         # Register websocket for this player
-        session.register_websocket(player_id, ws)
+        if session.player_websockets.get(player_id) is not ws:
+            server_state.register_player_websocket(session, player_id, ws)
+        session.touch()
+
+        if command == "rematch":
+            accept = request.get("accept", True)
+            if not isinstance(accept, bool):
+                raise ValueError("Rematch accept must be a boolean")
+            rematch, requeue = server_state.vote_rematch(session, player_id, accept)
+            reply = {
+                "command": "rematch_response",
+                "status": "success",
+            }
+            ws.send(json_codec.encode(reply))
+            session.broadcast_message(
+                {"command": "rematch_vote", "uuid": player_id, "accept": accept},
+                exclude_player=player_id,
+            )
+
+            if rematch is not None:
+                rematch_start_message = {
+                    "command": "rematch_start",
+                    "game_session_uuid": rematch.game_session_uuid,
+                    "lobby_size": len(rematch.player_ids),
+                    "board_size": rematch.num_tiles,
+                    "colour_selection_timeout": rematch.colour_selection_timeout,
+                }
+                rematch.broadcast_message(rematch_start_message)
+            elif requeue:
+                server_state.requeue_players(session, requeue)
+            return
 
         if session.game_ended:
             logger.warning(
@@ -490,13 +1679,21 @@ def game_server_request_handler(
 
         # Handle different commands
         if command == "pen_colour_request":
+            tracer = server_state.tracer
+            if tracer is not None:
+                if ws.accepted is not None:
+                    tracer.mark(player_id, "connect", game_session_uuid, ws.accepted)
+                    tracer.mark(
+                        player_id, "handshake", game_session_uuid, ws.established
+                    )
+                tracer.mark(player_id, "colour_request", game_session_uuid)
             colour = session.assign_colour(player_id)
             reply = {
                 "command": "pen_colour_response",
                 "status": "success",
                 "colour": colour,
             }
-            ws.send(json.dumps(reply))
+            ws.send(json_codec.encode(reply))
             logger.debug(
                 "Session %s: Colour response %s sent to player %s",
                 game_session_uuid,
@@ -504,32 +1701,7 @@ def game_server_request_handler(
                 player_id,
             )
 
-            # Check if all players have colours assigned
-            if session.all_colours_assigned():
-                logger.info(
-                    "Session %s: All players have colours assigned, starting game",
-                    game_session_uuid,
-                )
-                # Prepare player infos for all players
-                players_info = {}
-                for pid in session.player_ids:
-                    players_info[pid] = {
-                        "colour": session.player_colours[pid],
-                        "name": session.player_names[pid],
-                    }
-
-                # Broadcast current players to all
-                current_players_message = {
-                    "command": "current_players",
-                    "players": players_info,
-                }
-                session.broadcast_message(current_players_message)
-                session.game_started = True
-                logger.info(
-                    "Session %s: Game started with players: %s",
-                    game_session_uuid,
-                    list(players_info.keys()),
-                )
+            start_game_if_ready(session, tracer)
 
         elif command == "pen_down":
             tile_index = request.get("index")
@@ -540,6 +1712,11 @@ def game_server_request_handler(
                     player_id,
                 )
                 raise ValueError("Missing tile index")
+            if not session.is_valid_tile(tile_index):
+                server_state.reject("invalid_index")
+                raise ValueError("Invalid tile index")
+            if server_state.tracer is not None:
+                server_state.tracer.mark_pen(player_id)
 
             if not session.lock_tile(tile_index, player_id):
                 logger.warning(
@@ -554,7 +1731,7 @@ def game_server_request_handler(
             reply = {
                 "status": "success",
             }
-            ws.send(json.dumps(reply))
+            ws.send(json_codec.encode(reply))
 
             # Broadcast to other players
             broadcast_message = {
@@ -562,7 +1739,7 @@ def game_server_request_handler(
                 "index": tile_index,
                 "colour": session.player_colours[player_id],
             }
-            session.broadcast_message(broadcast_message, player_id)
+            session.broadcast_tile_message(broadcast_message, tile_index, player_id)
             logger.debug(
                 "Session %s: Pen down broadcast for tile %d by player %s",
                 game_session_uuid,
@@ -579,6 +1756,9 @@ def game_server_request_handler(
                     player_id,
                 )
                 raise ValueError("Missing tile index")
+            if not session.is_valid_tile(tile_index):
+                server_state.reject("invalid_index")
+                raise ValueError("Invalid tile index")
 
             claim_tile = command == "pen_up_tile_claimed"
             if not session.unlock_tile(tile_index, player_id, claim=claim_tile):
@@ -594,7 +1774,7 @@ def game_server_request_handler(
             reply = {
                 "status": "success",
             }
-            ws.send(json.dumps(reply))
+            ws.send(json_codec.encode(reply))
 
             # Broadcast to other players
             broadcast_message = {
@@ -603,7 +1783,7 @@ def game_server_request_handler(
                 "colour": session.player_colours[player_id],
                 "status": command,
             }
-            session.broadcast_message(broadcast_message, player_id)
+            session.broadcast_tile_message(broadcast_message, tile_index, player_id)
             logger.debug(
                 "Session %s: Pen up broadcast for tile %d by player %s",
                 game_session_uuid,
@@ -611,24 +1791,30 @@ def game_server_request_handler(
                 player_id,
             )
 
-            # Check for win condition
-            if session.game_ended:
-                scoreboard = []
-                for pid in session.player_ids:
-                    score = sum(
-                        1 for owner in session.tile_owners.values() if owner == pid
-                    )
-                    scoreboard.append(
-                        {
-                            "uuid": pid,
-                            "name": session.player_names[pid],
-                            "score": score,
-                        }
-                    )
+            # Check for win condition; only the winning claim announces it
+            if session.winner == player_id:
+                broadcast_game_win(session, server_state.rematch_window)
+
+        elif command == "viewport":
+            # Same check as is_valid_tile: no floats, numeric strings or bools
+            x, y, width, height = (
+                request.get(field) for field in ("x", "y", "width", "height")
+            )
+            if not all(
+                isinstance(value, int) and not isinstance(value, bool)
+                for value in (x, y, width, height)
+            ):
+                raise ValueError("Viewport requires integer x, y, width and height")
 
-                game_win_message = {"command": "game_win", "players": scoreboard}
-                session.broadcast_message(game_win_message)
-                logger.info("Session %s: Game ended", game_session_uuid)
+            regions = session.set_viewport(player_id, x, y, width, height)
+            reply = {
+                "command": "viewport_response",
+                "status": "success",
+                "board_width": session.regions.board_width,
+                "region_size": session.regions.region_size,
+                "regions": regions,
+            }
+            ws.send(json_codec.encode(reply))
 
         else:
             logger.warning(
@@ -639,17 +1825,115 @@ def game_server_request_handler(
             )
             raise ValueError("Unknown command")
 
-    except json.JSONDecodeError:
+    except json_codec.DecodeError:
         logger.error("Invalid JSON format from %s", addr)
         reply = {
             "status": "error",
             "error": "Invalid JSON format",
         }
-        ws.send(json.dumps(reply))
+        ws.send(json_codec.encode(reply))
 
     except ValueError as e:
         reply = {
             "status": "error",
             "error": str(e),
         }
-        ws.send(json.dumps(reply))
+        ws.send(json_codec.encode(reply))
+
+
+def _reject_rate_limited(
+    ws: WebSocketInterface,
+    addr: Tuple[str, int],
+    server_state: GameServerState,
+) -> None:
+    """
+    Answer a rate limited request, closing connections that ignore the limit.
+
+    Args:
+        ws (WebSocketInterface): WebSocket connection to the client
+        addr (Tuple[str, int]): Client address information
+        server_state (GameServerState): Shared game server state
+    """
+    server_state.reject("rate_limited")
+    if server_state.rate_limiter.is_abusive(ws):
+        logger.warning("Closing connection from %s, rate limit ignored", addr)
+        server_state.reject("connection_closed")
+        ws.close()
+        return
+
+    reply = {
+        "status": "error",
+        "error": "Rate limit exceeded",
+    }
+    ws.send(json_codec.encode(reply))
+
+
+def game_server_disconnect_handler(
+    ws: WebSocketInterface,
+    addr: Tuple[str, int],
+    server_state: GameServerState,
+) -> None:
+    """
+    Release a disconnected player's tile locks and end games left without players.
+
+    Socket Handling: Called by the TCPServer when a client connection ends.
+    Released tiles are broadcast to the remaining players as pen ups without a
+    claim. Before the game starts the player is removed from the session; once
+    it is running, the game ends as soon as fewer than two players are connected
+    or only bots are left.
+
+    Shared Object Handling: Looks up the session and player through the
+    GameServerState connection index and modifies the shared game session.
+
+    Args:
+        ws (WebSocketInterface): The connection that ended
+        addr (Tuple[str, int]): Client address
+        server_state (GameServerState): Shared game server state
+    """
+    if server_state.rate_limiter is not None:
+        server_state.rate_limiter.forget(ws)
+    binding = server_state.unregister_websocket(ws)
+    if binding is None:
+        return
+    session, player_id = binding
+
+    with session.lock:
+        # The player may already have reconnected on a new connection
+        if session.player_websockets.get(player_id) is not ws or session.game_ended:
+            return
+        if server_state.recorder is not None:
+            server_state.recorder.record_event(
+                session.game_session_uuid,
+                "disconnect",
+                {"conn": f"{addr[0]}:{addr[1]}"},
+            )
+        released = session.disconnect_player(player_id)
+
+    logger.info(
+        "Session %s: Player %s disconnected from %s",
+        session.game_session_uuid,
+        player_id,
+        addr,
+    )
+    colour = session.player_colours.get(player_id)
+    for tile_index in released:
+        session.broadcast_tile_message(
+            {
+                "command": "pen_up_broadcast",
+                "index": tile_index,
+                "colour": colour,
+                "status": "pen_up_tile_not_claimed",
+            },
+            tile_index,
+        )
+
+    # Bots count as connected, but a game is not left to bots alone
+    if not session.game_started:
+        session.remove_player(player_id)
+        if not session.has_enough_players(2) or not session.has_human_players():
+            server_state.end_game_insufficient_players(session)
+    elif (
+        not session.player_websockets
+        or len(session.player_websockets) + len(session.bot_ids) < 2
+    ):
+        server_state.end_game_insufficient_players(session)
@@ -0,0 +1,351 @@
+import logging
+import os
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import json_codec
+from game_server import PHASE_ENDED, GameServerState
+from matchmaker import MatchmakerState
+from sampling_profiler import AdminServer
+from server import TCPServer
+
+logger = logging.getLogger(__name__)
+
+# Environment variable holding the file descriptor of a new server process's
+# end of the handoff channel
+HANDOFF_ENV = "DRAW_AND_CONQUER_HANDOFF"
+
+# Seconds each side waits for the other during the handoff
+HANDOFF_TIMEOUT = 30.0
+
+# Seconds a queued player's place is held after the reconnect spread has passed
+RESERVATION_GRACE = 30.0
+
+
+def _send_message(
+    conn: socket.socket, message: Dict, fds: Optional[List[int]] = None
+) -> None:
+    """
+    Send a length prefixed JSON message over the handoff socket, optionally
+    passing file descriptors with SCM_RIGHTS.
+
+    Args:
+        conn (socket.socket): Connected Unix socket
+        message (Dict): Message json to send
+        fds (Optional[List[int]]): File descriptors to pass along
+    """
+    payload = json_codec.encode(message)
+    data = struct.pack(">I", len(payload)) + payload
+    if fds:
+        sent = socket.send_fds(conn, [data], fds)
+        data = data[sent:]
+    conn.sendall(data)
+
+
+def _recv_exact(conn: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Handoff connection closed")
+        data += chunk
+    return data
+
+
+def _recv_message(conn: socket.socket, max_fds: int = 0) -> Tuple[Dict, List[int]]:
+    """
+    Receive a message sent by _send_message.
+
+    Args:
+        conn (socket.socket): Connected Unix socket
+        max_fds (int): Number of file descriptors expected with the message
+
+    Returns:
+        Tuple[Dict, List[int]]: Message json and received file descriptors
+    """
+    fds: List[int] = []
+    header = b""
+    if max_fds:
+        header, fds, _, _ = socket.recv_fds(conn, 4, max_fds)
+        if not header:
+            raise ConnectionError("Handoff connection closed")
+    header += _recv_exact(conn, 4 - len(header))
+    (size,) = struct.unpack(">I", header)
+    return json_codec.decode(_recv_exact(conn, size)), fds
+
+
+class Inheritance:
+    """
+    What a server process started by a graceful restart takes over from the
+    previous process: its listening sockets and its matchmaking queue.
+
+    Socket Handling: Holds the handoff connection open until ready() tells
+    the previous process that this one is accepting connections.
+    """
+
+    def __init__(
+        self,
+        conn: socket.socket,
+        listeners: Dict[str, socket.socket],
+        queue: List[Dict],
+    ):
+        """
+        Initialize the inheritance.
+
+        Args:
+            conn (socket.socket): Handoff connection to the previous process
+            listeners (Dict[str, socket.socket]): Listening sockets keyed by server name
+            queue (List[Dict]): Matchmaking queue, front first, from drain_queue
+        """
+        self.conn = conn
+        self.listeners = listeners
+        self.queue = queue
+
+    def ready(self) -> None:
+        """
+        Tell the previous process that the servers are accepting connections.
+        """
+        try:
+            _send_message(self.conn, {"ready": True})
+        finally:
+            self.conn.close()
+
+
+def inherit() -> Optional[Inheritance]:
+    """
+    Take over from the previous server process, if this process was started by
+    a graceful restart.
+
+    Returns:
+        Optional[Inheritance]: The inherited sockets and queue, or None for a
+            normal start
+    """
+    fd = os.environ.pop(HANDOFF_ENV, None)
+    if not fd:
+        return None
+
+    conn = socket.socket(fileno=int(fd))
+    conn.settimeout(HANDOFF_TIMEOUT)
+    _send_message(conn, {"pid": os.getpid()})
+    header, fds = _recv_message(conn, max_fds=16)
+    listeners = {
+        name: socket.socket(fileno=fd) for name, fd in zip(header["listeners"], fds)
+    }
+    # The previous process stops accepting, then sends the queue as it stood
+    message, _ = _recv_message(conn)
+    logger.info(
+        "Took over %d listening sockets and %d queued players from process %d",
+        len(listeners),
+        len(message["queue"]),
+        header["pid"],
+    )
+    return Inheritance(conn, listeners, message["queue"])
+
+
+class GracefulRestart:
+    """
+    Restarts the server without dropping queued players or running games.
+
+    On SIGHUP or SIGUSR2 a new server process is started with the same
+    command line and one end of a Unix socket pair, which only the two
+    processes hold. Over it the new process receives the listening sockets
+    with SCM_RIGHTS, so no connection is refused while it starts. This process then stops accepting, freezes the matchmaking queue
+    and sends it over; the new process holds every queued player's place
+    and starts accepting. Queued players are told to reconnect, spread over
+    reconnect_spread seconds in queue order so they neither stampede the new
+    process nor lose their order. Running games finish here, after which
+    this process exits.
+
+    Shared Object Handling: The signal handler only sets a flag; the handoff
+    runs on the main thread through poll(). The states are drained through
+    their own locked methods.
+    """
+
+    def __init__(
+        self,
+        servers: Dict[str, TCPServer],
+        matchmaker_state: MatchmakerState,
+        game_state: GameServerState,
+        admin_server: Optional[AdminServer] = None,
+        reconnect_spread: float = 10.0,
+        drain_timeout: float = 900.0,
+    ):
+        """
+        Initialize the graceful restart.
+
+        Args:
+            servers (Dict[str, TCPServer]): Servers whose listening sockets are handed over
+            matchmaker_state (MatchmakerState): Matchmaker whose queue is handed over
+            game_state (GameServerState): Game server whose games are drained
+            admin_server (Optional[AdminServer]): Admin server to stop so the new
+                process can bind its port
+            reconnect_spread (float): Seconds over which queued players are told
+                to reconnect
+            drain_timeout (float): Seconds to wait for running games before exiting
+        """
+        self.servers = servers
+        self.matchmaker_state = matchmaker_state
+        self.game_state = game_state
+        self.admin_server = admin_server
+        self.reconnect_spread = reconnect_spread
+        self.drain_timeout = drain_timeout
+        self.requested = threading.Event()
+        self.drain_deadline: Optional[float] = None
+        self.exit_after = 0.0
+
+    def install(self) -> None:
+        """
+        Restart on SIGHUP and SIGUSR2. Must be called from the main thread.
+        """
+        for name in ("SIGHUP", "SIGUSR2"):
+            if hasattr(signal, name):
+                signal.signal(getattr(signal, name), self.request)
+
+    def request(self, _signum=None, _frame=None) -> None:
+        """
+        Ask for a restart; it happens on the next poll().
+        """
+        self.requested.set()
+
+    def poll(self) -> bool:
+        """
+        Hand over if a restart was requested, and check whether draining is done.
+        Called periodically from the main thread.
+
+        Returns:
+            bool: True once this process has handed over and can exit
+        """
+        if self.drain_deadline is None:
+            if self.requested.is_set():
+                self.requested.clear()
+                if self.hand_off():
+                    now = time.monotonic()
+                    self.drain_deadline = now + self.drain_timeout
+                    self.exit_after = now + self.reconnect_spread
+            return False
+
+        now = time.monotonic()
+        if now < self.exit_after:
+            return False
+        if now >= self.drain_deadline:
+            logger.warning("Drain timeout, exiting with games still running")
+            return True
+        with self.game_state.lock:
+            running = sum(
+                1
+                for session in self.game_state.game_sessions.values()
+                if session.phase != PHASE_ENDED
+            )
+        if running:
+            logger.info("Draining: %d games still running", running)
+            return False
+        logger.info("Drained, exiting")
+        return True
+
+    def hand_off(self) -> bool:
+        """
+        Start the new process and hand it the listening sockets and the queue.
+
+        Any failure is logged and this process carries on serving, so a restart
+        signal can never take the server down.
+
+        Returns:
+            bool: True if the new process took over, False if this process
+                carries on serving
+        """
+        process = None
+        detached = False
+        try:
+            conn, child_conn = socket.socketpair()
+            with conn:
+                logger.info("Graceful restart: starting the new server process")
+                try:
+                    process = subprocess.Popen(
+                        [sys.executable] + sys.argv,
+                        env={**os.environ, HANDOFF_ENV: str(child_conn.fileno())},
+                        pass_fds=[child_conn.fileno()],
+                        start_new_session=True,
+                    )
+                finally:
+                    child_conn.close()
+
+                # Wait until the new process is up before it gets anything
+                conn.settimeout(HANDOFF_TIMEOUT)
+                _recv_message(conn)
+                names = list(self.servers)
+                _send_message(
+                    conn,
+                    {"pid": os.getpid(), "listeners": names},
+                    [self.servers[name].listener.fileno() for name in names],
+                )
+
+                # From here on new connections wait in the listen backlog until
+                # the new process accepts them
+                detached = True
+                for server in self.servers.values():
+                    server.detach()
+                if self.admin_server is not None:
+                    self.admin_server.stop()
+                queue = self.matchmaker_state.drain_queue()
+                _send_message(conn, {"queue": queue})
+                _recv_message(conn)
+        except Exception as e:
+            logger.error(
+                "Graceful restart failed%s: %s", ", resuming" if detached else "", e
+            )
+            if process is not None:
+                process.kill()
+            if detached:
+                self._resume()
+            return False
+
+        logger.info("New server process %d is accepting connections", process.pid)
+        for server in self.servers.values():
+            server.listener.close()
+            server.listener = None
+        # Games ending from now on send their players to the new process
+        self.game_state.rematch_window = None
+        self.game_state.requeue_listener = None
+        self._send_reconnects()
+        return True
+
+    def _resume(self) -> None:
+        """
+        Go back to serving after a failed handoff.
+        """
+        self.matchmaker_state.draining = False
+        for server in self.servers.values():
+            threading.Thread(
+                target=server.start, name=f"accept-{server.port}", daemon=True
+            ).start()
+        if self.admin_server is not None:
+            threading.Thread(
+                target=self.admin_server.start, name="admin", daemon=True
+            ).start()
+
+    def _send_reconnects(self) -> None:
+        """
+        Tell queued players to reconnect, spread over reconnect_spread seconds in
+        queue order.
+        """
+        player_wss = self.matchmaker_state.release_queue()
+        for position, player_ws in enumerate(player_wss):
+            reconnect_message = {
+                "command": "reconnect",
+                "after": round(self.reconnect_spread * position / len(player_wss), 3),
+            }
+            try:
+                player_ws.send(json_codec.encode(reconnect_message))
+            except (ConnectionError, OSError, BrokenPipeError):
+                pass
+        logger.info(
+            "Told %d queued players to reconnect within %.0fs",
+            len(player_wss),
+            self.reconnect_spread,
+        )
@@ -0,0 +1,46 @@
+import json
+import os
+from typing import Any, Callable, Dict, Tuple
+
+_stdlib_encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+
+
+def _stdlib_encode(obj: Any) -> bytes:
+    """
+    Serialize a message to compact UTF-8 JSON with the standard library.
+
+    Args:
+        obj (Any): Message to serialize
+
+    Returns:
+        bytes: UTF-8 encoded JSON
+    """
+    return _stdlib_encoder.encode(obj).encode("utf-8")
+
+
+# Available backends by name, as (encode, decode) pairs. Every encoder returns
+# compact UTF-8 bytes, which WebSocketInterface.send passes through unchanged.
+BACKENDS: Dict[str, Tuple[Callable[[Any], bytes], Callable[[Any], Any]]] = {
+    "json": (_stdlib_encode, json.loads),
+}
+
+try:
+    import orjson
+
+    BACKENDS["orjson"] = (orjson.dumps, orjson.loads)
+except ImportError:
+    pass
+
+# The fastest installed backend, unless DRAW_AND_CONQUER_JSON names another
+BACKEND = os.environ.get("DRAW_AND_CONQUER_JSON") or (
+    "orjson" if "orjson" in BACKENDS else "json"
+)
+if BACKEND not in BACKENDS:
+    raise ImportError(f"JSON backend {BACKEND!r} is not available")
+
+# encode(obj) -> bytes and decode(str or bytes) -> obj, bound directly to the
+# backend so a message costs no extra function call. Dictionary keys must be strings.
+encode, decode = BACKENDS[BACKEND]
+
+# Raised by decode; orjson.JSONDecodeError subclasses json.JSONDecodeError
+DecodeError = json.JSONDecodeError
@@ -0,0 +1,326 @@
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Histogram buckets are powers of two in microseconds: bucket i counts
+# durations below 2**i us, the last bucket everything from ~1 s up
+HISTOGRAM_BUCKETS = 21
+
+# The process-wide profiler, or None when lock profiling is off
+_profiler: Optional["LockProfiler"] = None
+
+
+def _bucket(seconds: float) -> int:
+    return min(int(seconds * 1e6).bit_length(), HISTOGRAM_BUCKETS - 1)
+
+
+def _percentile(histogram: List[int], count: int, quantile: float) -> float:
+    """
+    Get the upper bound of the histogram bucket containing a quantile.
+
+    Args:
+        histogram (List[int]): Counts per power of two bucket
+        count (int): Total count
+        quantile (float): Quantile between 0 and 1
+
+    Returns:
+        float: Upper bound of the bucket in milliseconds
+    """
+    target = quantile * count
+    seen = 0
+    for index, bucket_count in enumerate(histogram):
+        seen += bucket_count
+        if bucket_count and seen >= target:
+            return (1 << index) / 1000
+    return 0.0
+
+
+class SiteStats:
+    """
+    Wait and hold times of one lock at one call site.
+
+    Shared Object Handling: Only updated while the profiled lock is held, so
+    the lock itself serializes all updates.
+    """
+
+    __slots__ = (
+        "lock_name",
+        "site",
+        "acquisitions",
+        "contended",
+        "wait_total",
+        "wait_max",
+        "hold_total",
+        "hold_max",
+        "wait_histogram",
+        "hold_histogram",
+        "long_holds",
+        "last_long_hold",
+    )
+
+    def __init__(self, lock_name: str, site: str):
+        self.lock_name = lock_name
+        self.site = site
+        self.acquisitions = 0
+        # Acquisitions that found the lock held by another thread
+        self.contended = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.hold_total = 0.0
+        self.hold_max = 0.0
+        self.wait_histogram = [0] * HISTOGRAM_BUCKETS
+        self.hold_histogram = [0] * HISTOGRAM_BUCKETS
+        self.long_holds = 0
+        # Stack of the most recent hold longer than the threshold
+        self.last_long_hold: Optional[str] = None
+
+    def snapshot(self) -> Dict:
+        """
+        Get a copy of the statistics.
+
+        Returns:
+            Dict: Counters, totals and maxima in ms, p50/p99 bucket bounds in ms
+                and the raw histograms
+        """
+        count = self.acquisitions
+        return {
+            "lock": self.lock_name,
+            "site": self.site,
+            "acquisitions": count,
+            "contended": self.contended,
+            "wait_total_ms": self.wait_total * 1000,
+            "wait_max_ms": self.wait_max * 1000,
+            "wait_p50_ms": _percentile(self.wait_histogram, count, 0.5),
+            "wait_p99_ms": _percentile(self.wait_histogram, count, 0.99),
+            "hold_total_ms": self.hold_total * 1000,
+            "hold_max_ms": self.hold_max * 1000,
+            "hold_p50_ms": _percentile(self.hold_histogram, count, 0.5),
+            "hold_p99_ms": _percentile(self.hold_histogram, count, 0.99),
+            "wait_histogram_us": list(self.wait_histogram),
+            "hold_histogram_us": list(self.hold_histogram),
+            "long_holds": self.long_holds,
+            "last_long_hold": self.last_long_hold,
+        }
+
+
+class ProfiledLock:
+    """
+    Drop-in replacement for threading.Lock that records, per calling function,
+    how long threads waited to acquire it and how long they held it.
+
+    The call site is the qualified name of the function that acquired the
+    lock, e.g. MatchmakerState.enqueue_player, so existing `with self.lock:`
+    blocks are profiled without changes.
+
+    Shared Object Handling: Acquisition time and site are stored on the lock
+    itself, which is safe because a Lock has exactly one holder at a time.
+    """
+
+    def __init__(self, name: str, profiler: "LockProfiler"):
+        """
+        Initialize the lock.
+
+        Args:
+            name (str): Name reported for this lock
+            profiler (LockProfiler): Profiler collecting the statistics
+        """
+        self.name = name
+        self.profiler = profiler
+        self._lock = threading.Lock()
+        self._sites: Dict[object, SiteStats] = {}
+        self._site: Optional[SiteStats] = None
+        self._acquired_at = 0.0
+
+    def _stats_for(self, frame) -> SiteStats:
+        code = frame.f_code
+        stats = self._sites.get(code)
+        if stats is None:
+            site = getattr(code, "co_qualname", code.co_name)
+            stats = self.profiler.register(self.name, site)
+            self._sites[code] = stats
+        return stats
+
+    def _acquire(self, frame, blocking: bool = True, timeout: float = -1) -> bool:
+        started = time.perf_counter()
+        contended = not self._lock.acquire(False)
+        if contended:
+            if not blocking or not self._lock.acquire(True, timeout):
+                return False
+        acquired_at = time.perf_counter()
+        wait = acquired_at - started
+
+        stats = self._stats_for(frame)
+        stats.acquisitions += 1
+        stats.wait_total += wait
+        stats.wait_histogram[_bucket(wait)] += 1
+        if contended:
+            stats.contended += 1
+            if wait > stats.wait_max:
+                stats.wait_max = wait
+        self._site = stats
+        self._acquired_at = acquired_at
+        return True
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        return self._acquire(sys._getframe(1), blocking, timeout)
+
+    def release(self) -> None:
+        stats = self._site
+        hold = time.perf_counter() - self._acquired_at
+        stats.hold_total += hold
+        stats.hold_histogram[_bucket(hold)] += 1
+        if hold > stats.hold_max:
+            stats.hold_max = hold
+        long_hold = hold > self.profiler.long_hold
+        if long_hold:
+            stats.long_holds += 1
+        self._lock.release()
+
+        # Formatting the stack happens after releasing so it does not extend the hold
+        if long_hold:
+            stack = "".join(traceback.format_stack(sys._getframe(1)))
+            stats.last_long_hold = stack
+            logger.warning(
+                "%s held for %.1fms by %s\n%s",
+                self.name,
+                hold * 1000,
+                stats.site,
+                stack.rstrip(),
+            )
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    def __enter__(self) -> bool:
+        return self._acquire(sys._getframe(1))
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+class LockProfiler:
+    """
+    Registry of the call sites of every profiled lock.
+
+    Shared Object Handling: Site registration is guarded by a lock; it only
+    happens the first time a function acquires a given lock.
+    """
+
+    def __init__(self, long_hold: float = 0.05):
+        """
+        Initialize the profiler.
+
+        Args:
+            long_hold (float): Hold time in seconds above which a hold is logged
+                with its stack trace
+        """
+        self.long_hold = long_hold
+        self.lock = threading.Lock()
+        self.sites: List[SiteStats] = []
+
+    def register(self, lock_name: str, site: str) -> SiteStats:
+        """
+        Create the statistics of a new call site.
+
+        Args:
+            lock_name (str): Name of the profiled lock
+            site (str): Qualified name of the acquiring function
+
+        Returns:
+            SiteStats: The statistics to update for that site
+        """
+        stats = SiteStats(lock_name, site)
+        with self.lock:
+            self.sites.append(stats)
+        return stats
+
+    def snapshot(self) -> List[Dict]:
+        """
+        Get the statistics of every call site, longest total wait first.
+
+        Returns:
+            List[Dict]: One SiteStats.snapshot() per lock and call site
+        """
+        with self.lock:
+            sites = list(self.sites)
+        return sorted(
+            (stats.snapshot() for stats in sites),
+            key=lambda site: site["wait_total_ms"],
+            reverse=True,
+        )
+
+    def format_report(self, limit: Optional[int] = None) -> str:
+        """
+        Format the statistics as a table.
+
+        Args:
+            limit (Optional[int]): Number of call sites to include, all if None
+
+        Returns:
+            str: One line per lock and call site
+        """
+        lines = [
+            f"{'lock':<20} {'site':<48} {'acquired':>9} {'contended':>9} "
+            f"{'wait ms':>9} {'wait p99':>9} {'hold ms':>9} {'hold p99':>9} "
+            f"{'hold max':>9} {'long':>5}"
+        ]
+        for site in self.snapshot()[:limit]:
+            lines.append(
+                f"{site['lock']:<20} {site['site']:<48} {site['acquisitions']:>9} "
+                f"{site['contended']:>9} {site['wait_total_ms']:>9.1f} "
+                f"{site['wait_p99_ms']:>9.3f} {site['hold_total_ms']:>9.1f} "
+                f"{site['hold_p99_ms']:>9.3f} {site['hold_max_ms']:>9.1f} "
+                f"{site['long_holds']:>5}"
+            )
+        return "\n".join(lines)
+
+
+def enable(long_hold: float = 0.05) -> LockProfiler:
+    """
+    Turn on lock profiling for locks created from now on.
+
+    Must be called before the server states are created.
+
+    Args:
+        long_hold (float): Hold time in seconds above which a hold is logged
+            with its stack trace
+
+    Returns:
+        LockProfiler: The process-wide profiler
+    """
+    global _profiler
+    if _profiler is None:
+        _profiler = LockProfiler(long_hold)
+    return _profiler
+
+
+def get_profiler() -> Optional[LockProfiler]:
+    """
+    Get the process-wide profiler.
+
+    Returns:
+        Optional[LockProfiler]: The profiler, or None if profiling is off
+    """
+    return _profiler
+
+
+def make_lock(name: str):
+    """
+    Create a lock, profiled if profiling is enabled.
+
+    With profiling off this is a plain threading.Lock, so there is no overhead.
+
+    Args:
+        name (str): Name reported for the lock
+
+    Returns:
+        A threading.Lock or ProfiledLock
+    """
+    if _profiler is None:
+        return threading.Lock()
+    return ProfiledLock(name, _profiler)
@@ -1,14 +1,44 @@
 import argparse
-import json
 import logging
+import signal
 import threading
 import time
-from typing import Tuple
-
-from game_server import GameServerState, game_server_request_handler
-from matchmaker import MatchmakerState, matchmaker_request_handler
-from server import ServerState, TCPServer, WebSocketInterface
-from watchdog import GameSessionWatchdog, QueueWatchdog
+from typing import Callable, Dict, Optional, Tuple
+
+import json_codec
+import lock_profiler
+from bots import BotEngine
+from event_log import EventLog
+from game_server import (
+    GAME_ROUTE,
+    PHASES,
+    GameServerState,
+    SessionLifecycle,
+    game_server_disconnect_handler,
+    game_server_request_handler,
+)
+from handoff import RESERVATION_GRACE, GracefulRestart, inherit
+from rate_limit import RateLimiter, parse_rate
+from recorder import GameRecorder
+from matchmaker import (
+    MATCHMAKER_ROUTE,
+    MatchmakerState,
+    matchmaker_disconnect_handler,
+    matchmaker_request_handler,
+)
+from sampling_profiler import AdminServer
+from server import ServerState, TCPServer, WebSocketInterface, create_ssl_context
+from tracing import MatchTracer
+from watchdog import (
+    GameSessionWatchdog,
+    QueueLengthWatchdog,
+    QueueWatchdog,
+    TileLeaseWatchdog,
+)
+
+# Seconds a player sent back to the queue after a game keeps their place at the
+# front while reconnecting to the matchmaker
+REQUEUE_PRIORITY_TTL = 60
 
 
 def parse_args():
@@ -33,6 +63,17 @@ def parse_args():
         default=9438,
         help="Port number for game server",
     )
+    parser.add_argument(
+        "--single-port",
+        type=int,
+        default=None,
+        help=f"Serve both servers on this port, routed by WebSocket path ({MATCHMAKER_ROUTE}, {GAME_ROUTE})",
+    )
+    parser.add_argument(
+        "--carry-over-connections",
+        action="store_true",
+        help="With --single-port, keep each player's matchmaker WebSocket for their game session",
+    )
     parser.add_argument(
         "--lobby-size",
         type=int,
@@ -43,7 +84,14 @@ def parse_args():
         "--heartbeat-timeout",
         type=int,
         default=30,
-        help="Heartbeat timeout in seconds",
+        help="Queue heartbeat timeout in seconds (0 to rely on WebSocket pings only)",
+    )
+    parser.add_argument(
+        "--queue-update-interval",
+        type=int,
+        default=250,
+        help="Minimum milliseconds between queue_length updates pushed to queued "
+        "players (0 to disable)",
     )
     parser.add_argument(
         "--num-tiles",
@@ -57,6 +105,77 @@ def parse_args():
         default=60,
         help="Colour selection timeout in seconds",
     )
+    parser.add_argument(
+        "--bot-backfill-after",
+        type=float,
+        default=0,
+        help="Seconds a player waits for a lobby before the rest of it is filled "
+        "with server-side bots (0 to disable bots)",
+    )
+    parser.add_argument(
+        "--bot-think-time",
+        type=float,
+        default=1.0,
+        help="Mean seconds between a bot's moves",
+    )
+    parser.add_argument(
+        "--bot-draw-time",
+        type=float,
+        default=0.5,
+        help="Mean seconds a bot draws on a tile before lifting the pen",
+    )
+    parser.add_argument(
+        "--ended-session-ttl",
+        type=int,
+        default=30,
+        help="Seconds a finished game session is kept before eviction",
+    )
+    parser.add_argument(
+        "--rematch-window",
+        type=int,
+        default=15,
+        help="Seconds after a game ends in which its players can vote for a rematch "
+        "(0 to disable, must be below --ended-session-ttl)",
+    )
+    parser.add_argument(
+        "--idle-session-ttl",
+        type=int,
+        default=600,
+        help="Seconds without player activity before a running game session is evicted",
+    )
+    parser.add_argument(
+        "--tile-lease",
+        type=float,
+        default=15,
+        help="Seconds a player can hold a tile lock before it expires (0 to disable)",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=parse_rate,
+        action="append",
+        default=[],
+        metavar="BUCKET=RATE:BURST",
+        help="Per-connection game server rate limit for a command, or for all "
+        "messages with the bucket 'message', e.g. pen_down=20:40 (repeatable)",
+    )
+    parser.add_argument(
+        "--no-rate-limit",
+        action="store_true",
+        help="Disable game server rate limiting",
+    )
+    parser.add_argument(
+        "--max-rate-violations",
+        type=int,
+        default=100,
+        help="Consecutive rate limited messages before a game connection is closed",
+    )
+    parser.add_argument(
+        "--region-size",
+        type=int,
+        default=0,
+        help="Width in tiles of the board regions players subscribe to with a "
+        "viewport, for large boards (0 sends every tile event to every player)",
+    )
     parser.add_argument(
         "--echo-port",
         type=int,
@@ -66,14 +185,157 @@ def parse_args():
     parser.add_argument(
         "--certfile",
         type=str,
-        required=True,
-        help="Path to SSL certificate file",
+        default=None,
+        help="Path to SSL certificate file (required unless --no-tls)",
     )
     parser.add_argument(
         "--keyfile",
         type=str,
-        required=True,
-        help="Path to SSL key file",
+        default=None,
+        help="Path to SSL key file (required unless --no-tls)",
+    )
+    parser.add_argument(
+        "--no-tls",
+        action="store_true",
+        help="Serve plaintext WebSockets, for running behind a TLS-terminating proxy",
+    )
+    parser.add_argument(
+        "--proxy-protocol",
+        action="store_true",
+        help="Expect a PROXY protocol v1 or v2 header on every connection and use "
+        "the client address it carries",
+    )
+    parser.add_argument(
+        "--handshake-timeout",
+        type=float,
+        default=10.0,
+        help="Seconds allowed for the TLS and WebSocket handshakes",
+    )
+    parser.add_argument(
+        "--ping-interval",
+        type=float,
+        default=10,
+        help="Seconds of client silence before the server sends a WebSocket ping (0 to disable)",
+    )
+    parser.add_argument(
+        "--ping-timeout",
+        type=float,
+        default=30,
+        help="Seconds of client silence before a connection is closed as dead",
+    )
+    parser.add_argument(
+        "--max-message-size",
+        type=int,
+        default=65536,
+        help="Largest WebSocket message accepted from a client, in bytes",
+    )
+    parser.add_argument(
+        "--max-connections",
+        type=int,
+        default=10000,
+        help="Maximum concurrent connections per server",
+    )
+    parser.add_argument(
+        "--max-connections-per-ip",
+        type=int,
+        default=64,
+        help="Maximum concurrent connections per client IP per server",
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=0,
+        help="Seconds without inbound data before a connection is closed (0 to disable)",
+    )
+    parser.add_argument(
+        "--listen-backlog",
+        type=int,
+        default=128,
+        help="Listen backlog of each server socket",
+    )
+    parser.add_argument(
+        "--stats-interval",
+        type=int,
+        default=60,
+        help="Seconds between server statistics log lines (0 to disable)",
+    )
+    parser.add_argument(
+        "--profile-locks",
+        action="store_true",
+        help="Record wait and hold times of the server state locks per call site; "
+        "logged with the statistics and on SIGUSR1",
+    )
+    parser.add_argument(
+        "--long-lock-hold",
+        type=float,
+        default=50,
+        help="With --profile-locks, log a stack trace for lock holds longer than "
+        "this many milliseconds",
+    )
+    parser.add_argument(
+        "--admin-port",
+        type=int,
+        default=None,
+        help="Loopback-only port for admin commands such as the sampling profiler "
+        "(disabled if unset)",
+    )
+    parser.add_argument(
+        "--state-dir",
+        type=str,
+        default=None,
+        help="Directory for the game session event log and snapshots (disabled if unset)",
+    )
+    parser.add_argument(
+        "--snapshot-interval",
+        type=int,
+        default=60,
+        help="Seconds between compacted event log snapshots",
+    )
+    parser.add_argument(
+        "--reconnect-window",
+        type=float,
+        default=60,
+        help="Seconds players have to reconnect to a game restored from --state-dir "
+        "before it is evicted",
+    )
+    parser.add_argument(
+        "--reconnect-spread",
+        type=float,
+        default=10,
+        help="Seconds over which queued players are told to reconnect to the new "
+        "process on a graceful restart (SIGHUP or SIGUSR2)",
+    )
+    parser.add_argument(
+        "--drain-timeout",
+        type=float,
+        default=900,
+        help="Seconds a process replaced by a graceful restart waits for its "
+        "running games to end before exiting",
+    )
+    parser.add_argument(
+        "--record-dir",
+        type=str,
+        default=None,
+        help="Directory to record inbound game server messages to, per session (disabled if unset)",
+    )
+    parser.add_argument(
+        "--trace-file",
+        type=str,
+        default=None,
+        help="JSONL file to write per-phase match start spans to, summarized with "
+        "python tracing.py (disabled if unset)",
+    )
+    parser.add_argument(
+        "--trace-max-bytes",
+        type=int,
+        default=10 * 1024 * 1024,
+        help="Size at which the trace file is rotated",
+    )
+    parser.add_argument(
+        "--trace-backups",
+        type=int,
+        default=3,
+        help="Number of rotated trace files kept",
     )
     parser.add_argument(
         "--log-level",
@@ -82,7 +344,43 @@ def parse_args():
         choices=["DEBUG", "INFO", "WARNING", "ERROR"],
         help="Set the logging level",
     )
-    return parser.parse_args()
+    args = parser.parse_args()
+    if not args.no_tls and not (args.certfile and args.keyfile):
+        parser.error("--certfile and --keyfile are required unless --no-tls is given")
+    if args.rematch_window >= args.ended_session_ttl:
+        parser.error("--rematch-window must be below --ended-session-ttl")
+    return args
+
+
+def make_requeue_listener(
+    matchmaker_state: MatchmakerState, same_connection: bool
+) -> Callable[[str, str, WebSocketInterface], bool]:
+    """
+    Create the game server's hook for players going back to the queue after a game.
+
+    Args:
+        matchmaker_state (MatchmakerState): The matchmaker to requeue players in
+        same_connection (bool): Move the game connection to the matchmaker route
+            (single port with carried over connections); otherwise the player
+            reconnects and is granted the front of the queue for REQUEUE_PRIORITY_TTL
+
+    Returns:
+        Callable[[str, str, WebSocketInterface], bool]: Listener returning whether
+            it took over the connection
+    """
+
+    def requeue(player_id: str, player_name: str, ws: WebSocketInterface) -> bool:
+        if not same_connection:
+            matchmaker_state.grant_priority(player_id, REQUEUE_PRIORITY_TTL)
+            return False
+        # Refused while the queue is handed to a new process; the player then
+        # reconnects like everyone else
+        if not matchmaker_state.enqueue_player(player_id, player_name, ws, front=True):
+            return False
+        ws.route = MATCHMAKER_ROUTE
+        return True
+
+    return requeue
 
 
 def configure_logging(log_level: str = "INFO") -> None:
@@ -136,11 +434,11 @@ def echo_back(
         _server_state (ServerState): Server state (unused in echo mode)
     """
     try:
-        _ = json.loads(data)
+        _ = json_codec.decode(data)
         ws.send(data)
-    except json.JSONDecodeError:
+    except json_codec.DecodeError:
         reply = {"error": "Invalid JSON format"}
-        ws.send(json.dumps(reply))
+        ws.send(json_codec.encode(reply))
 
 
 def start_echo_server(args) -> None:
@@ -163,6 +461,8 @@ def start_echo_server(args) -> None:
         server_state=server_state,
         certfile=args.certfile,
         keyfile=args.keyfile,
+        handshake_timeout=args.handshake_timeout,
+        **connection_limits(args),
     )
 
     echo_thread = threading.Thread(target=echo_server.start, daemon=True)
@@ -171,62 +471,352 @@ def start_echo_server(args) -> None:
     logging.info("Echo server started")
 
 
-def start_servers(args) -> None:
+def connection_limits(args) -> Dict:
+    """
+    Collect the admission control, liveness and transport options shared by every
+    TCPServer.
+
+    Returns:
+        Dict: Keyword arguments for TCPServer
+    """
+    return {
+        "max_connections": args.max_connections,
+        "max_connections_per_ip": args.max_connections_per_ip,
+        "idle_timeout": args.idle_timeout or None,
+        "backlog": args.listen_backlog,
+        "ping_interval": args.ping_interval or None,
+        "ping_timeout": args.ping_timeout,
+        "max_message_size": args.max_message_size,
+        "tls": not args.no_tls,
+        "proxy_protocol": args.proxy_protocol,
+    }
+
+
+def log_stats(
+    servers: Dict[str, TCPServer], game_state: GameServerState, interval: int
+) -> None:
+    """
+    Periodically log connection statistics for each server and game session
+    counts and memory per lifecycle phase.
+
+    Args:
+        servers (Dict[str, TCPServer]): Servers keyed by display name
+        game_state (GameServerState): Game server state to report sessions of
+        interval (int): Seconds between log lines
+    """
+    while True:
+        time.sleep(interval)
+        session_stats = game_state.get_stats()
+        logging.info(
+            "Game sessions: %s; %d evicted; %d tile lease expiries, %d contended locks; "
+            "%d requests rejected",
+            ", ".join(
+                f"{phase} {session_stats['sessions_' + phase]} "
+                f"({session_stats['bytes_' + phase] // 1024} KiB)"
+                for phase in PHASES[:-1]
+            ),
+            session_stats["evicted"],
+            session_stats["lease_expiries"],
+            session_stats["lock_contention"],
+            session_stats["rejected"],
+        )
+        for name, server in servers.items():
+            stats = server.get_stats()
+            logging.info(
+                "%s server: %d connections from %d IPs on %d workers, "
+                "%d rejected at capacity, %d rejected per IP; "
+                "%d handshakes (%.0f%% resumed, p50 %.1fms, p99 %.1fms), "
+                "%d failed (%d timed out); %d pings, %d dead connections",
+                name,
+                stats["active_connections"],
+                stats["client_ips"],
+                stats["worker_threads"],
+                stats["rejected_server_limit"],
+                stats["rejected_ip_limit"],
+                stats["handshakes"],
+                stats["resumption_rate"] * 100,
+                stats["p50_ms"],
+                stats["p99_ms"],
+                stats["failed"],
+                stats["timed_out"],
+                stats.get("pings_sent", 0),
+                stats.get("dead_connections", 0),
+            )
+        profiler = lock_profiler.get_profiler()
+        if profiler is not None:
+            logging.info("Lock contention:\n%s", profiler.format_report(limit=10))
+
+
+def enable_lock_profiling(args) -> None:
+    """
+    Turn on lock profiling before the server states are created, and dump the
+    full report to the log whenever the process receives SIGUSR1.
+    """
+    profiler = lock_profiler.enable(args.long_lock_hold / 1000)
+    logging.info(
+        "Lock profiling enabled, logging holds over %.0fms", args.long_lock_hold
+    )
+
+    def dump_report(_signum, _frame) -> None:
+        logging.info("Lock contention:\n%s", profiler.format_report())
+
+    # Signal handlers can only be installed from the main thread
+    if (
+        hasattr(signal, "SIGUSR1")
+        and threading.current_thread() is threading.main_thread()
+    ):
+        signal.signal(signal.SIGUSR1, dump_report)
+
+
+def start_servers(
+    args,
+) -> Tuple[
+    Optional[EventLog],
+    Optional[MatchTracer],
+    Optional[GameRecorder],
+    Optional[GracefulRestart],
+]:
     """
     Start the matchmaker and game servers with watchdogs.
+
+    When started by a graceful restart, the listening sockets and the queued
+    players of the previous process are taken over.
+
+    Returns:
+        Tuple[Optional[EventLog], Optional[MatchTracer], Optional[GameRecorder],
+            Optional[GracefulRestart]]: The running event log, if persistence is
+            enabled, the running match tracer, if tracing is enabled, the running
+            game recorder, if recording is enabled, and the graceful restart
+            handler, unless persistence is enabled
     """
     logging.info("Initializing components")
 
+    if args.profile_locks:
+        enable_lock_profiling(args)
+
+    tracer = None
+    if args.trace_file:
+        logging.info("Tracing match start to %s", args.trace_file)
+        tracer = MatchTracer(
+            args.trace_file,
+            max_bytes=args.trace_max_bytes,
+            backups=args.trace_backups,
+        )
+        tracer.start()
+
     # Create server states
     matchmaker_state = MatchmakerState(
-        lobby_size=args.lobby_size, heartbeat_timeout=args.heartbeat_timeout
+        lobby_size=args.lobby_size,
+        heartbeat_timeout=args.heartbeat_timeout,
+        queue_update_interval=(
+            args.queue_update_interval / 1000 if args.queue_update_interval else None
+        ),
+        tracer=tracer,
     )
-    game_state = GameServerState()
 
-    # Create servers
-    matchmaker_server = TCPServer(
-        host=args.host,
-        port=args.matchmaker_port,
-        request_handler=matchmaker_request_handler,
-        server_state=matchmaker_state,
-        certfile=args.certfile,
-        keyfile=args.keyfile,
+    recorder = None
+    if args.record_dir:
+        logging.info("Recording game sessions to %s", args.record_dir)
+        recorder = GameRecorder(args.record_dir)
+        recorder.start()
+
+    lifecycle = SessionLifecycle(
+        ended_ttl=args.ended_session_ttl, idle_ttl=args.idle_session_ttl
     )
 
-    game_server = TCPServer(
-        host=args.host,
-        port=args.games_server_port,
-        request_handler=game_server_request_handler,
-        server_state=game_state,
-        certfile=args.certfile,
-        keyfile=args.keyfile,
+    rate_limiter = None
+    if not args.no_rate_limit:
+        rate_limiter = RateLimiter(dict(args.rate_limit), args.max_rate_violations)
+
+    event_log = None
+    if args.state_dir:
+        logging.info("Recovering game sessions from %s", args.state_dir)
+        event_log = EventLog(args.state_dir, snapshot_interval=args.snapshot_interval)
+        recovered_sessions = event_log.recover()
+        game_state = GameServerState(
+            event_log,
+            recorder,
+            lifecycle,
+            tile_lease=args.tile_lease or None,
+            region_size=args.region_size or None,
+            rate_limiter=rate_limiter,
+            rematch_window=args.rematch_window or None,
+            tracer=tracer,
+        )
+        game_state.restore_game_sessions(recovered_sessions, args.reconnect_window)
+        event_log.start()
+    else:
+        game_state = GameServerState(
+            recorder=recorder,
+            lifecycle=lifecycle,
+            tile_lease=args.tile_lease or None,
+            region_size=args.region_size or None,
+            rate_limiter=rate_limiter,
+            rematch_window=args.rematch_window or None,
+            tracer=tracer,
+        )
+    game_state.requeue_listener = make_requeue_listener(
+        matchmaker_state,
+        same_connection=args.single_port is not None and args.carry_over_connections,
     )
 
+    # Create servers sharing one SSL context, so TLS sessions established with
+    # the matchmaker can be resumed on the game server
+    ssl_context = None
+    if not args.no_tls:
+        ssl_context = create_ssl_context(args.certfile, args.keyfile)
+    if args.single_port:
+        # One listener; the WebSocket request path selects the server
+        servers = {
+            "combined": TCPServer(
+                host=args.host,
+                port=args.single_port,
+                request_handler=None,
+                server_state=None,
+                ssl_context=ssl_context,
+                handshake_timeout=args.handshake_timeout,
+                routes={
+                    MATCHMAKER_ROUTE: (
+                        matchmaker_request_handler,
+                        matchmaker_state,
+                        matchmaker_disconnect_handler,
+                    ),
+                    GAME_ROUTE: (
+                        game_server_request_handler,
+                        game_state,
+                        game_server_disconnect_handler,
+                    ),
+                },
+                **connection_limits(args),
+            )
+        }
+    else:
+        servers = {
+            "matchmaker": TCPServer(
+                host=args.host,
+                port=args.matchmaker_port,
+                request_handler=matchmaker_request_handler,
+                server_state=matchmaker_state,
+                disconnect_handler=matchmaker_disconnect_handler,
+                ssl_context=ssl_context,
+                handshake_timeout=args.handshake_timeout,
+                **connection_limits(args),
+            ),
+            "game": TCPServer(
+                host=args.host,
+                port=args.games_server_port,
+                request_handler=game_server_request_handler,
+                server_state=game_state,
+                disconnect_handler=game_server_disconnect_handler,
+                ssl_context=ssl_context,
+                handshake_timeout=args.handshake_timeout,
+                **connection_limits(args),
+            ),
+        }
+
+    # Taking over only now keeps the previous process serving for as long as possible
+    inheritance = inherit()
+    if inheritance is not None:
+        for name, server in servers.items():
+            server.listener = inheritance.listeners[name]
+        matchmaker_state.restore_queue(
+            inheritance.queue, args.reconnect_spread + RESERVATION_GRACE
+        )
+
     logging.info("Starting servers")
     # Start servers in separate threads
-    matchmaker_thread = threading.Thread(target=matchmaker_server.start, daemon=True)
-    game_thread = threading.Thread(target=game_server.start, daemon=True)
-
-    matchmaker_thread.start()
-    game_thread.start()
+    for server in servers.values():
+        server_thread = threading.Thread(
+            target=server.start, name=f"accept-{server.port}", daemon=True
+        )
+        server_thread.start()
+
+    bot_engine = None
+    if args.bot_backfill_after:
+        logging.info(
+            "Filling lobbies with bots after %.1fs in the queue",
+            args.bot_backfill_after,
+        )
+        bot_engine = BotEngine(
+            game_state, think_time=args.bot_think_time, draw_time=args.bot_draw_time
+        )
+        bot_thread = threading.Thread(target=bot_engine.run, name="bots", daemon=True)
+        bot_thread.start()
 
     logging.info("Starting watchdogs")
     # Start watchdog processes
     queue_watchdog_instance = QueueWatchdog(
-        matchmaker_state, game_state, args.num_tiles, args.colour_selection_timeout
+        matchmaker_state,
+        game_state,
+        args.num_tiles,
+        args.colour_selection_timeout,
+        carry_over_connections=args.single_port is not None
+        and args.carry_over_connections,
+        bot_engine=bot_engine,
+        bot_backfill_after=args.bot_backfill_after,
     )
     game_watchdog_instance = GameSessionWatchdog(game_state)
 
     queue_watchdog_thread = threading.Thread(
-        target=queue_watchdog_instance.run, daemon=True
+        target=queue_watchdog_instance.run, name="QueueWatchdog", daemon=True
     )
     game_watchdog_thread = threading.Thread(
-        target=game_watchdog_instance.run, daemon=True
+        target=game_watchdog_instance.run, name="GameSessionWatchdog", daemon=True
     )
 
     queue_watchdog_thread.start()
     game_watchdog_thread.start()
 
+    if game_state.tile_lease is not None:
+        lease_watchdog_instance = TileLeaseWatchdog(game_state)
+        lease_watchdog_thread = threading.Thread(
+            target=lease_watchdog_instance.run, name="TileLeaseWatchdog", daemon=True
+        )
+        lease_watchdog_thread.start()
+
+    if matchmaker_state.queue_updates is not None:
+        queue_length_watchdog_instance = QueueLengthWatchdog(matchmaker_state)
+        queue_length_watchdog_thread = threading.Thread(
+            target=queue_length_watchdog_instance.run,
+            name="QueueLengthWatchdog",
+            daemon=True,
+        )
+        queue_length_watchdog_thread.start()
+
+    if args.stats_interval > 0:
+        stats_thread = threading.Thread(
+            target=log_stats,
+            args=(servers, game_state, args.stats_interval),
+            name="stats",
+            daemon=True,
+        )
+        stats_thread.start()
+
+    admin_server = None
+    if args.admin_port:
+        admin_server = AdminServer(args.admin_port)
+        admin_thread = threading.Thread(
+            target=admin_server.start, name="admin", daemon=True
+        )
+        admin_thread.start()
+
+    if inheritance is not None:
+        inheritance.ready()
+
+    # Two processes cannot share the event log, so restarts need a full stop
+    restart = None
+    if event_log is None:
+        restart = GracefulRestart(
+            servers,
+            matchmaker_state,
+            game_state,
+            admin_server,
+            reconnect_spread=args.reconnect_spread,
+            drain_timeout=args.drain_timeout,
+        )
+
+    return event_log, tracer, recorder, restart
+
 
 def main():
     """
@@ -243,6 +833,7 @@ def main():
     configure_logging(args.log_level)
 
     logging.info("Server starting")
+    event_log, tracer, recorder, restart = None, None, None, None
     if args.echo_port:
         if (
             args.echo_port == args.matchmaker_port
@@ -253,14 +844,23 @@ def main():
             )
         start_echo_server(args)
     else:
-        start_servers(args)
+        event_log, tracer, recorder, restart = start_servers(args)
+        # Signal handlers can only be installed from the main thread
+        if restart is not None:
+            restart.install()
 
     try:
         logging.info("Server ready")
-        while True:
+        while not (restart is not None and restart.poll()):
             time.sleep(1)
     except KeyboardInterrupt:
         logging.info("Shutting down")
+        if event_log is not None:
+            event_log.close()
+    if tracer is not None:
+        tracer.close()
+    if recorder is not None:
+        recorder.close()
 
 
 if __name__ == "__main__":
@@ -1,93 +1,382 @@
-import json
+import itertools
 import logging
+import threading
 import time
 from collections import OrderedDict
-from typing import Dict, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
+import json_codec
+from queue_index import QueueIndex
 from server import ServerState, WebSocketInterface
+from tracing import MatchTracer
 
 logger = logging.getLogger(__name__)
 
+# WebSocket path of the matchmaker when served on a single port
+MATCHMAKER_ROUTE = "/matchmaker"
+
+# Weight of the newest interval in the moving average of lobby formation
+LOBBY_RATE_SMOOTHING = 0.2
+
+
+class HeartbeatSlot:
+    """
+    Time a queued player joined the queue and time of their last heartbeat,
+    and the player's queue position as of the last queue_length push.
+
+    Shared Object Handling: Each player has their own slot, created and removed
+    under the MatchmakerState lock. Heartbeats overwrite the timestamp and read
+    the cached position without the lock; a single attribute store is atomic,
+    with or without the GIL, and a write to a slot whose player was removed
+    concurrently is simply discarded with the slot. The position is only
+    written under the lock.
+    """
+
+    __slots__ = ("last", "enqueued", "position", "ready_at")
+
+    def __init__(self, last: float):
+        self.last = last
+        self.enqueued = last
+        # Position and time.monotonic() the player's lobby is expected to form
+        # (None until a lobby has formed), set by MatchmakerState.get_queue_snapshot
+        self.position: Optional[int] = None
+        self.ready_at: Optional[float] = None
+
+
+class QueueUpdateScheduler:
+    """
+    Coalesces queue changes into at most one queue_length push per interval.
+
+    Queue changes only set a flag, so a burst of enqueues or a lobby being
+    formed results in a single update carrying the final length.
+
+    Shared Object Handling: The flag is shared between request threads
+    changing the queue and the thread pushing updates, guarded by a
+    condition variable.
+    """
+
+    def __init__(self, interval: float):
+        """
+        Initialize the scheduler.
+
+        Args:
+            interval (float): Minimum seconds between two pushes
+        """
+        self.interval = interval
+        self.condition = threading.Condition()
+        self._changed = False
+        self._last_push = 0.0
+
+    def mark_changed(self) -> None:
+        """
+        Record that the queue changed. Called by MatchmakerState under its lock.
+        """
+        with self.condition:
+            if not self._changed:
+                self._changed = True
+                self.condition.notify()
+
+    def wait_due(self) -> None:
+        """
+        Block until the queue has changed and the interval since the last push has passed.
+        """
+        with self.condition:
+            while True:
+                if not self._changed:
+                    self.condition.wait()
+                    continue
+                wait = self._last_push + self.interval - time.monotonic()
+                if wait > 0:
+                    self.condition.wait(wait)
+                    continue
+                self._changed = False
+                self._last_push = time.monotonic()
+                return
+
 
 class MatchmakerState(ServerState):
     """
     Manages the matchmaking queue and player state with separate storage for each attribute.
     """
 
-    def __init__(self, lobby_size: int, heartbeat_timeout: int):
+    def __init__(
+        self,
+        lobby_size: int,
+        heartbeat_timeout: int,
+        queue_update_interval: Optional[float] = None,
+        tracer: Optional[MatchTracer] = None,
+    ):
         """
         Initialize matchmaker state with separate dictionaries for player data.
 
         Args:
             lobby_size (int): Number of players required for each game
             heartbeat_timeout (int): Timeout in seconds for player heartbeats
+            queue_update_interval (Optional[float]): Minimum seconds between
+                queue_length pushes to queued players, or None to disable them
+            tracer (Optional[MatchTracer]): Tracer of players' way into games,
+                shared with the game server state; no tracing if None
         """
         super().__init__()
 
         self.matchmaking_queue: OrderedDict[str, bool] = OrderedDict()
-        self.player_last_heartbeat: Dict[str, float] = {}
+        # Queue length, updated under the lock and read without it
+        self.queue_length = 0
+        # Queue positions in O(log n), kept in step with matchmaking_queue
+        self.queue_index = QueueIndex()
+        self.player_last_heartbeat: Dict[str, HeartbeatSlot] = {}
         self.player_names: Dict[str, str] = {}
         self.player_websockets: Dict[str, WebSocketInterface] = {}
+        # Reverse index so a closed connection finds its player in O(1)
+        self.websocket_players: Dict[WebSocketInterface, str] = {}
+        # Players returning from a game who may rejoin at the front, with expiry
+        self.priority_players: Dict[str, float] = {}
+        # Places held for players queued in the previous server process until
+        # they reconnect: (time they first joined, reservation expiry)
+        self.reservations: Dict[str, Tuple[float, float]] = {}
+        # Set when the queue has been handed to a new server process
+        self.draining = False
 
         self.lobby_size = lobby_size
         self.heartbeat_timeout = heartbeat_timeout
+        self.tracer = tracer
+
+        # Moving average of the seconds between lobbies formed, for wait estimates
+        self.lobby_interval: Optional[float] = None
+        self.last_lobby_formed = time.monotonic()
+
+        self.queue_updates: Optional[QueueUpdateScheduler] = None
+        if queue_update_interval is not None:
+            self.queue_updates = QueueUpdateScheduler(queue_update_interval)
+
+    def _set_queue_length(self) -> None:
+        """
+        Refresh the cached queue length after a change and schedule a push.
+        Must be called with the lock held.
+        """
+        self.queue_length = len(self.matchmaking_queue)
+        if self.queue_updates is not None:
+            self.queue_updates.mark_changed()
 
     def enqueue_player(
-        self, player_id: str, player_name: str, ws: WebSocketInterface
-    ) -> None:
+        self,
+        player_id: str,
+        player_name: str,
+        ws: WebSocketInterface,
+        front: bool = False,
+    ) -> bool:
         """
-        Add a player to the matchmaking queue.
+        Add a player to the matchmaking queue, unless the queue was handed to a
+        new server process.
 
         Args:
             player_id (str): Unique identifier for the player
             player_name (str): Display name for the player
             ws (WebSocketInterface): WebSocket connection for the player
+            front (bool): Queue the player ahead of everyone else, e.g. when
+                returning from a game; a pending priority grant has the same effect
+
+        Returns:
+            bool: True if the player was queued, False while draining
         """
         with self.lock:
+            if self.draining:
+                return False
+            now = time.monotonic()
+            expires = self.priority_players.pop(player_id, None)
+            if expires is not None and expires > now:
+                front = True
+            reservation = self.reservations.pop(player_id, None)
+            if reservation is not None and (front or reservation[1] <= now):
+                self.queue_index.release(player_id)
+                reservation = None
+
             # Add to queue for ordering
             self.matchmaking_queue[player_id] = True
+            if front:
+                self.matchmaking_queue.move_to_end(player_id, last=False)
+            self.queue_index.add(player_id, front=front)
+            if reservation is not None:
+                self._move_behind(player_id)
+            self._set_queue_length()
 
             # Store player data in separate dictionaries
-            self.player_last_heartbeat[player_id] = time.time()
+            self.player_last_heartbeat[player_id] = HeartbeatSlot(time.time())
+            if reservation is not None:
+                self.player_last_heartbeat[player_id].enqueued = reservation[0]
             self.player_names[player_id] = player_name
             self.player_websockets[player_id] = ws
+            self.websocket_players[ws] = player_id
 
-            queue_length = len(self.matchmaking_queue)
             logger.info(
                 "Player %s (%s) joined queue, queue length: %d",
                 player_id,
                 player_name,
-                queue_length,
+                self.queue_length,
             )
+            return True
 
-    def dequeue_player(self) -> Optional[Tuple[str, str, WebSocketInterface]]:
+    def _move_behind(self, player_id: str) -> None:
+        """
+        Move the players queued after a player's reserved place behind them.
+        Must be called with the lock held, right after the player was appended.
+
+        Args:
+            player_id (str): Player who took up their reservation
         """
-        Remove and return the next player from the queue.
+        sequence = self.queue_index.sequence(player_id)
+        later = []
+        for other in reversed(self.matchmaking_queue):
+            if other == player_id:
+                continue
+            if self.queue_index.sequence(other) < sequence:
+                break
+            later.append(other)
+        for other in reversed(later):
+            self.matchmaking_queue.move_to_end(other)
+
+    def drain_queue(self) -> List[Dict]:
+        """
+        Freeze the queue and get it in order, to hand it to a new process.
+
+        While draining, players are neither added to nor taken from the queue,
+        so the queue handed over stays exactly the queue released afterwards.
 
         Returns:
-            Optional[Tuple[str, str, WebSocketInterface]]: Player ID, name, and WebSocket if available
+            List[Dict]: One {"uuid", "name", "enqueued"} entry per queued player,
+                front of the queue first; enqueued is a time.time() timestamp
         """
         with self.lock:
-            if self.matchmaking_queue:
-                player_id = next(iter(self.matchmaking_queue))
-
-                player_name = self.player_names[player_id]
-                player_ws = self.player_websockets[player_id]
+            self.draining = True
+            return [
+                {
+                    "uuid": player_id,
+                    "name": self.player_names[player_id],
+                    "enqueued": self.player_last_heartbeat[player_id].enqueued,
+                }
+                for player_id in self.matchmaking_queue
+            ]
+
+    def release_queue(self) -> List[WebSocketInterface]:
+        """
+        Remove every queued player once the queue was handed over.
 
-                del self.matchmaking_queue[player_id]
+        Returns:
+            List[WebSocketInterface]: The players' connections, front of the queue first
+        """
+        with self.lock:
+            player_wss = [
+                self.player_websockets[player_id]
+                for player_id in self.matchmaking_queue
+            ]
+            for player_id in list(self.matchmaking_queue):
+                self.queue_index.remove(player_id)
                 del self.player_last_heartbeat[player_id]
                 del self.player_names[player_id]
                 del self.player_websockets[player_id]
+            self.matchmaking_queue.clear()
+            self.websocket_players.clear()
+            self._set_queue_length()
+        return player_wss
 
-                logger.debug(
-                    "Dequeued player %s, queue length: %d",
-                    player_id,
-                    len(self.matchmaking_queue),
-                )
-                return (player_id, player_name, player_ws)
+    def restore_queue(self, entries: List[Dict], ttl: float) -> None:
+        """
+        Hold the places of players queued in the previous server process.
 
-            logger.debug("Dequeue failed: empty queue")
-            return None
+        Each player gets back their place in line, ahead of players who joined
+        here, when they reconnect and enqueue within the reservation time.
+
+        Args:
+            entries (List[Dict]): Queue handed over by drain_queue
+            ttl (float): Seconds the places are held
+        """
+        with self.lock:
+            expires = time.monotonic() + ttl
+            for entry in entries:
+                self.reservations[entry["uuid"]] = (entry["enqueued"], expires)
+                self.queue_index.reserve(entry["uuid"])
+        logger.info("Holding queue places for %d players", len(entries))
+
+    def expire_reservations(self) -> None:
+        """
+        Drop reserved places whose players did not reconnect in time.
+        """
+        with self.lock:
+            if not self.reservations:
+                return
+            now = time.monotonic()
+            for player_id, (_, expires) in list(self.reservations.items()):
+                if expires <= now:
+                    del self.reservations[player_id]
+                    self.queue_index.release(player_id)
+
+    def grant_priority(self, player_id: str, ttl: float) -> None:
+        """
+        Let a player who is about to reconnect join at the front of the queue.
+
+        Args:
+            player_id (str): Unique identifier for the player
+            ttl (float): Seconds the grant stays valid
+        """
+        with self.lock:
+            now = time.monotonic()
+            # Drop grants that were never used
+            for expired in [
+                pid for pid, expires in self.priority_players.items() if expires <= now
+            ]:
+                del self.priority_players[expired]
+            self.priority_players[player_id] = now + ttl
+
+    def dequeue_lobby(self, count: int) -> List[Tuple[str, str, WebSocketInterface]]:
+        """
+        Remove and return the next players from the queue, all of them or none.
+
+        The players are taken in one step under the lock, so disconnects and
+        timeouts on other threads cannot leave a lobby half formed.
+
+        Args:
+            count (int): Number of players the lobby needs
+
+        Returns:
+            List[Tuple[str, str, WebSocketInterface]]: Player ID, name and
+                WebSocket of each player in queue order; empty if fewer than
+                count players are queued or while draining
+        """
+        with self.lock:
+            if self.draining or len(self.matchmaking_queue) < count:
+                logger.debug("Dequeue failed: fewer than %d players queued", count)
+                return []
+
+            lobby = []
+            for player_id in list(itertools.islice(self.matchmaking_queue, count)):
+                player_ws = self.player_websockets.pop(player_id)
+                lobby.append((player_id, self.player_names.pop(player_id), player_ws))
+
+                del self.matchmaking_queue[player_id]
+                self.queue_index.remove(player_id)
+                del self.player_last_heartbeat[player_id]
+                self.websocket_players.pop(player_ws, None)
+            self._set_queue_length()
+
+            logger.debug(
+                "Dequeued %d players, queue length: %d",
+                count,
+                len(self.matchmaking_queue),
+            )
+            return lobby
+
+    def requeue_lobby(self, lobby: List[Tuple[str, str, WebSocketInterface]]) -> None:
+        """
+        Put the players of a lobby that could not start back at the front of
+        the queue, in their previous order.
+
+        Args:
+            lobby (List[Tuple[str, str, WebSocketInterface]]): Players as returned
+                by dequeue_lobby
+        """
+        for player_id, player_name, player_ws in reversed(lobby):
+            if not self.enqueue_player(player_id, player_name, player_ws, front=True):
+                logger.warning("Player %s lost their place while draining", player_id)
 
     def remove_player(self, player_id: str) -> None:
         """
@@ -99,9 +388,13 @@ class MatchmakerState(ServerState):
         with self.lock:
             was_in_queue = player_id in self.matchmaking_queue
             self.matchmaking_queue.pop(player_id, None)
+            self.queue_index.remove(player_id)
+            self._set_queue_length()
             self.player_last_heartbeat.pop(player_id, None)
             self.player_names.pop(player_id, None)
-            self.player_websockets.pop(player_id, None)
+            player_ws = self.player_websockets.pop(player_id, None)
+            if player_ws is not None:
+                self.websocket_players.pop(player_ws, None)
 
             if was_in_queue:
                 logger.info(
@@ -112,6 +405,35 @@ class MatchmakerState(ServerState):
             else:
                 logger.debug("Remove failed, player %s not in queue", player_id)
 
+    def remove_websocket(self, ws: WebSocketInterface) -> Optional[str]:
+        """
+        Remove the player queued on a connection, typically when it closes.
+
+        Args:
+            ws (WebSocketInterface): The player's WebSocket connection
+
+        Returns:
+            Optional[str]: ID of the removed player, or None if nobody was queued on it
+        """
+        with self.lock:
+            player_id = self.websocket_players.pop(ws, None)
+            if player_id is None:
+                return None
+
+            self.matchmaking_queue.pop(player_id, None)
+            self.queue_index.remove(player_id)
+            self._set_queue_length()
+            self.player_last_heartbeat.pop(player_id, None)
+            self.player_names.pop(player_id, None)
+            self.player_websockets.pop(player_id, None)
+
+            logger.info(
+                "Player %s disconnected, queue length: %d",
+                player_id,
+                len(self.matchmaking_queue),
+            )
+            return player_id
+
     def heartbeat_player(self, player_id: str) -> None:
         """
         This method updates the last heartbeat time for a player to indicate
@@ -123,11 +445,47 @@ class MatchmakerState(ServerState):
         """
         with self.lock:
             if player_id in self.matchmaking_queue:
-                self.player_last_heartbeat[player_id] = time.time()
+                self.player_last_heartbeat[player_id].last = time.time()
                 logger.debug("Heartbeat from player %s", player_id)
             else:
                 logger.warning("Heartbeat from player %s not in queue", player_id)
 
+    def touch_and_get_position(
+        self, player_id: str
+    ) -> Optional[Tuple[int, int, Optional[float]]]:
+        """
+        Record a heartbeat and get the queue length, position and wait estimate,
+        without taking the lock.
+
+        This is the queue_heartbeat fast path: one dictionary lookup, one
+        timestamp store in the player's HeartbeatSlot and reads of the cached
+        queue length and of the position the last queue_length push left in
+        the slot. Only players queued since the last push, or all players when
+        pushes are disabled, fall back to get_position. A heartbeat racing with
+        the player's removal is lost along with the player, which is harmless.
+
+        Args:
+            player_id (str): Unique identifier for the player
+
+        Returns:
+            Optional[Tuple[int, int, Optional[float]]]: Queue length, position and
+                estimated wait in seconds, or None if the player is not queued
+        """
+        slot = self.player_last_heartbeat.get(player_id)
+        if slot is None:
+            return None
+        slot.last = time.time()
+        queue_length = self.queue_length
+        position, ready_at = slot.position, slot.ready_at
+        if position is None:
+            queue_position = self.get_position(player_id)
+            if queue_position is None:
+                return None
+            return (queue_length,) + queue_position
+        if ready_at is None:
+            return queue_length, position, None
+        return queue_length, position, max(0.0, ready_at - time.monotonic())
+
     def is_player_in_queue(self, player_id: str) -> bool:
         """
         Check if a player is currently in the queue.
@@ -141,6 +499,107 @@ class MatchmakerState(ServerState):
         with self.lock:
             return player_id in self.matchmaking_queue
 
+    def longest_wait(self) -> float:
+        """
+        Get how long the longest waiting queued player has been in the queue.
+
+        Returns:
+            float: Seconds, 0 if the queue is empty
+        """
+        with self.lock:
+            if not self.matchmaking_queue:
+                return 0.0
+            oldest = min(
+                self.player_last_heartbeat[player_id].enqueued
+                for player_id in self.matchmaking_queue
+            )
+        return time.time() - oldest
+
+    def record_lobby_formed(self) -> None:
+        """
+        Update the lobby formation rate after QueueWatchdog forms a lobby.
+        """
+        with self.lock:
+            now = time.monotonic()
+            interval = now - self.last_lobby_formed
+            self.last_lobby_formed = now
+            if self.lobby_interval is None:
+                self.lobby_interval = interval
+            else:
+                self.lobby_interval += LOBBY_RATE_SMOOTHING * (
+                    interval - self.lobby_interval
+                )
+
+    def get_position(self, player_id: str) -> Optional[Tuple[int, Optional[float]]]:
+        """
+        Get a player's position in the queue and an estimate of their wait.
+
+        Players whose lobby can already be filled from the queue wait only for
+        the next watchdog pass. Otherwise each lobby that still needs new
+        players is assumed to take the average time between recent lobbies.
+
+        Args:
+            player_id (str): Unique identifier for the player
+
+        Returns:
+            Optional[Tuple[int, Optional[float]]]: Position, 1 being next, and the
+                estimated wait in seconds (None until a lobby has formed), or None
+                if the player is not queued
+        """
+        with self.lock:
+            position = self.queue_index.position(player_id)
+            if position is None:
+                return None
+            ready_at = self._ready_at(position, time.monotonic())
+        if ready_at is None:
+            return position, None
+        return position, max(0.0, ready_at - time.monotonic())
+
+    def _ready_at(self, position: int, now: float) -> Optional[float]:
+        """
+        Estimate when the lobby of the player at a queue position forms.
+        Must be called with the lock held.
+
+        Args:
+            position (int): Queue position, 1 being next
+            now (float): Current time.monotonic()
+
+        Returns:
+            Optional[float]: time.monotonic() of the estimate, now if the lobby can
+                already be filled, None until a lobby has formed
+        """
+        # Players that must still join before this player's lobby is full
+        missing = -(-position // self.lobby_size) * self.lobby_size - len(
+            self.queue_index
+        )
+        if missing <= 0:
+            return now
+        if self.lobby_interval is None:
+            return None
+        lobbies = -(-missing // self.lobby_size)
+        return self.last_lobby_formed + lobbies * self.lobby_interval
+
+    def get_queue_snapshot(self) -> Tuple[int, List[WebSocketInterface]]:
+        """
+        Get the queue length and every queued player's connection, and cache
+        each player's position and wait estimate in their HeartbeatSlot for
+        heartbeat replies.
+
+        Positions are the queue order, so the snapshot is one O(n) pass.
+
+        Returns:
+            Tuple[int, List[WebSocketInterface]]: Queue length and connections
+        """
+        with self.lock:
+            now = time.monotonic()
+            connections = []
+            for position, player_id in enumerate(self.matchmaking_queue, 1):
+                slot = self.player_last_heartbeat[player_id]
+                slot.position = position
+                slot.ready_at = self._ready_at(position, now)
+                connections.append(self.player_websockets[player_id])
+            return self.queue_length, connections
+
     def get_queue_length(self) -> int:
         """
         Get the current number of players in the queue.
@@ -172,7 +631,7 @@ def matchmaker_request_handler(
         server_state (MatchmakerState): Shared state for the matchmaker server
     """
     try:
-        request: Dict = json.loads(data)
+        request: Dict = json_codec.decode(data)
 
         player_id = request.get("uuid")
         if not player_id:
@@ -195,27 +654,38 @@ def matchmaker_request_handler(
                 logger.warning("Enqueue request missing player name from %s", player_id)
                 raise ValueError("Missing player name")
 
-            server_state.enqueue_player(player_id, player_name, ws)
+            if server_state.tracer is not None:
+                server_state.tracer.mark(player_id, "enqueue")
+            if not server_state.enqueue_player(player_id, player_name, ws):
+                raise ValueError("Server is restarting, reconnect to join the queue")
             queue_length = server_state.get_queue_length()
+            # The player may already have been matched into a lobby
+            position, estimated_wait = None, None
+            queue_position = server_state.get_position(player_id)
+            if queue_position is not None:
+                position, estimated_wait = queue_position
             reply = {
                 "status": "success",
                 "queue_length": queue_length,
+                "position": position,
+                "estimated_wait": estimated_wait,
             }
-            ws.send(json.dumps(reply))
+            ws.send(json_codec.encode(reply))
 
         elif command == "queue_heartbeat":
-            if not server_state.is_player_in_queue(player_id):
+            queue_position = server_state.touch_and_get_position(player_id)
+            if queue_position is None:
                 logger.warning("Heartbeat from player %s not in queue", player_id)
                 raise ValueError("Player not in queue")
 
-            server_state.heartbeat_player(player_id)
-            queue_length = server_state.get_queue_length()
+            queue_length, position, estimated_wait = queue_position
             reply = {
                 "status": "success",
                 "queue_length": queue_length,
+                "position": position,
+                "estimated_wait": estimated_wait,
             }
-            ws.send(json.dumps(reply))
-            logger.debug("Heartbeat response to player %s", player_id)
+            ws.send(json_codec.encode(reply))
 
         elif command == "remove_from_queue":
             if not server_state.is_player_in_queue(player_id):
@@ -225,7 +695,7 @@ def matchmaker_request_handler(
             reply = {
                 "status": "success",
             }
-            ws.send(json.dumps(reply))
+            ws.send(json_codec.encode(reply))
             server_state.remove_player(player_id)
             logger.debug(
                 "Player %s removed from queue, queue length: %d",
@@ -237,17 +707,38 @@ def matchmaker_request_handler(
             logger.warning("Unknown command '%s' from player %s", command, player_id)
             raise ValueError("Unknown command")
 
-    except json.JSONDecodeError:
+    except json_codec.DecodeError:
         logger.error("Invalid JSON format from %s", addr)
         reply = {
             "status": "error",
             "error": "Invalid JSON format",
         }
-        ws.send(json.dumps(reply))
+        ws.send(json_codec.encode(reply))
 
     except ValueError as e:
         reply = {
             "status": "error",
             "error": str(e),
         }
-        ws.send(json.dumps(reply))
+        ws.send(json_codec.encode(reply))
+
+
+def matchmaker_disconnect_handler(
+    ws: WebSocketInterface,
+    addr: Tuple[str, int],
+    server_state: MatchmakerState,
+) -> None:
+    """
+    Remove a player from the queue as soon as their connection closes.
+
+    Socket Handling: Called by the TCPServer when a client connection ends,
+    so a disconnected player cannot be matched into a lobby.
+
+    Args:
+        ws (WebSocketInterface): The connection that ended
+        addr (Tuple[str, int]): Client address
+        server_state (MatchmakerState): Shared state for the matchmaker server
+    """
+    player_id = server_state.remove_websocket(ws)
+    if player_id is not None:
+        logger.debug("Player %s removed on disconnect from %s", player_id, addr)
@@ -0,0 +1,134 @@
+import ipaddress
+import socket
+import struct
+from typing import Optional, Tuple
+
+# PROXY protocol version 2 signature (haproxy proxy-protocol.txt section 2.2)
+V2_SIGNATURE = b"\r\n\r\n\x00\r\nQUIT\n"
+
+# Version 2 header after the signature: version/command, family/transport, length
+V2_HEADER = struct.Struct(">BBH")
+
+# Shortest ("PROXY UNKNOWN\r\n") and longest version 1 headers, including the CRLF
+V1_MIN_LENGTH = 15
+V1_MAX_LENGTH = 107
+
+V2_COMMAND_LOCAL = 0x20
+V2_COMMAND_PROXY = 0x21
+V2_FAMILY_TCP4 = 0x11
+V2_FAMILY_TCP6 = 0x21
+
+
+def _recv_exact(conn: socket.socket, size: int) -> bytes:
+    """
+    Read exactly size bytes from a socket.
+
+    Args:
+        conn (socket.socket): Client connection
+        size (int): Number of bytes to read
+
+    Returns:
+        bytes: The bytes read
+    """
+    data = bytearray()
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Connection closed in PROXY header")
+        data += chunk
+    return bytes(data)
+
+
+def _parse_v1(line: bytes) -> Optional[Tuple[str, int]]:
+    """
+    Parse a version 1 header line such as "PROXY TCP4 1.2.3.4 5.6.7.8 1234 443".
+
+    Args:
+        line (bytes): Header without the trailing CRLF
+
+    Returns:
+        Optional[Tuple[str, int]]: Client address, or None for PROXY UNKNOWN
+    """
+    fields = line.decode("ascii").split(" ")
+    if len(fields) < 2 or fields[0] != "PROXY":
+        raise ValueError("Malformed PROXY v1 header")
+    if fields[1] == "UNKNOWN":
+        return None
+    if fields[1] not in ("TCP4", "TCP6") or len(fields) != 6:
+        raise ValueError("Malformed PROXY v1 header")
+
+    source = str(ipaddress.ip_address(fields[2]))
+    port = int(fields[4])
+    if not 0 <= port <= 65535:
+        raise ValueError("Malformed PROXY v1 header")
+    return source, port
+
+
+def _parse_v2(command: int, family: int, body: bytes) -> Optional[Tuple[str, int]]:
+    """
+    Parse the address block of a version 2 header.
+
+    Args:
+        command (int): Version and command byte
+        family (int): Address family and transport byte
+        body (bytes): Address block and any TLVs
+
+    Returns:
+        Optional[Tuple[str, int]]: Client address, or None for LOCAL connections
+            and unsupported address families
+    """
+    if command == V2_COMMAND_LOCAL:
+        return None
+    if command != V2_COMMAND_PROXY:
+        raise ValueError("Unsupported PROXY v2 command")
+
+    if family == V2_FAMILY_TCP4 and len(body) >= 12:
+        source = socket.inet_ntop(socket.AF_INET, body[0:4])
+        port = int.from_bytes(body[8:10], "big")
+        return source, port
+    if family == V2_FAMILY_TCP6 and len(body) >= 36:
+        source = socket.inet_ntop(socket.AF_INET6, body[0:16])
+        port = int.from_bytes(body[32:34], "big")
+        return source, port
+    return None
+
+
+def read_proxy_header(conn: socket.socket) -> Optional[Tuple[str, int]]:
+    """
+    Read a PROXY protocol v1 or v2 header from the start of a connection.
+
+    Exactly the header is consumed, so whatever the client sent after it
+    (a TLS ClientHello or a WebSocket upgrade request) is left on the socket.
+
+    Socket Handling: Must be called on a plain socket before anything else is
+    read from it. The shortest possible header is read first; the rest of a
+    version 1 line is read a byte at a time, so nothing past its CRLF is consumed.
+
+    Args:
+        conn (socket.socket): Accepted connection from the proxy
+
+    Returns:
+        Optional[Tuple[str, int]]: Address of the original client, or None if the
+            proxy did not provide one (health checks and other local connections)
+
+    Raises:
+        ValueError: If the connection does not start with a valid PROXY header
+        ConnectionError: If the connection closes during the header
+    """
+    header = _recv_exact(conn, V1_MIN_LENGTH)
+
+    if header.startswith(V2_SIGNATURE):
+        header += _recv_exact(conn, len(V2_SIGNATURE) + V2_HEADER.size - len(header))
+        command, family, length = V2_HEADER.unpack_from(header, len(V2_SIGNATURE))
+        if command >> 4 != 2:
+            raise ValueError("Unsupported PROXY protocol version")
+        return _parse_v2(command, family, _recv_exact(conn, length))
+
+    if header.startswith(b"PROXY "):
+        while not header.endswith(b"\r\n"):
+            if len(header) >= V1_MAX_LENGTH:
+                raise ValueError("Malformed PROXY v1 header")
+            header += _recv_exact(conn, 1)
+        return _parse_v1(header[:-2])
+
+    raise ValueError("Connection did not start with a PROXY header")
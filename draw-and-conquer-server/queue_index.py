@@ -0,0 +1,174 @@
+from typing import Dict, Hashable, List, Optional
+
+
+class QueueIndex:
+    """
+    Order-statistic index of a FIFO queue, answering a member's position in O(log n).
+
+    Every member gets the next enqueue sequence number and a Fenwick tree
+    over sequence numbers counts the members still queued, so a member's
+    position is the prefix sum up to its sequence number. Adding and removing
+    a member anywhere in the queue are O(log n) point updates. Members added
+    at the front take sequence numbers counting down from the lowest one
+    handed out. A sequence number can also be reserved for a member expected
+    to join later, who then takes the place in line the reservation was made
+    at. When sequence numbers run out at either end, the live members and
+    reservations are renumbered into a fresh tree sized for them, which keeps
+    additions amortized O(log n).
+
+    Shared Object Handling: Not synchronized; owned by MatchmakerState and
+    only used under its lock.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        """
+        Initialize an empty index.
+
+        Args:
+            capacity (int): Sequence numbers available before the first renumbering
+        """
+        self._sequence: Dict[Hashable, int] = {}
+        # Sequence numbers held for members who have not joined yet
+        self._reserved: Dict[Hashable, int] = {}
+        self._tree: List[int] = [0] * (capacity + 1)
+        self._next = 1
+        # Lowest sequence number handed out since the last renumbering
+        self._first = 1
+
+    def __len__(self) -> int:
+        return len(self._sequence)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._sequence
+
+    def _update(self, index: int, delta: int) -> None:
+        tree = self._tree
+        size = len(tree)
+        while index < size:
+            tree[index] += delta
+            index += index & -index
+
+    def _prefix(self, index: int) -> int:
+        tree = self._tree
+        total = 0
+        while index:
+            total += tree[index]
+            index &= index - 1
+        return total
+
+    def _renumber(self, front: bool = False) -> None:
+        """
+        Give the live members and reservations consecutive sequence numbers in a
+        new tree with room for as many additions again, built in O(n).
+
+        Args:
+            front (bool): Leave sequence number 1 free for an addition at the front
+        """
+        numbers = {**self._sequence, **self._reserved}
+        members = sorted(numbers, key=numbers.__getitem__)
+        capacity = max(1024, 2 * len(members) + 2)
+        tree = [0] * (capacity + 1)
+        start = 2 if front else 1
+        for index, key in enumerate(members, start):
+            if key in self._reserved:
+                self._reserved[key] = index
+                continue
+            self._sequence[key] = index
+            tree[index] = 1
+        for index in range(1, capacity + 1):
+            parent = index + (index & -index)
+            if parent <= capacity:
+                tree[parent] += tree[index]
+        self._tree = tree
+        self._first = start
+        self._next = len(members) + start
+
+    def add(self, key: Hashable, front: bool = False) -> None:
+        """
+        Append a member to the back of the queue, or at their reserved place.
+        Members already queued keep their position.
+
+        Args:
+            key (Hashable): The member, e.g. a player ID
+            front (bool): Add the member at the front of the queue instead
+        """
+        if key in self._sequence:
+            return
+        reserved = self._reserved.pop(key, None)
+        if reserved is not None and not front:
+            index = reserved
+        elif front:
+            if self._first <= 1:
+                self._renumber(front=True)
+            self._first -= 1
+            index = self._first
+        else:
+            if self._next >= len(self._tree):
+                self._renumber()
+            index = self._next
+            self._next += 1
+        self._sequence[key] = index
+        self._update(index, 1)
+
+    def reserve(self, key: Hashable) -> None:
+        """
+        Hold the next place at the back of the queue for a member who joins later.
+
+        Positions do not count the reservation until the member is added.
+
+        Args:
+            key (Hashable): The member
+        """
+        if key in self._sequence or key in self._reserved:
+            return
+        if self._next >= len(self._tree):
+            self._renumber()
+        self._reserved[key] = self._next
+        self._next += 1
+
+    def release(self, key: Hashable) -> None:
+        """
+        Drop a reservation that will not be used.
+
+        Args:
+            key (Hashable): The member
+        """
+        self._reserved.pop(key, None)
+
+    def sequence(self, key: Hashable) -> Optional[int]:
+        """
+        Get a queued member's sequence number, which orders the queue.
+
+        Args:
+            key (Hashable): The member
+
+        Returns:
+            Optional[int]: Sequence number, or None if not queued
+        """
+        return self._sequence.get(key)
+
+    def remove(self, key: Hashable) -> None:
+        """
+        Remove a member from anywhere in the queue.
+
+        Args:
+            key (Hashable): The member
+        """
+        index = self._sequence.pop(key, None)
+        if index is not None:
+            self._update(index, -1)
+
+    def position(self, key: Hashable) -> Optional[int]:
+        """
+        Get a member's position in the queue.
+
+        Args:
+            key (Hashable): The member
+
+        Returns:
+            Optional[int]: 1 for the front of the queue, or None if not queued
+        """
+        index = self._sequence.get(key)
+        if index is None:
+            return None
+        return self._prefix(index)
@@ -0,0 +1,181 @@
+import threading
+import time
+from typing import Dict, Hashable, Optional, Tuple
+
+# Bucket checked for every message, before it is parsed
+MESSAGE_BUCKET = "message"
+
+# Default (tokens per second, burst) per bucket
+DEFAULT_RATES: Dict[str, Tuple[float, float]] = {
+    MESSAGE_BUCKET: (50.0, 100.0),
+    "pen_colour_request": (1.0, 5.0),
+    "pen_down": (20.0, 40.0),
+    "pen_up_tile_claimed": (20.0, 40.0),
+    "pen_up_tile_not_claimed": (20.0, 40.0),
+    "viewport": (10.0, 20.0),
+}
+
+
+def parse_rate(spec: str) -> Tuple[str, Tuple[float, float]]:
+    """
+    Parse a command line rate limit of the form bucket=rate:burst.
+
+    Args:
+        spec (str): Rate limit specification, e.g. "pen_down=20:40"
+
+    Returns:
+        Tuple[str, Tuple[float, float]]: Bucket name and (rate, burst)
+    """
+    try:
+        bucket, _, limits = spec.partition("=")
+        rate, _, burst = limits.partition(":")
+        rate = float(rate)
+        return bucket, (rate, float(burst) if burst else rate)
+    except ValueError:
+        raise ValueError(f"Invalid rate limit {spec!r}, expected bucket=rate:burst")
+
+
+class TokenBucket:
+    """
+    Token bucket allowing rate events per second on average and burst at once.
+
+    Shared Object Handling: Not synchronized; each bucket belongs to a single
+    connection and is only used by that connection's thread.
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "updated", "violations")
+
+    def __init__(self, rate: float, burst: float):
+        """
+        Initialize a full bucket.
+
+        Args:
+            rate (float): Tokens added per second
+            burst (float): Bucket capacity
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        # Rejections since the bucket last allowed an event
+        self.violations = 0
+
+    def consume(self) -> bool:
+        """
+        Take one token if one is available.
+
+        Returns:
+            bool: True if the event is allowed, False if it should be rejected
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            self.violations += 1
+            return False
+        self.tokens -= 1
+        self.violations = 0
+        return True
+
+
+class ConnectionBuckets:
+    """
+    Token buckets of one connection and the rejection streak of its last
+    rejecting bucket.
+    """
+
+    __slots__ = ("buckets", "violations")
+
+    def __init__(self):
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.violations = 0
+
+
+class RateLimiter:
+    """
+    Per-connection token buckets, one per configured bucket name.
+
+    Connections that keep sending after being rate limited are reported as
+    abusive once they exceed max_violations rejections in a row, so the
+    caller can close them.
+
+    Shared Object Handling: The connection table is shared between connection
+    threads and guarded by a lock. Buckets themselves are only used by their
+    connection's thread.
+    """
+
+    def __init__(
+        self,
+        rates: Optional[Dict[str, Tuple[float, float]]] = None,
+        max_violations: int = 100,
+    ):
+        """
+        Initialize the rate limiter.
+
+        Args:
+            rates (Dict[str, Tuple[float, float]]): (rate, burst) per bucket name,
+                merged over DEFAULT_RATES
+            max_violations (int): Consecutive rejections before a connection is abusive
+        """
+        self.rates = dict(DEFAULT_RATES)
+        self.rates.update(rates or {})
+        self.max_violations = max_violations
+        self.lock = threading.Lock()
+        self._connections: Dict[Hashable, ConnectionBuckets] = {}
+
+    def _connection(self, conn: Hashable) -> ConnectionBuckets:
+        state = self._connections.get(conn)
+        if state is None:
+            with self.lock:
+                state = self._connections.setdefault(conn, ConnectionBuckets())
+        return state
+
+    def allow(self, conn: Hashable, bucket: str) -> bool:
+        """
+        Check and charge a connection's bucket.
+
+        Buckets without a configured rate are not limited.
+
+        Args:
+            conn (Hashable): The connection, typically its WebSocketInterface
+            bucket (str): Bucket name, MESSAGE_BUCKET or a command
+
+        Returns:
+            bool: True if the message may be processed
+        """
+        limits = self.rates.get(bucket)
+        if limits is None:
+            return True
+
+        state = self._connection(conn)
+        token_bucket = state.buckets.get(bucket)
+        if token_bucket is None:
+            token_bucket = state.buckets[bucket] = TokenBucket(*limits)
+
+        if token_bucket.consume():
+            return True
+        state.violations = token_bucket.violations
+        return False
+
+    def is_abusive(self, conn: Hashable) -> bool:
+        """
+        Check whether a connection's last rejected bucket rejected too many events in a row.
+
+        Args:
+            conn (Hashable): The connection
+
+        Returns:
+            bool: True if the connection should be closed
+        """
+        state = self._connections.get(conn)
+        return state is not None and state.violations >= self.max_violations
+
+    def forget(self, conn: Hashable) -> None:
+        """
+        Drop a closed connection's buckets.
+
+        Args:
+            conn (Hashable): The connection
+        """
+        with self.lock:
+            self._connections.pop(conn, None)
@@ -0,0 +1,234 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, TextIO, Tuple
+
+logger = logging.getLogger(__name__)
+
+RECORDING_SUFFIX = ".jsonl"
+
+
+class GameRecorder:
+    """
+    Records inbound game server messages, per game session, to JSONL files.
+
+    Each recording starts with a header line holding the session parameters,
+    followed by one line per message with a monotonic timestamp relative to
+    session creation and the connection it arrived on. Transitions the server
+    makes on its own, such as lease expiries, disconnects, inactive player
+    removals and bot moves, are recorded in between as event lines, so a
+    replay reaches the same board. When the session is removed, a final line
+    holds its board and winner for replays to be checked against.
+
+    Request threads only enqueue the messages; a background writer thread
+    formats them, appends each batch to the recordings with one write per
+    file and flushes, so a recording survives a crash up to the last batch.
+
+    Shared Object Handling: The queue is the only structure shared with
+    request threads. The recording files are owned by the writer thread.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Initialize the recorder.
+
+        Args:
+            directory (str): Directory recordings are written to
+        """
+        self.directory = directory
+        self._items: "queue.SimpleQueue[Optional[Tuple]]" = queue.SimpleQueue()
+        # Game session UUID -> (recording, time.monotonic() of session creation)
+        self._files: Dict[str, Tuple[TextIO, float]] = {}
+        self._thread: Optional[threading.Thread] = None
+
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self) -> None:
+        """
+        Start the background writer thread.
+        """
+        self._thread = threading.Thread(target=self._run, name="recorder", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """
+        Write all queued messages, close the recordings and stop the writer thread.
+        """
+        if self._thread is None:
+            return
+        self._items.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def record_session(
+        self,
+        game_session_uuid: str,
+        player_ids: List[str],
+        player_names: Dict[str, str],
+        num_tiles: int,
+        colour_selection_timeout: int,
+    ) -> None:
+        """
+        Start a recording for a newly created game session.
+
+        Args:
+            game_session_uuid (str): Unique identifier for the game session
+            player_ids (List[str]): List of player unique identifiers
+            player_names (Dict[str, str]): Mapping of player IDs to display names
+            num_tiles (int): Total number of tiles in the game
+            colour_selection_timeout (int): Timeout for colour selection phase in seconds
+        """
+        header = {
+            "session": {
+                "game_session_uuid": game_session_uuid,
+                "player_ids": list(player_ids),
+                "player_names": dict(player_names),
+                "num_tiles": num_tiles,
+                "colour_selection_timeout": colour_selection_timeout,
+            }
+        }
+        self._items.put(("session", game_session_uuid, time.monotonic(), header))
+
+    def record_message(
+        self, game_session_uuid: str, addr: Tuple[str, int], data: str
+    ) -> None:
+        """
+        Queue an inbound message for its session's recording. Never blocks on disk.
+
+        Messages for sessions that are not recorded are dropped by the writer.
+
+        Args:
+            game_session_uuid (str): Session named by the message
+            addr (Tuple[str, int]): Client address the message arrived from
+            data (str): Raw message from the client
+        """
+        self._items.put(("message", game_session_uuid, time.monotonic(), addr, data))
+
+    def record_event(self, game_session_uuid: str, kind: str, fields: Dict) -> None:
+        """
+        Queue a transition the server made without a client message, such as a
+        lease expiry or a bot move. Never blocks on disk.
+
+        Args:
+            game_session_uuid (str): Session the event belongs to
+            kind (str): Event kind, replayed by ReplayEngine
+            fields (Dict): Event payload, must be JSON serializable
+        """
+        self._items.put(("event", game_session_uuid, time.monotonic(), kind, fields))
+
+    def close_session(
+        self,
+        game_session_uuid: str,
+        tile_owners: Optional[Dict[int, str]] = None,
+        winner: Optional[str] = None,
+    ) -> None:
+        """
+        Finish the recording of a game session with its final board.
+
+        Args:
+            game_session_uuid (str): Unique identifier for the game session
+            tile_owners (Optional[Dict[int, str]]): Final board, tile index to owner
+            winner (Optional[str]): Winning player ID, if the game was won
+        """
+        final = {"tile_owners": dict(tile_owners or {}), "winner": winner}
+        self._items.put(("close", game_session_uuid, time.monotonic(), final))
+
+    def _run(self) -> None:
+        """
+        Writer loop: take every queued item, then write and flush each recording once.
+        """
+        running = True
+        while running:
+            item = self._items.get()
+            lines: Dict[str, List[str]] = {}
+            while True:
+                if item is None:
+                    running = False
+                    break
+                self._apply(item, lines)
+                try:
+                    item = self._items.get_nowait()
+                except queue.Empty:
+                    break
+
+            for game_session_uuid, session_lines in lines.items():
+                self._write(game_session_uuid, session_lines)
+
+        for f, _ in self._files.values():
+            f.close()
+        self._files.clear()
+
+    def _apply(self, item: Tuple, lines: Dict[str, List[str]]) -> None:
+        """
+        Open, extend or close a recording for one queued item.
+
+        Args:
+            item (Tuple): Kind, game session UUID and the kind's fields
+            lines (Dict[str, List[str]]): Lines of this batch not yet written, by session
+        """
+        kind, game_session_uuid = item[0], item[1]
+        if kind == "session":
+            _, _, started, header = item
+            path = os.path.join(self.directory, game_session_uuid + RECORDING_SUFFIX)
+            try:
+                f = open(path, "w", encoding="utf-8")
+            except OSError as e:
+                logger.error("Session %s: Recording failed: %s", game_session_uuid, e)
+                return
+            self._files[game_session_uuid] = (f, started)
+            lines[game_session_uuid] = [json.dumps(header) + "\n"]
+            logger.debug("Session %s: Recording to %s", game_session_uuid, path)
+            return
+
+        entry = self._files.get(game_session_uuid)
+        if entry is None:
+            return
+        if kind == "message":
+            _, _, timestamp, addr, data = item
+            lines.setdefault(game_session_uuid, []).append(
+                json.dumps(
+                    {
+                        "t": timestamp - entry[1],
+                        "conn": f"{addr[0]}:{addr[1]}",
+                        "data": data,
+                    }
+                )
+                + "\n"
+            )
+        elif kind == "event":
+            _, _, timestamp, event, fields = item
+            lines.setdefault(game_session_uuid, []).append(
+                json.dumps(
+                    {"t": timestamp - entry[1], "event": event, "fields": fields}
+                )
+                + "\n"
+            )
+        elif kind == "close":
+            _, _, timestamp, final = item
+            session_lines = lines.pop(game_session_uuid, [])
+            session_lines.append(
+                json.dumps({"t": timestamp - entry[1], "final": final}) + "\n"
+            )
+            self._write(game_session_uuid, session_lines)
+            del self._files[game_session_uuid]
+            entry[0].close()
+
+    def _write(self, game_session_uuid: str, session_lines: List[str]) -> None:
+        """
+        Append lines to a session's recording and flush it.
+
+        Args:
+            game_session_uuid (str): Unique identifier for the game session
+            session_lines (List[str]): JSONL lines to append
+        """
+        if not session_lines:
+            return
+        f = self._files[game_session_uuid][0]
+        try:
+            f.write("".join(session_lines))
+            f.flush()
+        except OSError as e:
+            logger.error("Session %s: Recording failed: %s", game_session_uuid, e)
@@ -0,0 +1,119 @@
+import math
+from typing import Dict, List, Set
+
+
+class RegionIndex:
+    """
+    Splits a game board into square regions and indexes which players watch each one.
+
+    Tiles are laid out row-major on a square board of ceil(sqrt(num_tiles))
+    columns. Regions are region_size x region_size blocks of tiles, numbered
+    row-major as well. Players who have not reported a viewport watch the
+    whole board, so clients that never subscribe still see every tile event.
+
+    Shared Object Handling: Owned by a GameSession and not synchronized itself;
+    only used under the session's lock.
+    """
+
+    def __init__(self, num_tiles: int, region_size: int, player_ids: List[str]):
+        """
+        Initialize the region index.
+
+        Args:
+            num_tiles (int): Total number of tiles on the board
+            region_size (int): Width and height of a region in tiles
+            player_ids (List[str]): Players that initially watch the whole board
+        """
+        self.num_tiles = num_tiles
+        self.region_size = region_size
+        self.board_width = max(1, math.isqrt(num_tiles - 1) + 1) if num_tiles else 1
+        self.board_height = -(-num_tiles // self.board_width)
+        self.regions_x = -(-self.board_width // region_size)
+        self.regions_y = -(-self.board_height // region_size)
+        self.num_regions = self.regions_x * self.regions_y
+
+        self.whole_board: Set[str] = set(player_ids)
+        self.subscribers: Dict[int, Set[str]] = {}
+        self.player_regions: Dict[str, List[int]] = {}
+
+    def region_of(self, tile_index: int) -> int:
+        """
+        Get the region a tile belongs to.
+
+        Args:
+            tile_index (int): Index of the tile
+
+        Returns:
+            int: Region number
+        """
+        row, column = divmod(tile_index, self.board_width)
+        return (row // self.region_size) * self.regions_x + column // self.region_size
+
+    def regions_in_viewport(self, x: int, y: int, width: int, height: int) -> List[int]:
+        """
+        Get the regions overlapping a rectangle of tiles.
+
+        Args:
+            x (int): Leftmost tile column of the viewport
+            y (int): Topmost tile row of the viewport
+            width (int): Viewport width in tiles
+            height (int): Viewport height in tiles
+
+        Returns:
+            List[int]: Region numbers, clipped to the board
+        """
+        if width <= 0 or height <= 0:
+            return []
+        first_x = max(0, x) // self.region_size
+        first_y = max(0, y) // self.region_size
+        last_x = min(self.regions_x - 1, (x + width - 1) // self.region_size)
+        last_y = min(self.regions_y - 1, (y + height - 1) // self.region_size)
+        return [
+            region_y * self.regions_x + region_x
+            for region_y in range(first_y, last_y + 1)
+            for region_x in range(first_x, last_x + 1)
+        ]
+
+    def subscribe(self, player_id: str, regions: List[int]) -> None:
+        """
+        Replace the regions a player watches.
+
+        Args:
+            player_id (str): Unique identifier for the player
+            regions (List[int]): Region numbers in the player's viewport
+        """
+        self.unsubscribe(player_id)
+        self.player_regions[player_id] = regions
+        for region in regions:
+            self.subscribers.setdefault(region, set()).add(player_id)
+
+    def unsubscribe(self, player_id: str) -> None:
+        """
+        Stop sending tile events to a player.
+
+        Args:
+            player_id (str): Unique identifier for the player
+        """
+        self.whole_board.discard(player_id)
+        for region in self.player_regions.pop(player_id, []):
+            watchers = self.subscribers.get(region)
+            if watchers is not None:
+                watchers.discard(player_id)
+                if not watchers:
+                    del self.subscribers[region]
+
+    def recipients(self, tile_index: int) -> List[str]:
+        """
+        Get the players that should receive an event for a tile.
+
+        Args:
+            tile_index (int): Index of the tile
+
+        Returns:
+            List[str]: Player IDs watching the tile's region or the whole board
+        """
+        watchers = list(self.whole_board)
+        region_watchers = self.subscribers.get(self.region_of(tile_index))
+        if region_watchers:
+            watchers.extend(region_watchers.copy())
+        return watchers
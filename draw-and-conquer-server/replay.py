@@ -0,0 +1,371 @@
+import argparse
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from game_server import (
+    GameServerState,
+    GameSession,
+    broadcast_game_win,
+    game_server_disconnect_handler,
+    game_server_request_handler,
+    start_game_if_ready,
+)
+from recorder import RECORDING_SUFFIX
+from server import WebSocketInterface
+from transport import Transport
+from watchdog import GameSessionWatchdog
+
+# How a replay's final board compares with the recorded one
+RECORDED_BOARD = {True: "match", False: "MISMATCH", None: "none"}
+
+
+class FakeSocket(Transport):
+    """
+    In-memory transport that collects everything sent to it and never receives.
+    """
+
+    def __init__(self):
+        self.sent = bytearray()
+        self.closed = False
+
+    def sendall(self, data: bytes) -> None:
+        self.sent += data
+
+    def recv(self, _bufsize: int) -> bytes:
+        return b""
+
+    def recv_into(self, _buffer) -> int:
+        return 0
+
+    def shutdown(self, _how: int) -> None:
+        self.closed = True
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class FinalBoard:
+    """
+    Stand-in for a GameRecorder that only keeps each removed session's final
+    board, taken at the same point as the recorded one, before the session's
+    data is released.
+    """
+
+    def __init__(self):
+        self.finals: Dict[str, Tuple[Dict[int, str], Optional[str]]] = {}
+
+    def record_session(self, *_args) -> None:
+        pass
+
+    def record_message(self, *_args) -> None:
+        pass
+
+    def record_event(self, *_args) -> None:
+        pass
+
+    def close_session(
+        self,
+        game_session_uuid: str,
+        tile_owners: Optional[Dict[int, str]] = None,
+        winner: Optional[str] = None,
+    ) -> None:
+        self.finals[game_session_uuid] = (dict(tile_owners or {}), winner)
+
+
+class ReplayResult:
+    """
+    Outcome and timing of a single replay run.
+    """
+
+    def __init__(
+        self,
+        messages: int,
+        elapsed: float,
+        tile_owners: Dict[int, str],
+        winner: Optional[str],
+    ):
+        """
+        Initialize a replay result.
+
+        Args:
+            messages (int): Number of messages replayed
+            elapsed (float): Wall-clock seconds spent replaying
+            tile_owners (Dict[int, str]): Final board, tile index to owner
+            winner (Optional[str]): Winning player ID, if the game was won
+        """
+        self.messages = messages
+        self.elapsed = elapsed
+        self.tile_owners = tile_owners
+        self.winner = winner
+
+    @property
+    def throughput(self) -> float:
+        """
+        Messages handled per second.
+        """
+        return self.messages / self.elapsed if self.elapsed > 0 else float("inf")
+
+    def outcome(self) -> Tuple[Tuple[Tuple[int, str], ...], Optional[str]]:
+        """
+        Comparable summary of the final board and winner.
+        """
+        return tuple(sorted(self.tile_owners.items())), self.winner
+
+
+class ReplayEngine:
+    """
+    Feeds a recorded game session through game_server_request_handler.
+
+    Each recorded connection gets a WebSocketInterface over a FakeSocket, so
+    frames are encoded exactly as on a live server without any network I/O.
+    Recorded server events are applied through the same code paths the live
+    server took: disconnects through game_server_disconnect_handler, inactive
+    players through GameSessionWatchdog, and lease expiries and bot moves
+    directly on the session.
+    """
+
+    def __init__(self, path: str):
+        """
+        Load a recording.
+
+        Args:
+            path (str): Path to a recording written by GameRecorder
+        """
+        self.path = path
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+
+        self.session: Dict = json.loads(lines[0])["session"]
+        self.messages: List[Dict] = []
+        # Final board and winner of the live game, if the recording was finished
+        self.final: Optional[Tuple[Dict[int, str], Optional[str]]] = None
+        for line in lines[1:]:
+            if not line:
+                continue
+            entry = json.loads(line)
+            if "final" in entry:
+                tile_owners = entry["final"]["tile_owners"]
+                self.final = (
+                    {int(tile): owner for tile, owner in tile_owners.items()},
+                    entry["final"]["winner"],
+                )
+            else:
+                self.messages.append(entry)
+
+    def run(self, realtime: bool = False, speed: float = 1.0) -> ReplayResult:
+        """
+        Replay the recording against a fresh GameServerState.
+
+        Args:
+            realtime (bool): Reproduce the recorded message timing
+            speed (float): Time scale applied in real-time mode
+
+        Returns:
+            ReplayResult: Final board, winner and throughput of the run
+        """
+        finals = FinalBoard()
+        game_state = GameServerState(recorder=finals)
+        game_session_uuid = self.session["game_session_uuid"]
+        game_state.create_game_session(
+            game_session_uuid,
+            list(self.session["player_ids"]),
+            dict(self.session["player_names"]),
+            self.session["num_tiles"],
+            self.session["colour_selection_timeout"],
+        )
+        session = game_state.get_game_session(game_session_uuid)
+
+        connections: Dict[str, Tuple[WebSocketInterface, Tuple[str, int]]] = {}
+        for message in self.messages:
+            conn = message.get("conn") or message["fields"].get("conn")
+            if conn is not None and conn not in connections:
+                host, _, port = conn.rpartition(":")
+                connections[conn] = (
+                    WebSocketInterface(FakeSocket()),
+                    (host, int(port)),
+                )
+
+        started = time.perf_counter()
+        for message in self.messages:
+            if realtime:
+                delay = message["t"] / speed - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            if "event" in message:
+                self._apply_event(
+                    game_state,
+                    session,
+                    connections,
+                    message["event"],
+                    message["fields"],
+                )
+                continue
+            ws, addr = connections[message["conn"]]
+            game_server_request_handler(ws, addr, message["data"], game_state)
+        elapsed = time.perf_counter() - started
+
+        # A removed session's data is released, so take the board it ended with
+        tile_owners, winner = finals.finals.get(
+            game_session_uuid, (dict(session.tile_owners), session.winner)
+        )
+        return ReplayResult(len(self.messages), elapsed, tile_owners, winner)
+
+    def _apply_event(
+        self,
+        game_state: GameServerState,
+        session: GameSession,
+        connections: Dict[str, Tuple[WebSocketInterface, Tuple[str, int]]],
+        kind: str,
+        fields: Dict,
+    ) -> None:
+        """
+        Apply a transition the live server made on its own.
+
+        Args:
+            game_state (GameServerState): State being replayed into
+            session (GameSession): The recorded session
+            connections (Dict[str, Tuple[WebSocketInterface, Tuple[str, int]]]):
+                Replay connections by recorded address
+            kind (str): Event kind
+            fields (Dict): Event payload
+        """
+        if kind == "disconnect":
+            ws, addr = connections[fields["conn"]]
+            game_server_disconnect_handler(ws, addr, game_state)
+        elif kind == "inactive":
+            watchdog = GameSessionWatchdog(game_state)
+            watchdog._remove_inactive_players(session, fields["players"])
+            if not session.has_enough_players(2) or not session.has_human_players():
+                game_state.end_game_insufficient_players(session)
+        elif kind == "lease_expired":
+            session.unlock_tile(fields["tile"], fields["player"])
+        elif kind == "bots":
+            session.bot_ids.update(fields["players"])
+        elif kind == "bot_colour":
+            session.assign_colour(fields["player"])
+            start_game_if_ready(session)
+        elif kind == "bot_lock":
+            session.lock_tile(fields["tile"], fields["player"])
+        elif kind == "bot_unlock":
+            session.unlock_tile(fields["tile"], fields["player"], claim=fields["claim"])
+            if session.game_ended and session.winner == fields["player"]:
+                broadcast_game_win(session, game_state.rematch_window)
+
+    def matches_recording(self, result: ReplayResult) -> Optional[bool]:
+        """
+        Compare a replay's outcome with the board the live game ended with.
+
+        Args:
+            result (ReplayResult): Outcome of a replay
+
+        Returns:
+            Optional[bool]: Whether they match, or None if the recording has no
+                final board because the session was still running
+        """
+        if self.final is None:
+            return None
+        tile_owners, winner = self.final
+        return result.outcome() == (tuple(sorted(tile_owners.items())), winner)
+
+    def verify_determinism(self, runs: int = 3) -> Tuple[bool, List[ReplayResult]]:
+        """
+        Replay several times as fast as possible and compare the outcomes with
+        each other and with the recorded final board, if there is one.
+
+        Args:
+            runs (int): Number of replays to compare
+
+        Returns:
+            Tuple[bool, List[ReplayResult]]: Whether all outcomes matched, and the results
+        """
+        results = [self.run() for _ in range(runs)]
+        deterministic = all(r.outcome() == results[0].outcome() for r in results)
+        if self.matches_recording(results[0]) is False:
+            deterministic = False
+        return deterministic, results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "recordings",
+        type=str,
+        nargs="+",
+        help="Recording files or directories of recordings to replay",
+    )
+    parser.add_argument(
+        "--realtime",
+        action="store_true",
+        help="Replay with the recorded message timing instead of as fast as possible",
+    )
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="Time scale for real-time replay",
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=3,
+        help="Number of runs per recording used to check determinism",
+    )
+    return parser.parse_args()
+
+
+def main():
+    """
+    Replay recordings and report throughput, determinism and whether the
+    replays end with the recorded final board.
+
+    Exits with a non-zero status if any recording replays non-deterministically
+    or to a different board than the live game.
+    """
+    args = parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    paths = []
+    for recording in args.recordings:
+        if os.path.isdir(recording):
+            paths.extend(
+                os.path.join(recording, name)
+                for name in sorted(os.listdir(recording))
+                if name.endswith(RECORDING_SUFFIX)
+            )
+        else:
+            paths.append(recording)
+
+    failures = 0
+    for path in paths:
+        engine = ReplayEngine(path)
+        deterministic, results = engine.verify_determinism(args.runs)
+        if args.realtime:
+            results.append(engine.run(realtime=True, speed=args.speed))
+            deterministic = deterministic and (
+                results[-1].outcome() == results[0].outcome()
+            )
+
+        best = max(results[: args.runs], key=lambda r: r.throughput)
+        recorded = engine.matches_recording(results[0])
+        print(
+            f"{os.path.basename(path)}: {best.messages} messages, "
+            f"{best.throughput:,.0f} msg/s, winner={best.winner}, "
+            f"tiles claimed={len(best.tile_owners)}, "
+            f"deterministic={'yes' if deterministic else 'NO'}, "
+            f"recorded board={RECORDED_BOARD[recorded]}"
+        )
+        if args.realtime:
+            print(f"  real-time replay took {results[-1].elapsed:.2f}s")
+        if not deterministic:
+            failures += 1
+
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
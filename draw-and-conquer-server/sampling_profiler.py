@@ -0,0 +1,306 @@
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Optional
+
+import lock_profiler
+
+logger = logging.getLogger(__name__)
+
+# Readable role per thread name prefix (the name up to the first "-")
+THREAD_ROLES = {
+    "MainThread": "main",
+    "accept": "accept_loop",
+    "conn": "connection_handler",
+    "ping": "ping_scheduler",
+    "QueueWatchdog": "QueueWatchdog",
+    "QueueLengthWatchdog": "QueueLengthWatchdog",
+    "GameSessionWatchdog": "GameSessionWatchdog",
+    "TileLeaseWatchdog": "TileLeaseWatchdog",
+    "event": "event_log",
+    "trace": "MatchTracer",
+    "recorder": "GameRecorder",
+    "stats": "stats",
+    "admin": "admin",
+    "bots": "BotEngine",
+}
+
+# Limits on a single profiling request
+MAX_DURATION = 60.0
+MAX_RATE = 1000.0
+MAX_STACK_DEPTH = 128
+
+# Fraction of one core the sampler may use; the sampling interval is stretched
+# when walking every thread's stack takes longer than this allows
+MAX_DUTY_CYCLE = 0.05
+
+
+def thread_role(name: str) -> str:
+    """
+    Get the role of a thread from its name, e.g. "conn-9437-12" -> "connection_handler".
+
+    Args:
+        name (str): Thread name
+
+    Returns:
+        str: Role used as the root frame of the thread's samples
+    """
+    prefix = name.split("-", 1)[0]
+    return THREAD_ROLES.get(prefix, prefix)
+
+
+def _is_running(native_id: Optional[int]) -> bool:
+    """
+    Check whether a thread is currently on a CPU, from /proc on Linux.
+
+    Args:
+        native_id (Optional[int]): Kernel thread ID
+
+    Returns:
+        bool: True if the thread is running or runnable
+    """
+    try:
+        with open(f"/proc/self/task/{native_id}/stat", "rb") as f:
+            stat = f.read()
+    except OSError:
+        return False
+    # The state follows the parenthesized command name, which may contain spaces
+    return stat[stat.rindex(b")") + 2 : stat.rindex(b")") + 3] == b"R"
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler sampling the Python stacks of every thread with
+    sys._current_frames.
+
+    Samples are collapsed into "role;module.function;... count" lines, the
+    input format of flamegraph.pl and speedscope. In wall mode every thread is
+    sampled, including blocked ones; in cpu mode only threads the kernel
+    reports as running are sampled (Linux only).
+
+    Shared Object Handling: Reads other threads' frames without stopping
+    them; sys._current_frames takes a consistent snapshot under the
+    interpreter's thread state lock. Frame labels are cached per code object
+    in the sampling thread.
+    """
+
+    def __init__(self):
+        """
+        Initialize the profiler.
+        """
+        self._labels: Dict[object, str] = {}
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            module = os.path.splitext(os.path.basename(code.co_filename))[0]
+            label = f"{module}.{getattr(code, 'co_qualname', code.co_name)}"
+            self._labels[code] = label
+        return label
+
+    def _collapse(self, role: str, frame) -> str:
+        labels = []
+        while frame is not None and len(labels) < MAX_STACK_DEPTH:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        labels.append(role)
+        labels.reverse()
+        return ";".join(labels)
+
+    def profile(
+        self, duration: float, rate: float = 100.0, mode: str = "wall"
+    ) -> Counter:
+        """
+        Sample all other threads for a period of time.
+
+        Args:
+            duration (float): Seconds to sample for
+            rate (float): Samples per second, reduced automatically when a sample
+                costs more than MAX_DUTY_CYCLE of a core
+            mode (str): "wall" to sample every thread, "cpu" to sample running threads
+
+        Returns:
+            Counter: Sample counts keyed by collapsed stack
+        """
+        if mode not in ("wall", "cpu"):
+            raise ValueError(f"Unknown profiling mode {mode!r}, expected wall or cpu")
+        if mode == "cpu" and not os.path.isdir("/proc/self/task"):
+            raise ValueError("cpu mode needs /proc/self/task")
+        duration = min(max(duration, 0.0), MAX_DURATION)
+        interval = 1 / min(max(rate, 1.0), MAX_RATE)
+
+        counts: Counter = Counter()
+        me = threading.get_ident()
+        samples = 0
+        started = time.monotonic()
+        deadline = started + duration
+        while True:
+            sample_started = time.monotonic()
+            if sample_started >= deadline:
+                break
+            threads = {thread.ident: thread for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                thread = threads.get(ident)
+                if thread is None:
+                    continue
+                if mode == "cpu" and not _is_running(thread.native_id):
+                    continue
+                counts[self._collapse(thread_role(thread.name), frame)] += 1
+            frame = None
+            samples += 1
+
+            cost = time.monotonic() - sample_started
+            time.sleep(max(interval - cost, cost / MAX_DUTY_CYCLE - cost))
+
+        elapsed = time.monotonic() - started
+        logger.info(
+            "Profiled %s time for %.1fs: %d samples (%.0f/s), %d stacks",
+            mode,
+            elapsed,
+            samples,
+            samples / elapsed if elapsed else 0,
+            len(counts),
+        )
+        return counts
+
+
+def format_collapsed(counts: Counter) -> str:
+    """
+    Format sample counts as collapsed stacks, most frequent first.
+
+    Args:
+        counts (Counter): Sample counts keyed by collapsed stack
+
+    Returns:
+        str: One "stack count" line per stack
+    """
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+
+class AdminServer:
+    """
+    Plain-text admin command server for operators, bound to the loopback interface.
+
+    Each connection sends one command line and receives the output, then the
+    connection is closed:
+
+        profile [seconds] [rate] [wall|cpu]   collapsed stacks for flame graphs
+        locks                                 lock profiler report (--profile-locks)
+
+    For example: echo "profile 10 100 cpu" | nc 127.0.0.1 9439 > stacks.txt
+
+    Socket Handling: Commands are served one at a time on the admin thread,
+    so at most one profile runs at once.
+    """
+
+    def __init__(self, port: int, host: str = "127.0.0.1"):
+        """
+        Initialize the admin server.
+
+        Args:
+            port (int): Port to listen on
+            host (str): Address to bind; loopback by default so the port is not
+                reachable from other machines
+        """
+        self.host = host
+        self.port = port
+        self.sock: Optional[socket.socket] = None
+        self._stopping = False
+        self.profiler = SamplingProfiler()
+        self.commands: Dict[str, Callable[..., str]] = {
+            "profile": self.profile,
+            "locks": self.locks,
+        }
+
+    def profile(
+        self, seconds: str = "10", rate: str = "100", mode: str = "wall"
+    ) -> str:
+        """
+        Run the sampling profiler.
+
+        Args:
+            seconds (str): Duration, at most MAX_DURATION
+            rate (str): Samples per second, at most MAX_RATE
+            mode (str): "wall" or "cpu"
+
+        Returns:
+            str: Collapsed stacks
+        """
+        counts = self.profiler.profile(float(seconds), float(rate), mode)
+        return format_collapsed(counts)
+
+    def locks(self) -> str:
+        """
+        Get the lock profiler report.
+
+        Returns:
+            str: Lock contention table
+        """
+        profiler = lock_profiler.get_profiler()
+        if profiler is None:
+            raise ValueError(
+                "Lock profiling is off, start the server with --profile-locks"
+            )
+        return profiler.format_report() + "\n"
+
+    def _handle(self, conn: socket.socket) -> None:
+        conn.settimeout(5)
+        line = conn.makefile("rb").readline(256).decode("ascii", "replace")
+        conn.settimeout(None)
+        command, *args = line.split() or ["help"]
+        handler = self.commands.get(command)
+        try:
+            if handler is None:
+                raise ValueError(
+                    f"Unknown command {command!r}, expected one of: "
+                    + ", ".join(self.commands)
+                )
+            output = handler(*args)
+        except (TypeError, ValueError) as e:
+            output = f"error: {e}\n"
+        conn.sendall(output.encode("utf-8"))
+
+    def stop(self) -> None:
+        """
+        Stop listening and free the port, e.g. for the process taking over.
+        """
+        self._stopping = True
+        if self.sock is not None:
+            # Shutting down wakes the accept loop, which closes the socket
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def start(self) -> None:
+        """
+        Listen for admin commands until the process exits or stop() is called.
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(8)
+        self.sock = sock
+        self._stopping = False
+        logger.info("Admin server listening on %s:%d", self.host, self.port)
+
+        while True:
+            try:
+                conn, addr = sock.accept()
+            except OSError:
+                if not self._stopping:
+                    raise
+                sock.close()
+                return
+            try:
+                self._handle(conn)
+            except OSError as e:
+                logger.warning("Admin connection from %s failed: %s", addr[0], e)
+            finally:
+                conn.close()
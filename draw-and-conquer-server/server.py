@@ -1,13 +1,212 @@
 import base64
 import hashlib
+import heapq
+import logging
+import os
+import queue
 import socket
 import ssl
 import threading
-from typing import Callable, Optional, Tuple
+import time
+from collections import deque
+from typing import Callable, Collection, Dict, List, Optional, Tuple, Union
+
+from lock_profiler import make_lock
+from proxy_protocol import read_proxy_header
+from transport import PipeListener, SocketTransport, Transport
+
+logger = logging.getLogger(__name__)
 
 # RFC 6455 WebSocket magic string for handshake
 WS_MAGIC = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
 
+# Receive buffer size a connection starts with; it grows up to the maximum frame size
+INITIAL_RECEIVE_BUFFER = 4096
+
+# Largest WebSocket upgrade request accepted
+MAX_HANDSHAKE_SIZE = 8192
+
+# Close status for frames larger than the maximum message size (RFC 6455 section 7.4.1)
+CLOSE_MESSAGE_TOO_BIG = 1009
+
+# Close status for frames masked the wrong way for their direction (section 7.4.1)
+CLOSE_PROTOCOL_ERROR = 1002
+
+# XOR lookup tables used to mask and unmask payloads with bytes.translate, one per
+# mask byte
+UNMASK_TABLES = [bytes(i ^ key for i in range(256)) for key in range(256)]
+
+# Forward-secret key exchange only; TLS 1.3 suites are always (EC)DHE
+ECDHE_CIPHERS = "ECDHE+AESGCM:ECDHE+CHACHA20"
+
+
+def create_ssl_context(
+    certfile: str, keyfile: str, num_tickets: int = 2
+) -> ssl.SSLContext:
+    """
+    Create a server-side SSL context tuned for bursts of short-lived connections.
+
+    Session tickets and the server session cache are enabled so returning
+    clients resume instead of performing a full handshake. Sharing one context
+    between the matchmaker and game server lets a client resume on the game
+    server with the session it established with the matchmaker.
+
+    Args:
+        certfile (str): Path to SSL certificate file
+        keyfile (str): Path to SSL key file
+        num_tickets (int): TLS 1.3 session tickets issued per full handshake
+
+    Returns:
+        ssl.SSLContext: The configured context
+    """
+    ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    ssl_context.load_cert_chain(certfile=certfile, keyfile=keyfile)
+
+    ssl_context.minimum_version = ssl.TLSVersion.TLSv1_2
+    ssl_context.set_ciphers(ECDHE_CIPHERS)
+    ssl_context.options |= ssl.OP_CIPHER_SERVER_PREFERENCE | ssl.OP_SINGLE_ECDH_USE
+    ssl_context.options &= ~ssl.OP_NO_TICKET
+    ssl_context.num_tickets = num_tickets
+    return ssl_context
+
+
+class HandshakeMetrics:
+    """
+    Thread-safe TLS handshake counters and recent handshake durations.
+    """
+
+    def __init__(self, window: int = 1024):
+        """
+        Initialize handshake metrics.
+
+        Args:
+            window (int): Number of recent handshake durations kept for percentiles
+        """
+        self.lock = threading.Lock()
+        self.handshakes = 0
+        self.resumed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.durations: deque = deque(maxlen=window)
+
+    def record(self, duration: float, resumed: bool) -> None:
+        """
+        Record a completed handshake.
+
+        Args:
+            duration (float): Handshake duration in seconds
+            resumed (bool): Whether a previous TLS session was resumed
+        """
+        with self.lock:
+            self.handshakes += 1
+            if resumed:
+                self.resumed += 1
+            self.durations.append(duration)
+
+    def record_failure(self, timed_out: bool) -> None:
+        """
+        Record a failed handshake.
+
+        Args:
+            timed_out (bool): Whether the handshake hit the handshake timeout
+        """
+        with self.lock:
+            self.failed += 1
+            if timed_out:
+                self.timed_out += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Get a copy of the current metrics.
+
+        Returns:
+            Dict[str, float]: Counters, resumption rate and duration percentiles in ms
+        """
+        with self.lock:
+            durations = sorted(self.durations)
+            stats = {
+                "handshakes": self.handshakes,
+                "resumed": self.resumed,
+                "failed": self.failed,
+                "timed_out": self.timed_out,
+                "resumption_rate": (
+                    self.resumed / self.handshakes if self.handshakes else 0.0
+                ),
+            }
+
+        for name, quantile in (("p50_ms", 0.5), ("p99_ms", 0.99)):
+            stats[name] = (
+                durations[min(len(durations) - 1, int(quantile * len(durations)))]
+                * 1000
+                if durations
+                else 0.0
+            )
+        return stats
+
+
+def websocket_accept_key(key: str) -> str:
+    """
+    Compute the Sec-WebSocket-Accept value for a Sec-WebSocket-Key (RFC 6455 section 4.2.2).
+
+    Args:
+        key (str): The client's Sec-WebSocket-Key
+
+    Returns:
+        str: The matching Sec-WebSocket-Accept
+    """
+    return base64.b64encode(hashlib.sha1((key + WS_MAGIC).encode()).digest()).decode()
+
+
+def frame_header(first_byte: int, payload_len: int) -> bytearray:
+    """
+    Build an unmasked server frame header (RFC 6455 section 5.2).
+
+    Args:
+        first_byte (int): FIN bit and opcode
+        payload_len (int): Payload length in bytes
+
+    Returns:
+        bytearray: The frame header
+    """
+    header = bytearray([first_byte])
+    if payload_len <= 125:
+        header.append(payload_len)
+    elif payload_len <= 65535:
+        header.extend([126, (payload_len >> 8) & 0xFF, payload_len & 0xFF])
+    else:
+        header.extend([127] + [(payload_len >> (8 * (7 - i))) & 0xFF for i in range(8)])
+    return header
+
+
+def mask_payload(payload: bytes, key: bytes) -> bytearray:
+    """
+    Mask a client frame payload (RFC 6455 section 5.3).
+
+    Args:
+        payload (bytes): Frame payload
+        key (bytes): Four byte masking key
+
+    Returns:
+        bytearray: The masked payload
+    """
+    masked = bytearray(len(payload))
+    for i in range(min(4, len(payload))):
+        masked[i::4] = payload[i::4].translate(UNMASK_TABLES[key[i]])
+    return masked
+
+
+def text_frame(payload: bytes) -> bytes:
+    """
+    Build a complete text frame, to be sent with WebSocketInterface.send_prepared.
+
+    Args:
+        payload (bytes): UTF-8 message, e.g. from json_codec.encode
+
+    Returns:
+        bytes: Frame header and payload
+    """
+    return bytes(frame_header(0x81, len(payload)) + payload)
+
 
 class ServerState:
     """
@@ -17,38 +216,94 @@ class ServerState:
     def __init__(self):
         """
         Initialize server state with thread lock.
+
+        The lock records wait and hold times per call site when lock profiling
+        is enabled (see lock_profiler.enable).
         """
-        self.lock = threading.Lock()
+        self.lock = make_lock(type(self).__name__)
 
 
 class WebSocketInterface:
     """
     Manages WebSocket communication with clients according to RFC 6455.
 
-    Handles the WebSocket handshake, frame parsing, and message transmission.
+    Handles the WebSocket handshake, frame parsing, message transmission and
+    ping/pong control frames.
+
+    Socket Handling: Runs over a Transport: a SocketTransport for TCP and TLS
+    connections, or a PipeTransport for in-process clients, benchmarks and
+    load tests. Received bytes are read with recv_into directly into a
+    per-connection buffer that grows as needed, up to the maximum message
+    size. Frames are parsed in place through memoryviews and payloads are
+    unmasked into a second reusable buffer, so receiving a message only
+    allocates the decoded string.
     """
 
-    def __init__(self, conn: socket.socket):
+    def __init__(
+        self,
+        conn: Union[Transport, socket.socket],
+        max_message_size: int = 65536,
+    ):
         """
         Initialize WebSocket interface.
 
         Args:
-            conn (socket.socket): The TCP socket connection to wrap
+            conn (Union[Transport, socket.socket]): The transport to run over; a
+                socket is wrapped in a SocketTransport
+            max_message_size (int): Largest accepted frame payload in bytes; larger
+                frames close the connection
         """
+        if not isinstance(conn, Transport):
+            conn = SocketTransport(conn)
         self.conn = conn
+        self.path = "/"
+        # Route the connection's messages are dispatched to; handlers may change it
+        self.route: Optional[str] = None
+        # True for the client end of a connection, which masks the frames it sends
+        # and must receive unmasked ones
+        self.client = False
 
-    def handshake(self) -> bool:
+        self.send_lock = threading.Lock()
+        self.closed = False
+        self.last_received = time.monotonic()
+        self.last_pong: Optional[float] = None
+        # time.monotonic() when the server took the connection and when its
+        # handshakes completed, None for client-side connections
+        self.accepted: Optional[float] = None
+        self.established: Optional[float] = None
+
+        self.max_message_size = max_message_size
+        # Received bytes waiting to be parsed are self._buffer[self._start:self._end]
+        self._buffer = bytearray(INITIAL_RECEIVE_BUFFER)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._end = 0
+        self._unmasked = bytearray(INITIAL_RECEIVE_BUFFER)
+        self._unmasked_view = memoryview(self._unmasked)
+
+    def handshake(self, paths: Optional[Collection[str]] = None) -> bool:
         """
         Perform WebSocket handshake according to RFC 6455.
 
+        Args:
+            paths (Optional[Collection[str]]): Accepted request paths, any path if None
+
         Returns:
             bool: True if handshake successful, False otherwise
         """
         try:
-            data = self.conn.recv(4096).decode("utf-8")
-            if "Upgrade: websocket" not in data:
+            data = self._read_http_header()
+            if data is None or "Upgrade: websocket" not in data:
                 return False
 
+            # Request line: GET /path?query HTTP/1.1
+            request_line = data.split("\r\n", 1)[0].split(" ")
+            if len(request_line) >= 2:
+                self.path = request_line[1].split("?", 1)[0]
+            if paths is not None and self.path not in paths:
+                return False
+            self.route = self.path
+
             # Extract Sec-WebSocket-Key from headers
             key = next(
                 (
@@ -62,9 +317,7 @@ class WebSocketInterface:
                 return False
 
             # Generate accept key using RFC 6455 algorithm
-            accept_key = base64.b64encode(
-                hashlib.sha1((key + WS_MAGIC).encode()).digest()
-            ).decode()
+            accept_key = websocket_accept_key(key)
 
             # Send WebSocket handshake response
             response = (
@@ -75,79 +328,307 @@ class WebSocketInterface:
             )
             self.conn.sendall(response.encode())
             return True
-        except (ConnectionError, OSError, BrokenPipeError):
+        except (ConnectionError, OSError, BrokenPipeError, UnicodeDecodeError):
+            return False
+
+    def connect(self, path: str = "/", host: str = "localhost") -> bool:
+        """
+        Perform the client side of the WebSocket handshake, for in-process
+        clients such as load tests.
+
+        Afterwards, frames sent from this end are masked and frames received
+        must be unmasked, as RFC 6455 section 5.1 requires of clients.
+
+        Args:
+            path (str): Request path, selecting the route on a single-port server
+            host (str): Value of the Host header
+
+        Returns:
+            bool: True if the server accepted the upgrade, False otherwise
+        """
+        key = base64.b64encode(os.urandom(16)).decode()
+        request = (
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {host}\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n"
+        )
+        try:
+            self.conn.sendall(request.encode())
+            data = self._read_http_header()
+        except (ConnectionError, OSError, BrokenPipeError, UnicodeDecodeError):
             return False
+        if data is None or not data.startswith("HTTP/1.1 101"):
+            return False
+        self.path = self.route = path
+        self.client = True
+        return f"Sec-WebSocket-Accept: {websocket_accept_key(key)}" in data
+
+    def _read_http_header(self) -> Optional[str]:
+        """
+        Read an HTTP request or response header into the receive buffer.
+
+        Bytes after the header stay buffered; they already belong to the first frames.
+
+        Returns:
+            Optional[str]: The header without the blank line that ends it, or None if
+                the connection closed or the header exceeds MAX_HANDSHAKE_SIZE
+        """
+        header_end = -1
+        while header_end < 0:
+            if self._end == len(self._buffer):
+                if self._end >= MAX_HANDSHAKE_SIZE:
+                    return None
+                self._grow(MAX_HANDSHAKE_SIZE)
+            if not self._fill():
+                return None
+            header_end = self._buffer.find(b"\r\n\r\n", 0, self._end)
+
+        self._start = header_end + 4
+        return self._buffer[:header_end].decode("utf-8")
 
     def receive(self) -> Optional[str]:
         """
-        Receive and decode a WebSocket frame.
+        Receive and decode the next WebSocket text frame.
+
+        Control frames are handled here: pings are answered, pongs and all
+        other frames refresh the connection's liveness timestamps.
 
         Returns:
             Optional[str]: Decoded message string, or None if connection closed/error
         """
         try:
-            data = self.conn.recv(4096)
-            if len(data) < 2:
-                return None
+            while True:
+                frame = self._read_frame()
+                if frame is None:
+                    return None
 
-            # Parse WebSocket frame header
-            opcode = data[0] & 0x0F
-            if opcode == 0x08:
-                return None
+                opcode, payload = frame
+                self.last_received = time.monotonic()
+                if opcode == 0x08:
+                    return None
+                if opcode == 0x0A:
+                    self.last_pong = self.last_received
+                    continue
+                if opcode == 0x09:
+                    self._send_frame(0x8A, bytes(payload))
+                    continue
+                return str(payload, "utf-8")
+        except (ConnectionError, OSError, BrokenPipeError, UnicodeDecodeError):
+            return None
 
-            payload_len = data[1] & 0x7F
-            mask_start = 2
+    def _fill(self) -> bool:
+        """
+        Read from the socket into the free space at the end of the receive buffer.
 
-            # Handle extended payload lengths (RFC 6455 sections 5.2)
-            if payload_len == 126:
-                if len(data) < 4:
+        Returns:
+            bool: False if the peer closed the connection
+        """
+        received = self.conn.recv_into(self._view[self._end :])
+        self._end += received
+        return received > 0
+
+    def _grow(self, needed: int) -> None:
+        """
+        Make room for a frame of the given total size at the end of the buffer.
+
+        Unparsed bytes are moved to the front, and the buffer is replaced by one
+        at least twice as large if they still do not fit. Callers bound needed
+        by the maximum message size.
+
+        Args:
+            needed (int): Bytes the frame at the front of the buffer occupies
+        """
+        pending = self._end - self._start
+        if needed > len(self._buffer):
+            buffer = bytearray(max(needed, 2 * len(self._buffer)))
+            buffer[:pending] = self._view[self._start : self._end]
+            self._buffer = buffer
+            self._view = memoryview(buffer)
+        elif self._start:
+            self._view[:pending] = self._view[self._start : self._end]
+        self._start = 0
+        self._end = pending
+
+    def _read_frame(self) -> Optional[Tuple[int, memoryview]]:
+        """
+        Read bytes until a complete frame is buffered and return it.
+
+        Returns:
+            Optional[Tuple[int, memoryview]]: Opcode and unmasked payload, valid until
+                the next read, or None if closed, the frame is too large or it is
+                masked the wrong way
+        """
+        while True:
+            header = self._parse_header()
+            needed = 14
+            if header is not None:
+                header_len, payload_len = header
+                # Clients must mask every frame and servers none (RFC 6455
+                # section 5.1)
+                masked = bool(self._buffer[self._start + 1] & 0x80)
+                if masked == self.client:
+                    logger.warning(
+                        "Closing connection, received %s frame",
+                        "masked" if masked else "unmasked",
+                    )
+                    self._send_frame(0x88, CLOSE_PROTOCOL_ERROR.to_bytes(2, "big"))
                     return None
-                payload_len = int.from_bytes(data[2:4], "big")
-                mask_start = 4
-            elif payload_len == 127:
-                if len(data) < 10:
+
+                # Checked first, so an oversized frame that arrived in one read
+                # is rejected too
+                if payload_len > self.max_message_size:
+                    logger.warning(
+                        "Closing connection, %d byte frame exceeds the %d byte limit",
+                        payload_len,
+                        self.max_message_size,
+                    )
+                    self._send_frame(0x88, CLOSE_MESSAGE_TOO_BIG.to_bytes(2, "big"))
                     return None
-                payload_len = int.from_bytes(data[2:10], "big")
-                mask_start = 10
 
-            # Verify we have complete frame
-            if len(data) < mask_start + 4 + payload_len:
+                needed = header_len + payload_len
+                if needed <= self._end - self._start:
+                    return self._take_frame(header_len, payload_len)
+
+            # Make room for the rest of the frame, or for at least a full header
+            if self._start + needed > len(self._buffer):
+                self._grow(needed)
+            if not self._fill():
                 return None
 
-            # Extract masking key and payload
-            masks = data[mask_start : mask_start + 4]
-            payload = data[mask_start + 4 : mask_start + 4 + payload_len]
+    def _parse_header(self) -> Optional[Tuple[int, int]]:
+        """
+        Parse the header of the frame at the front of the receive buffer.
 
-            # Unmask payload according to RFC 6455 section 5.3
-            decoded = bytes([payload[i] ^ masks[i % 4] for i in range(len(payload))])
-            return decoded.decode("utf-8")
-        except (ConnectionError, OSError, BrokenPipeError):
+        Returns:
+            Optional[Tuple[int, int]]: Header length including the masking key and
+                payload length, or None if the header is incomplete
+        """
+        start = self._start
+        available = self._end - start
+        if available < 2:
             return None
 
-    def send(self, message: str) -> None:
+        data = self._buffer
+        payload_len = data[start + 1] & 0x7F
+        header_len = 2
+
+        # Handle extended payload lengths (RFC 6455 sections 5.2)
+        if payload_len == 126:
+            header_len = 4
+            if available < header_len:
+                return None
+            payload_len = int.from_bytes(data[start + 2 : start + 4], "big")
+        elif payload_len == 127:
+            header_len = 10
+            if available < header_len:
+                return None
+            payload_len = int.from_bytes(data[start + 2 : start + 10], "big")
+
+        if data[start + 1] & 0x80:
+            header_len += 4
+        return header_len, payload_len
+
+    def _take_frame(self, header_len: int, payload_len: int) -> Tuple[int, memoryview]:
+        """
+        Take a complete frame off the front of the receive buffer.
+
+        Args:
+            header_len (int): Header length including the masking key
+            payload_len (int): Payload length
+
+        Returns:
+            Tuple[int, memoryview]: Opcode and unmasked payload
+        """
+        data = self._buffer
+        start = self._start
+        opcode = data[start] & 0x0F
+        masked = data[start + 1] & 0x80
+        payload_start = start + header_len
+        frame_end = payload_start + payload_len
+
+        self._start = frame_end
+        if self._start == self._end:
+            self._start = self._end = 0
+
+        if not masked:
+            return opcode, self._view[payload_start:frame_end]
+
+        # Unmask payload according to RFC 6455 section 5.3 into the reusable
+        # output buffer; every fourth byte is XORed with the same mask byte, so
+        # each of the four lanes is translated with the table for its key byte.
+        # bytes.translate cannot write into a buffer, so each lane still makes
+        # two temporary copies of a quarter of the payload (the strided slice
+        # and its translation), which are freed before the next lane
+        if payload_len > len(self._unmasked):
+            self._unmasked = bytearray(max(payload_len, 2 * len(self._unmasked)))
+            self._unmasked_view = memoryview(self._unmasked)
+        unmasked = self._unmasked
+        mask_start = payload_start - 4
+        for i in range(min(4, payload_len)):
+            unmasked[i:payload_len:4] = data[
+                payload_start + i : frame_end : 4
+            ].translate(UNMASK_TABLES[data[mask_start + i]])
+        return opcode, self._unmasked_view[:payload_len]
+
+    def _send_frame(self, first_byte: int, payload: bytes) -> None:
         """
-        Encode and send a WebSocket frame.
+        Frame a payload and send it. Safe to call from any thread.
 
         Args:
-            message (str): The message to send to the client
+            first_byte (int): FIN bit and opcode
+            payload (bytes): Frame payload
         """
+        payload_len = len(payload)
+        header = frame_header(first_byte, payload_len)
+        if self.client:
+            key = os.urandom(4)
+            header[1] |= 0x80
+            header += key
+            payload = mask_payload(payload, key)
+
+        # Frames from different threads (broadcasts, pings) must not interleave
+        with self.send_lock:
+            self.conn.send_buffers([header, payload])
+
+    def send(self, message: Union[str, bytes]) -> None:
+        """
+        Send a message as a WebSocket text frame.
+
+        Args:
+            message (Union[str, bytes]): The message to send to the client, either a
+                string or UTF-8 bytes as returned by json_codec.encode
+        """
+        if isinstance(message, str):
+            message = message.encode("utf-8")
         try:
             # Text frame opcode (0x81 = FIN bit + text frame)
-            header = bytearray([0x81])
-            payload = message.encode("utf-8")
-            payload_len = len(payload)
-
-            # Add payload length according to RFC 6455 section 5.2
-            if payload_len <= 125:
-                header.append(payload_len)
-            elif payload_len <= 65535:
-                header.extend([126, (payload_len >> 8) & 0xFF, payload_len & 0xFF])
-            else:
-                header.extend(
-                    [127] + [(payload_len >> (8 * (7 - i))) & 0xFF for i in range(8)]
-                )
+            self._send_frame(0x81, message)
+        except (ConnectionError, OSError, BrokenPipeError):
+            pass
 
-            self.conn.sendall(header + payload)
+    def send_prepared(self, frame: bytes) -> None:
+        """
+        Send a complete frame built once with text_frame, for fan-out of the
+        same message to many connections.
+
+        Args:
+            frame (bytes): Frame header and payload
+        """
+        try:
+            with self.send_lock:
+                self.conn.sendall(frame)
+        except (ConnectionError, OSError, BrokenPipeError):
+            pass
+
+    def ping(self) -> None:
+        """
+        Send a ping control frame (RFC 6455 section 5.5.2).
+        """
+        try:
+            self._send_frame(0x89, b"")
         except (ConnectionError, OSError, BrokenPipeError):
             pass
 
@@ -155,14 +636,174 @@ class WebSocketInterface:
         """
         Close the WebSocket connection.
         """
+        self.closed = True
         try:
             # Send close frame according to RFC 6455 section 5.5.1
-            close_frame = bytearray([0x88, 0x00])
-            self.conn.sendall(close_frame)
+            self._send_frame(0x88, b"")
             self.conn.close()
         except (ConnectionError, OSError, BrokenPipeError):
             pass
 
+    def abort(self) -> None:
+        """
+        Shut down a dead connection so the thread blocked receiving on it wakes up.
+        """
+        self.closed = True
+        try:
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except (ConnectionError, OSError, BrokenPipeError):
+            pass
+
+
+class PingScheduler:
+    """
+    Sends WebSocket pings to idle connections and aborts connections that stop answering.
+
+    Connections are kept in a min-heap ordered by when they next need
+    attention, so each tick only touches connections that are due rather than
+    sweeping all of them. A connection that received anything within the
+    interval is not pinged; its check is simply pushed back.
+
+    Shared Object Handling: The heap is shared between connection threads
+    registering new connections and the scheduler thread, guarded by a
+    condition variable.
+    """
+
+    def __init__(self, interval: float, timeout: float):
+        """
+        Initialize the ping scheduler.
+
+        Args:
+            interval (float): Seconds of inbound silence before a connection is pinged
+            timeout (float): Seconds of inbound silence before a connection is considered dead
+        """
+        self.interval = interval
+        self.timeout = timeout
+        self.condition = threading.Condition()
+        self.pings_sent = 0
+        self.dead_connections = 0
+        self._heap: List[Tuple[float, int, WebSocketInterface]] = []
+        self._sequence = 0
+
+    def register(self, ws: WebSocketInterface) -> None:
+        """
+        Start monitoring a connection whose WebSocket handshake completed.
+
+        Args:
+            ws (WebSocketInterface): The connection
+        """
+        with self.condition:
+            self._sequence += 1
+            heapq.heappush(
+                self._heap,
+                (time.monotonic() + self.interval, self._sequence, ws),
+            )
+            # Deadlines only grow, so only an empty heap needs the thread woken
+            if len(self._heap) == 1:
+                self.condition.notify()
+
+    def run(self) -> None:
+        """
+        Scheduler loop: wait for the next due connection and ping or abort it.
+        """
+        while True:
+            due = []
+            with self.condition:
+                while not self._heap:
+                    self.condition.wait()
+                now = time.monotonic()
+                wait = self._heap[0][0] - now
+                if wait > 0:
+                    self.condition.wait(wait)
+                    continue
+                while self._heap and self._heap[0][0] <= now:
+                    due.append(heapq.heappop(self._heap)[2])
+
+            reschedule = []
+            for ws in due:
+                if ws.closed:
+                    continue
+                silence = now - ws.last_received
+                if silence >= self.timeout:
+                    logger.info("Connection silent for %.0fs, closing", silence)
+                    self.dead_connections += 1
+                    ws.abort()
+                elif silence < self.interval:
+                    reschedule.append((ws.last_received + self.interval, ws))
+                else:
+                    ws.ping()
+                    self.pings_sent += 1
+                    reschedule.append(
+                        (now + min(self.interval, self.timeout - silence), ws)
+                    )
+
+            with self.condition:
+                for deadline, ws in reschedule:
+                    self._sequence += 1
+                    heapq.heappush(self._heap, (deadline, self._sequence, ws))
+
+
+class WorkerPool:
+    """
+    Bounded pool of reusable daemon worker threads.
+
+    Threads are created lazily up to max_workers and reused once their task
+    finishes, so connection bursts do not pay for thread creation every time.
+    Callers must not submit more concurrent tasks than max_workers (TCPServer
+    guarantees this through admission control), so a task never waits for a
+    worker.
+    """
+
+    def __init__(self, max_workers: int, name: str = "worker"):
+        """
+        Initialize the worker pool.
+
+        Args:
+            max_workers (int): Maximum number of worker threads
+            name (str): Prefix for worker thread names
+        """
+        self.max_workers = max_workers
+        self.name = name
+        self.lock = threading.Lock()
+        self.num_workers = 0
+        self._idle = 0
+        self._tasks: queue.SimpleQueue = queue.SimpleQueue()
+
+    def submit(self, fn: Callable, *args) -> None:
+        """
+        Run a task on an idle worker, starting a new worker if none is idle.
+
+        Args:
+            fn (Callable): Task to run
+            *args: Arguments passed to the task
+        """
+        with self.lock:
+            if self._idle:
+                # Reserve the idle worker so concurrent submits cannot both count it
+                self._idle -= 1
+            elif self.num_workers < self.max_workers:
+                self.num_workers += 1
+                thread = threading.Thread(
+                    target=self._work,
+                    name=f"{self.name}-{self.num_workers}",
+                    daemon=True,
+                )
+                thread.start()
+        self._tasks.put((fn, args))
+
+    def _work(self) -> None:
+        """
+        Worker loop: run tasks until the process exits.
+        """
+        while True:
+            fn, args = self._tasks.get()
+            try:
+                fn(*args)
+            except Exception:
+                logger.exception("Unhandled error in %s worker", self.name)
+            with self.lock:
+                self._idle += 1
+
 
 class TCPServer:
     """
@@ -183,8 +824,24 @@ class TCPServer:
         port: int,
         request_handler: Callable,
         server_state: ServerState,
-        certfile: str,
-        keyfile: str,
+        certfile: Optional[str] = None,
+        keyfile: Optional[str] = None,
+        ssl_context: Optional[ssl.SSLContext] = None,
+        handshake_timeout: float = 10.0,
+        accept_timeout: float = 1.0,
+        max_connections: int = 10000,
+        max_connections_per_ip: int = 64,
+        idle_timeout: Optional[float] = None,
+        backlog: int = 128,
+        routes: Optional[
+            Dict[str, Tuple[Callable, ServerState, Optional[Callable]]]
+        ] = None,
+        disconnect_handler: Optional[Callable] = None,
+        ping_interval: Optional[float] = None,
+        ping_timeout: Optional[float] = None,
+        max_message_size: int = 65536,
+        tls: bool = True,
+        proxy_protocol: bool = False,
     ):
         """
         Initialize TCP server.
@@ -194,14 +851,68 @@ class TCPServer:
             port (int): Port number to listen on
             request_handler (Callable): Function to handle client requests
             server_state (ServerState): Shared server state object
+            certfile (Optional[str]): Path to SSL certificate file, if no ssl_context is given
+            keyfile (Optional[str]): Path to SSL key file, if no ssl_context is given
+            ssl_context (Optional[ssl.SSLContext]): Context to share with other servers
+            handshake_timeout (float): Deadline in seconds for the TLS and WebSocket handshakes
+            accept_timeout (float): Seconds the accept loop blocks before checking for stop
+            max_connections (int): Maximum concurrent connections, also the worker thread cap
+            max_connections_per_ip (int): Maximum concurrent connections from one IP
+            idle_timeout (Optional[float]): Seconds without inbound data before a connection is closed
+            backlog (int): Listen backlog of the server socket
+            routes (Optional[Dict[str, Tuple[Callable, ServerState, Optional[Callable]]]]):
+                Request handler, server state and disconnect handler per WebSocket path,
+                replacing request_handler, server_state and disconnect_handler
+            disconnect_handler (Optional[Callable]): Called with (ws, addr, server_state)
+                when a WebSocket connection ends for any reason
+            ping_interval (Optional[float]): Seconds of client silence before the server
+                sends a WebSocket ping; pings are disabled if None
+            ping_timeout (Optional[float]): Seconds of client silence before the connection
+                is closed as dead, three ping intervals if None
+            max_message_size (int): Largest WebSocket message accepted from a client, in bytes
+            tls (bool): Encrypt connections; disable when TLS is terminated by a proxy
+            proxy_protocol (bool): Expect a PROXY protocol v1 or v2 header on every
+                connection and use the client address it carries
         """
         self.host = host
         self.port = port
         self.request_handler = request_handler
         self.server_state = server_state
-        self.ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        self.routes = routes
+        self.disconnect_handler = disconnect_handler
+        self.handshake_timeout = handshake_timeout
+        self.accept_timeout = accept_timeout
+        self.max_connections = max_connections
+        self.max_connections_per_ip = max_connections_per_ip
+        self.idle_timeout = idle_timeout
+        self.max_message_size = max_message_size
+        self.proxy_protocol = proxy_protocol
+        self.backlog = backlog
+        self.handshake_metrics = HandshakeMetrics()
+        self._running = False
+        # Listening socket, bound by start() unless one was inherited or a
+        # PipeListener was assigned beforehand
+        self.listener: Optional[Union[socket.socket, PipeListener]] = None
+        self._detached = False
+        self._stopped = threading.Event()
+        self._ping_started = False
+
+        self.ping_scheduler: Optional[PingScheduler] = None
+        if ping_interval:
+            self.ping_scheduler = PingScheduler(
+                ping_interval, ping_timeout or 3 * ping_interval
+            )
+
+        self.workers = WorkerPool(max_connections, name=f"conn-{port}")
+        self.connections_lock = threading.Lock()
+        self.active_connections = 0
+        self.connections_per_ip: Dict[str, int] = {}
+        self.rejected_server_limit = 0
+        self.rejected_ip_limit = 0
 
-        self.ssl_context.load_cert_chain(certfile=certfile, keyfile=keyfile)
+        if tls and ssl_context is None:
+            ssl_context = create_ssl_context(certfile, keyfile)
+        self.ssl_context = ssl_context if tls else None
 
     def _handle_connection(
         self,
@@ -214,26 +925,56 @@ class TCPServer:
 
         This method runs in a separate thread for each client connection and:
         1. Wraps the TCP socket in a WebSocketInterface
-        2. Performs WebSocket handshake
+        2. Performs WebSocket handshake, rejecting paths without a route
         3. Continuously receives and processes messages from the client
-        4. Passes messages to the request handler with shared state
+        4. Passes messages to the request handler with shared state, or to the
+           handler of the connection's current route when routes are configured
+        5. Notifies the disconnect handler when the connection ends
 
         Args:
             conn (socket.socket): Client connection socket
             addr (Tuple[str, int]): Client address tuple (host, port)
             server_state (Optional[ServerState]): Server state for request handler
         """
+        ip = addr[0]
+        accepted = time.monotonic()
         try:
             with conn:
-                conn = self.ssl_context.wrap_socket(conn, server_side=True)
-                ws = WebSocketInterface(conn)
-                if ws.handshake():
+                deadline = accepted + self.handshake_timeout
+                if self.proxy_protocol:
+                    addr = self._proxy_handshake(conn, addr)
+                    if addr is None:
+                        return
+                    ip = addr[0]
+
+                if self.ssl_context is not None:
+                    conn = self._tls_handshake(conn)
+                    if conn is None:
+                        return
+
+                # The WebSocket handshake gets whatever is left of the deadline
+                conn.settimeout(max(deadline - time.monotonic(), 0.001))
+                ws = WebSocketInterface(conn, self.max_message_size)
+                ws.accepted = accepted
+                handshake_ok = ws.handshake(self.routes)
+                conn.settimeout(self.idle_timeout)
+                if handshake_ok:
+                    ws.established = time.monotonic()
                     # WebSocket connection established, handle messages
-                    while True:
-                        message = ws.receive()
-                        if not message:
-                            break
-                        self.request_handler(ws, addr, message, server_state)
+                    request_handler = self.request_handler
+                    if self.ping_scheduler is not None:
+                        self.ping_scheduler.register(ws)
+                    try:
+                        while True:
+                            message = ws.receive()
+                            if not message:
+                                break
+                            if self.routes is not None:
+                                request_handler, server_state, _ = self.routes[ws.route]
+                            request_handler(ws, addr, message, server_state)
+                    finally:
+                        ws.closed = True
+                        self._notify_disconnect(ws, addr, server_state)
                 else:
                     # WebSocket handshake failed
                     error_response = (
@@ -248,6 +989,226 @@ class TCPServer:
                     ws.close()
         except (ConnectionError, OSError, BrokenPipeError):
             pass
+        finally:
+            self._release(ip)
+
+    def _notify_disconnect(
+        self,
+        ws: WebSocketInterface,
+        addr: Tuple[str, int],
+        server_state: Optional[ServerState],
+    ) -> None:
+        """
+        Tell the disconnect handler of the connection's current route that it ended.
+
+        Args:
+            ws (WebSocketInterface): The connection that ended
+            addr (Tuple[str, int]): Client address tuple (host, port)
+            server_state (Optional[ServerState]): Server state of the connection
+        """
+        disconnect_handler = self.disconnect_handler
+        if self.routes is not None:
+            _, server_state, disconnect_handler = self.routes[ws.route]
+        if disconnect_handler is None:
+            return
+
+        try:
+            disconnect_handler(ws, addr, server_state)
+        except Exception:
+            logger.exception("Disconnect handler failed for %s", addr)
+
+    def _admit(self, ip: str) -> Optional[str]:
+        """
+        Reserve a connection slot for a client, unless a limit is reached.
+
+        Behind a PROXY protocol proxy every connection comes from the proxy, so
+        the per-IP limit is only applied once the client address is known.
+
+        Args:
+            ip (str): Client IP address
+
+        Returns:
+            Optional[str]: Rejection reason, or None if the connection was admitted
+        """
+        with self.connections_lock:
+            if self.active_connections >= self.max_connections:
+                self.rejected_server_limit += 1
+                return "server at capacity"
+            ip_connections = self.connections_per_ip.get(ip, 0)
+            if (
+                not self.proxy_protocol
+                and ip_connections >= self.max_connections_per_ip
+            ):
+                self.rejected_ip_limit += 1
+                return "too many connections from this address"
+
+            self.active_connections += 1
+            self.connections_per_ip[ip] = ip_connections + 1
+            return None
+
+    def _proxy_handshake(
+        self, conn: socket.socket, addr: Tuple[str, int]
+    ) -> Optional[Tuple[str, int]]:
+        """
+        Read the PROXY header and move the connection's slot to the real client IP.
+
+        Args:
+            conn (socket.socket): Accepted connection from the proxy
+            addr (Tuple[str, int]): Address of the proxy
+
+        Returns:
+            Optional[Tuple[str, int]]: Client address, the proxy's address if the header
+                carries none, or None if the header is invalid or the client is over
+                the per-IP limit
+        """
+        conn.settimeout(self.handshake_timeout)
+        try:
+            client_addr = read_proxy_header(conn) or addr
+        except socket.timeout:
+            self.handshake_metrics.record_failure(timed_out=True)
+            return None
+        except (ValueError, ConnectionError, OSError) as e:
+            logger.warning("Invalid PROXY header from %s: %s", addr[0], e)
+            self.handshake_metrics.record_failure(timed_out=False)
+            return None
+
+        with self.connections_lock:
+            ip_connections = self.connections_per_ip.get(client_addr[0], 0)
+            if client_addr[0] != addr[0]:
+                if ip_connections >= self.max_connections_per_ip:
+                    self.rejected_ip_limit += 1
+                    logger.warning(
+                        "Rejected connection from %s: too many connections from "
+                        "this address",
+                        client_addr[0],
+                    )
+                    return None
+                self.connections_per_ip[client_addr[0]] = ip_connections + 1
+                remaining = self.connections_per_ip[addr[0]] - 1
+                if remaining:
+                    self.connections_per_ip[addr[0]] = remaining
+                else:
+                    del self.connections_per_ip[addr[0]]
+        return client_addr
+
+    def _release(self, ip: str) -> None:
+        """
+        Free the connection slot reserved by _admit.
+
+        Args:
+            ip (str): Client IP address
+        """
+        with self.connections_lock:
+            self.active_connections -= 1
+            remaining = self.connections_per_ip[ip] - 1
+            if remaining:
+                self.connections_per_ip[ip] = remaining
+            else:
+                del self.connections_per_ip[ip]
+
+    def _reject(self, conn: socket.socket, reason: str) -> None:
+        """
+        Refuse a connection from the accept loop without a TLS handshake.
+
+        The plaintext 503 is read as such by plain HTTP clients and health
+        checks; TLS clients see their handshake fail at once instead of
+        waiting. Either way the server spends no handshake CPU on it.
+
+        Args:
+            conn (socket.socket): Accepted client connection
+            reason (str): Reason included in the response body
+        """
+        body = f"Service unavailable: {reason}"
+        response = (
+            "HTTP/1.1 503 Service Unavailable\r\n"
+            "Connection: close\r\n"
+            "Retry-After: 1\r\n"
+            "Content-Type: text/plain\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "\r\n"
+            f"{body}"
+        )
+        try:
+            conn.setblocking(False)
+            conn.send(response.encode())
+        except (ConnectionError, OSError, BrokenPipeError):
+            pass
+        finally:
+            conn.close()
+
+    def _tls_handshake(self, conn: socket.socket) -> Optional[ssl.SSLSocket]:
+        """
+        Perform the TLS handshake under the handshake timeout and record metrics.
+
+        The timeout stays set on the returned socket so the WebSocket handshake
+        that follows is bounded by it too; the caller clears it afterwards.
+
+        Args:
+            conn (socket.socket): Accepted client connection
+
+        Returns:
+            Optional[ssl.SSLSocket]: The TLS socket, or None if the handshake failed
+        """
+        conn.settimeout(self.handshake_timeout)
+        started = time.perf_counter()
+        try:
+            tls_conn = self.ssl_context.wrap_socket(
+                conn, server_side=True, do_handshake_on_connect=False
+            )
+            tls_conn.do_handshake()
+        except socket.timeout:
+            self.handshake_metrics.record_failure(timed_out=True)
+            return None
+        except (ssl.SSLError, ConnectionError, OSError):
+            self.handshake_metrics.record_failure(timed_out=False)
+            return None
+
+        self.handshake_metrics.record(
+            time.perf_counter() - started, tls_conn.session_reused
+        )
+        return tls_conn
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Get TLS handshake, session cache and connection statistics for this server.
+
+        Returns:
+            Dict[str, float]: Handshake metrics, session cache hits and connection counts
+        """
+        stats = self.handshake_metrics.snapshot()
+        stats["session_cache_hits"] = (
+            self.ssl_context.session_stats()["hits"] if self.ssl_context else 0
+        )
+        with self.connections_lock:
+            stats["active_connections"] = self.active_connections
+            stats["client_ips"] = len(self.connections_per_ip)
+            stats["rejected_server_limit"] = self.rejected_server_limit
+            stats["rejected_ip_limit"] = self.rejected_ip_limit
+        stats["worker_threads"] = self.workers.num_workers
+        if self.ping_scheduler is not None:
+            stats["pings_sent"] = self.ping_scheduler.pings_sent
+            stats["dead_connections"] = self.ping_scheduler.dead_connections
+        return stats
+
+    def stop(self) -> None:
+        """
+        Stop accepting connections. The accept loop exits within accept_timeout.
+        """
+        self._running = False
+
+    def detach(self) -> socket.socket:
+        """
+        Stop accepting connections but keep the listening socket open, e.g. while
+        another process takes it over. Connections made in the meantime wait in
+        the listen backlog. Calling start() again resumes accepting.
+
+        Returns:
+            socket.socket: The listening socket, now owned by the caller
+        """
+        self._detached = True
+        self._running = False
+        self._stopped.wait()
+        return self.listener
 
     def start(self) -> None:
         """
@@ -257,22 +1218,56 @@ class TCPServer:
         1. Creates a TCP socket and binds it to the specified host/port
         2. Sets socket options for address reuse
         3. Listens for incoming connections
-        4. Accepts connections and spawns threads to handle each client
-        5. Continues listening until interrupted
+        4. Accepts connections, rejecting them when over a connection limit
+        5. Hands admitted connections to the bounded worker pool
+        6. Continues listening until stopped
+
+        A listening socket assigned to self.listener beforehand, e.g. one
+        inherited from the previous server process, is used instead of binding.
+        So is a PipeListener, which serves in-process clients over
+        PipeTransports without opening a port.
         """
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        sock.bind((self.host, self.port))
-        sock.listen(128)
+        sock = self.listener
+        if sock is None:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((self.host, self.port))
+            sock.listen(self.backlog)
+            self.listener = sock
+        sock.settimeout(self.accept_timeout)
+        self._detached = False
+        self._stopped.clear()
+        self._running = True
+
+        if self.ping_scheduler is not None and not self._ping_started:
+            self._ping_started = True
+            ping_thread = threading.Thread(
+                target=self.ping_scheduler.run, name=f"ping-{self.port}", daemon=True
+            )
+            ping_thread.start()
 
         try:
-            while True:
-                conn, addr = sock.accept()
-                thread = threading.Thread(
-                    target=self._handle_connection,
-                    args=(conn, addr, self.server_state),
+            while self._running:
+                try:
+                    conn, addr = sock.accept()
+                except socket.timeout:
+                    continue
+                # Accepted sockets inherit the listener timeout; handshakes set their own
+                conn.settimeout(None)
+
+                rejection = self._admit(addr[0])
+                if rejection:
+                    logger.warning(
+                        "Rejected connection from %s: %s", addr[0], rejection
+                    )
+                    self._reject(conn, rejection)
+                    continue
+
+                self.workers.submit(
+                    self._handle_connection, conn, addr, self.server_state
                 )
-                thread.daemon = True
-                thread.start()
         finally:
-            sock.close()
+            if not self._detached:
+                sock.close()
+                self.listener = None
+            self._stopped.set()
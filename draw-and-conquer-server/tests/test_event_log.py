@@ -0,0 +1,162 @@
+"""
+Recovery of game sessions from the event log after a crash.
+
+Run from the draw-and-conquer-server directory:
+
+    python -m pytest tests
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from event_log import RECORD_HEADER, SEGMENT_PREFIX, EventLog
+from game_server import GameServerState, SessionLifecycle
+from replay import FakeSocket
+from server import WebSocketInterface
+
+PLAYERS = ["a", "b", "c"]
+
+
+class EventLogRecoveryTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="event-log-test-")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def play(self, claims):
+        """
+        Play a game with a live event log, then stop as a crash would.
+
+        The log is never closed, so nothing is compacted into a snapshot and
+        every transition stays in the last segment.
+
+        Returns:
+            Tuple: Final board, colours and the path of the written segment
+        """
+        # No snapshot while the game is played
+        log = EventLog(self.directory, snapshot_interval=3600)
+        log.recover()
+        log.start()
+        state = GameServerState(log)
+        state.create_game_session(
+            "game", list(PLAYERS), {p: p.upper() for p in PLAYERS}, 30, 60
+        )
+        session = state.get_game_session("game")
+        for player_id in PLAYERS:
+            session.assign_colour(player_id)
+        for tile_index, player_id in claims:
+            self.assertTrue(session.lock_tile(tile_index, player_id))
+            self.assertTrue(session.unlock_tile(tile_index, player_id, claim=True))
+        # A lock that is still held when the process stops
+        self.assertTrue(session.lock_tile(29, "a"))
+
+        # 1 create, 3 colours, 2 per claim and the final lock
+        expected = 4 + 2 * len(claims) + 1
+        path = self.segment_path()
+        deadline = time.monotonic() + 5
+        while len(self.record_offsets(path)) < expected:
+            self.assertLess(time.monotonic(), deadline, "events were not committed")
+            time.sleep(0.01)
+        return dict(session.tile_owners), dict(session.player_colours), path
+
+    def segment_path(self):
+        segments = sorted(
+            name
+            for name in os.listdir(self.directory)
+            if name.startswith(SEGMENT_PREFIX)
+        )
+        return os.path.join(self.directory, segments[-1])
+
+    def record_offsets(self, path):
+        """
+        Offsets of the complete records in a segment.
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+        offsets = []
+        offset = 0
+        while offset + RECORD_HEADER.size <= len(data):
+            length, _ = RECORD_HEADER.unpack_from(data, offset)
+            if offset + RECORD_HEADER.size + length > len(data):
+                break
+            offsets.append(offset)
+            offset += RECORD_HEADER.size + length
+        return offsets
+
+    def recover(self):
+        state = GameServerState(lifecycle=SessionLifecycle())
+        state.restore_game_sessions(EventLog(self.directory).recover())
+        return state
+
+    def test_recovers_board(self):
+        claims = [(0, "a"), (1, "b"), (2, "c"), (3, "a")]
+        board, colours, _ = self.play(claims)
+
+        session = self.recover().get_game_session("game")
+        self.assertEqual(session.tile_owners, board)
+        self.assertEqual(session.player_colours, colours)
+        self.assertTrue(session.game_started)
+        # Locks die with the process
+        self.assertEqual(session.tile_locks, {})
+
+    def test_torn_tail_is_dropped(self):
+        claims = [(0, "a"), (1, "b"), (2, "c"), (3, "a")]
+        board, _, path = self.play(claims)
+
+        # Cut the last claim in half: its lock record is kept, the claim is lost
+        offsets = self.record_offsets(path)
+        claim_offset = offsets[-2]
+        with open(path, "r+b") as f:
+            f.truncate(claim_offset + RECORD_HEADER.size + 3)
+
+        session = self.recover().get_game_session("game")
+        del board[3]
+        self.assertEqual(session.tile_owners, board)
+
+    def test_corrupt_record_ends_replay(self):
+        claims = [(0, "a"), (1, "b"), (2, "c"), (3, "a")]
+        board, _, path = self.play(claims)
+
+        # Flip a payload byte of the third claim, so its CRC no longer matches
+        offsets = self.record_offsets(path)
+        claim_offset = offsets[4 + 2 * 2 + 1]
+        with open(path, "r+b") as f:
+            f.seek(claim_offset + RECORD_HEADER.size + 1)
+            byte = f.read(1)
+            f.seek(-1, os.SEEK_CUR)
+            f.write(bytes([byte[0] ^ 0xFF]))
+
+        # Replay stops at the corrupt record, so the claims after it are lost too
+        session = self.recover().get_game_session("game")
+        self.assertEqual(session.tile_owners, {0: "a", 1: "b"})
+
+    def test_restored_session_expires_without_reconnect(self):
+        self.play([(0, "a")])
+        records = EventLog(self.directory).recover()
+
+        state = GameServerState(lifecycle=SessionLifecycle())
+        state.restore_game_sessions(records, reconnect_window=0)
+        evicted = state.evict_expired_sessions()
+        self.assertEqual(
+            [session.game_session_uuid for session, _ in evicted], ["game"]
+        )
+        self.assertIsNone(state.get_game_session("game"))
+
+    def test_reconnect_keeps_restored_session(self):
+        self.play([(0, "a")])
+        records = EventLog(self.directory).recover()
+
+        state = GameServerState(lifecycle=SessionLifecycle())
+        state.restore_game_sessions(records, reconnect_window=0)
+        session = state.get_game_session("game")
+        state.register_player_websocket(session, "b", WebSocketInterface(FakeSocket()))
+        self.assertEqual(state.evict_expired_sessions(), [])
+        self.assertIs(state.get_game_session("game"), session)
+
+
+if __name__ == "__main__":
+    unittest.main()
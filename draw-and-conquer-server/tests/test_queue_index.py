@@ -0,0 +1,97 @@
+"""
+Randomized check of QueueIndex against a plain ordered model of the queue.
+
+Run from the draw-and-conquer-server directory:
+
+    python -m pytest tests
+"""
+
+import random
+import unittest
+from collections import OrderedDict
+
+from queue_index import QueueIndex
+
+
+class QueueModel:
+    """
+    The queue QueueIndex stands for: members and reservations in line order.
+    """
+
+    def __init__(self):
+        # Key -> True if queued, False if only reserved
+        self.line: "OrderedDict[str, bool]" = OrderedDict()
+
+    def add(self, key: str, front: bool = False) -> None:
+        if self.line.get(key):
+            return
+        if front:
+            self.line.pop(key, None)
+            self.line[key] = True
+            self.line.move_to_end(key, last=False)
+        else:
+            # A reservation keeps its place in line, others join at the back
+            self.line[key] = True
+
+    def reserve(self, key: str) -> None:
+        if key not in self.line:
+            self.line[key] = False
+
+    def release(self, key: str) -> None:
+        if self.line.get(key) is False:
+            del self.line[key]
+
+    def remove(self, key: str) -> None:
+        if self.line.get(key):
+            del self.line[key]
+
+    def position(self, key: str):
+        queued = [member for member, live in self.line.items() if live]
+        if key not in queued:
+            return None
+        return queued.index(key) + 1
+
+
+class QueueIndexTest(unittest.TestCase):
+    def check(self, seed: int, operations: int, keys: int) -> None:
+        rng = random.Random(seed)
+        # A small tree renumbers after a few additions at either end
+        index = QueueIndex(capacity=8)
+        model = QueueModel()
+        names = [f"player-{n}" for n in range(keys)]
+        actions = ("add", "add", "front", "remove", "remove", "reserve", "release")
+
+        for step in range(operations):
+            action = rng.choice(actions)
+            key = rng.choice(names)
+            if action == "front":
+                index.add(key, front=True)
+                model.add(key, front=True)
+            else:
+                getattr(index, action)(key)
+                getattr(model, action)(key)
+
+            self.assertEqual(
+                len(index),
+                sum(model.line.values()),
+                f"seed {seed}, step {step}: {action} {key}",
+            )
+            for name in names:
+                self.assertEqual(
+                    index.position(name),
+                    model.position(name),
+                    f"seed {seed}, step {step}: {action} {key}, position of {name}",
+                )
+
+    def test_matches_model(self):
+        for seed in range(20):
+            self.check(seed, operations=500, keys=12)
+
+    def test_matches_model_across_renumbering(self):
+        # Enough additions at the back to run out of a 1024 slot tree
+        for seed in range(3):
+            self.check(seed, operations=6000, keys=40)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,416 @@
+import argparse
+import json
+import logging
+import math
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Points in a player's way from the queue into a game, in the order they happen
+MARKS = (
+    "enqueue",
+    "lobby_formed",
+    "game_start",
+    "connect",
+    "handshake",
+    "colour_request",
+    "current_players",
+    "first_pen",
+)
+
+# Span ending at each mark, measured from the latest earlier mark
+SPANS = {
+    "lobby_formed": "queue",
+    "game_start": "game_start",
+    "connect": "reconnect",
+    "handshake": "handshake",
+    "colour_request": "colour_request",
+    "current_players": "colour_selection",
+    "first_pen": "first_pen",
+}
+
+# Span covering the whole way from enqueue to the first pen event
+TOTAL_SPAN = "match_start"
+
+
+class MatchTracer:
+    """
+    Traces each player's way from the matchmaking queue to their first pen event
+    and exports the time spent in each phase as spans to a rotating JSONL file.
+
+    Request threads only enqueue timestamped marks. A background writer thread
+    collects each player's marks, keyed by player ID and game session UUID,
+    and once the player's first pen event arrives writes one line per phase:
+
+    - queue: enqueue until a QueueWatchdog tick puts the player in a lobby
+    - game_start: lobby formed until game_start was sent
+    - reconnect: game_start sent until the game server accepted the connection
+    - handshake: TLS and WebSocket handshakes on the game server
+    - colour_request: handshake done until pen_colour_request arrived
+    - colour_selection: pen_colour_request until current_players was broadcast
+    - first_pen: current_players until the player's first pen down
+    - match_start: the whole way, enqueue until first pen down
+
+    Marks that are missing or earlier than the one before, like the connect
+    and handshake of a connection carried over from the matchmaker, are left
+    out and the next span starts at the latest earlier mark. Traces that do
+    not reach the first pen event within trace_ttl seconds are dropped.
+
+    Shared Object Handling: The mark queue and the set of players awaiting
+    their first pen event are shared with request threads. Everything else is
+    owned by the writer thread.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 10 * 1024 * 1024,
+        backups: int = 3,
+        trace_ttl: float = 900.0,
+    ):
+        """
+        Initialize the tracer.
+
+        Args:
+            path (str): JSONL file spans are appended to
+            max_bytes (int): Size at which the file is rotated to path.1
+            backups (int): Number of rotated files kept
+            trace_ttl (float): Seconds a trace may take before it is dropped
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.trace_ttl = trace_ttl
+        self.traces_written = 0
+        self.traces_dropped = 0
+
+        self._marks: (
+            "queue.SimpleQueue[Optional[Tuple[str, str, Optional[str], float]]]"
+        ) = queue.SimpleQueue()
+        # Players sent current_players whose first pen event is still to come,
+        # so later pen events cost a set lookup instead of a mark
+        self._awaiting_pen: Set[str] = set()
+        # Player ID -> (game session UUID, marks by name), owned by the writer
+        self._traces: Dict[str, Tuple[Optional[str], Dict[str, float]]] = {}
+        self._file = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        Start the background writer thread.
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, name="trace", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """
+        Write all queued marks and stop the writer thread.
+        """
+        if self._thread is None:
+            return
+        self._marks.put(None)
+        self._thread.join()
+        self._thread = None
+        self._file.close()
+
+    def mark(
+        self,
+        player_id: str,
+        name: str,
+        game_session_uuid: Optional[str] = None,
+        at: Optional[float] = None,
+    ) -> None:
+        """
+        Record that a player reached a point on the way into a game. Never blocks.
+
+        An enqueue mark starts a new trace for the player; other marks are
+        ignored for players without one, such as bots. Only the first mark of
+        each name counts.
+
+        Args:
+            player_id (str): Unique identifier for the player
+            name (str): One of MARKS
+            game_session_uuid (Optional[str]): Session the player was matched into
+            at (Optional[float]): time.monotonic() of the event, now if None
+        """
+        if at is None:
+            at = time.monotonic()
+        if name == "current_players":
+            self._awaiting_pen.add(player_id)
+        self._marks.put((player_id, name, game_session_uuid, at))
+
+    def mark_pen(self, player_id: str) -> None:
+        """
+        Record a pen event, which only marks the player's first one.
+
+        Args:
+            player_id (str): Unique identifier for the player
+        """
+        if player_id in self._awaiting_pen:
+            self._awaiting_pen.discard(player_id)
+            self.mark(player_id, "first_pen")
+
+    def _run(self) -> None:
+        """
+        Writer loop: apply marks, write finished traces, drop stale ones.
+        """
+        last_expiry = time.monotonic()
+        running = True
+        while running:
+            try:
+                item = self._marks.get(timeout=1.0)
+            except queue.Empty:
+                item = False
+
+            lines = []
+            while item:
+                line = self._apply(*item)
+                if line:
+                    lines.append(line)
+                try:
+                    item = self._marks.get_nowait()
+                except queue.Empty:
+                    break
+            if item is None:
+                running = False
+
+            if lines:
+                self._write("".join(lines))
+
+            now = time.monotonic()
+            if now - last_expiry >= 1.0:
+                self._expire(now)
+                last_expiry = now
+
+    def _apply(
+        self,
+        player_id: str,
+        name: str,
+        game_session_uuid: Optional[str],
+        at: float,
+    ) -> Optional[str]:
+        """
+        Add a mark to its player's trace.
+
+        Args:
+            player_id (str): Unique identifier for the player
+            name (str): Mark name
+            game_session_uuid (Optional[str]): Session the player was matched into
+            at (float): time.monotonic() of the mark
+
+        Returns:
+            Optional[str]: JSONL lines of the trace's spans once it is finished
+        """
+        if name == "enqueue":
+            self._traces[player_id] = (None, {name: at})
+            return None
+        trace = self._traces.get(player_id)
+        if trace is None:
+            if name == "current_players":
+                self._awaiting_pen.discard(player_id)
+            return None
+
+        session_uuid, marks = trace
+        if game_session_uuid is not None and session_uuid is None:
+            self._traces[player_id] = (game_session_uuid, marks)
+        marks.setdefault(name, at)
+        if name != "first_pen":
+            return None
+
+        del self._traces[player_id]
+        self.traces_written += 1
+        return self._spans(player_id, session_uuid or game_session_uuid, marks)
+
+    def _spans(
+        self, player_id: str, game_session_uuid: Optional[str], marks: Dict[str, float]
+    ) -> str:
+        """
+        Turn a finished trace into span lines.
+
+        Args:
+            player_id (str): Unique identifier for the player
+            game_session_uuid (Optional[str]): Session the player was matched into
+            marks (Dict[str, float]): time.monotonic() of each mark reached
+
+        Returns:
+            str: One JSONL line per span
+        """
+        # Wall clock time of a monotonic timestamp, for lining spans up with logs
+        offset = time.time() - time.monotonic()
+        lines = []
+
+        def span(name: str, start: float, end: float) -> None:
+            lines.append(
+                json.dumps(
+                    {
+                        "span": name,
+                        "player": player_id,
+                        "game_session_uuid": game_session_uuid,
+                        "start": round(start + offset, 6),
+                        "duration_ms": round((end - start) * 1000, 3),
+                    }
+                )
+                + "\n"
+            )
+
+        previous = marks["enqueue"]
+        for name in MARKS[1:]:
+            at = marks.get(name)
+            if at is None or at < previous:
+                continue
+            span(SPANS[name], previous, at)
+            previous = at
+        span(TOTAL_SPAN, marks["enqueue"], previous)
+        return "".join(lines)
+
+    def _expire(self, now: float) -> None:
+        """
+        Drop traces older than trace_ttl, e.g. of players who left the queue.
+
+        Args:
+            now (float): Current time.monotonic()
+        """
+        stale = [
+            player_id
+            for player_id, (_, marks) in self._traces.items()
+            if now - marks["enqueue"] > self.trace_ttl
+        ]
+        for player_id in stale:
+            del self._traces[player_id]
+            self._awaiting_pen.discard(player_id)
+        if stale:
+            self.traces_dropped += len(stale)
+            logger.debug("Dropped %d unfinished match traces", len(stale))
+
+    def _write(self, data: str) -> None:
+        """
+        Append span lines, rotating the file first if it would grow past max_bytes.
+
+        Args:
+            data (str): JSONL lines to append
+        """
+        try:
+            if self._file.tell() and self._file.tell() + len(data) > self.max_bytes:
+                self._rotate()
+            self._file.write(data)
+            self._file.flush()
+        except OSError as e:
+            logger.error("Writing match trace spans failed: %s", e)
+
+    def _rotate(self) -> None:
+        """
+        Shift path.1 .. path.N up by one, dropping the oldest, and start a new file.
+        """
+        self._file.close()
+        for index in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """
+    Get a percentile of sorted values by the nearest-rank method.
+
+    Args:
+        values (List[float]): Sorted values, at least one
+        fraction (float): Percentile as a fraction, e.g. 0.99
+
+    Returns:
+        float: The value at that rank
+    """
+    rank = max(1, math.ceil(len(values) * fraction))
+    return values[rank - 1]
+
+
+def read_spans(paths: List[str]) -> Dict[str, List[float]]:
+    """
+    Read span durations from trace files, skipping lines that do not parse.
+
+    Args:
+        paths (List[str]): Trace files, including rotated ones
+
+    Returns:
+        Dict[str, List[float]]: Sorted durations in milliseconds by span name
+    """
+    durations: Dict[str, List[float]] = {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    durations.setdefault(record["span"], []).append(
+                        float(record["duration_ms"])
+                    )
+                except (ValueError, KeyError, TypeError):
+                    continue
+    for values in durations.values():
+        values.sort()
+    return durations
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "trace_file",
+        type=str,
+        help="Trace file written with --trace-file; its rotated files are read too",
+    )
+    parser.add_argument(
+        "--percentiles",
+        type=float,
+        nargs="+",
+        default=[50, 90, 99],
+        help="Percentiles to report per phase",
+    )
+    return parser.parse_args()
+
+
+def main():
+    """
+    Summarize match trace spans: count, percentiles and maximum per phase.
+    """
+    args = parse_args()
+
+    directory = os.path.dirname(args.trace_file) or "."
+    prefix = os.path.basename(args.trace_file) + "."
+    paths = [args.trace_file] + [
+        os.path.join(directory, name)
+        for name in sorted(os.listdir(directory))
+        if name.startswith(prefix) and name[len(prefix) :].isdigit()
+    ]
+    durations = read_spans([path for path in paths if os.path.exists(path)])
+    if not durations:
+        raise SystemExit(f"No spans in {args.trace_file}")
+
+    header = f"{'phase':<17} {'count':>7}"
+    for p in args.percentiles:
+        header += f" {f'p{p:g} ms':>10}"
+    print(header + f" {'max ms':>10}")
+    for name in list(SPANS.values()) + [TOTAL_SPAN]:
+        values = durations.get(name)
+        if not values:
+            continue
+        row = f"{name:<17} {len(values):>7}"
+        for p in args.percentiles:
+            row += f" {percentile(values, p / 100):>10.1f}"
+        print(row + f" {values[-1]:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
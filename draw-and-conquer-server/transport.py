@@ -0,0 +1,338 @@
+import queue
+import socket
+import ssl
+import threading
+import time
+from typing import List, Optional, Tuple
+
+# Bytes a pipe end buffers before writers block, like a socket's receive buffer
+PIPE_CAPACITY = 256 * 1024
+
+
+class Transport:
+    """
+    Byte stream a WebSocketInterface runs over.
+
+    The methods are the subset of the socket API the server uses, so code
+    written against sockets works on any transport. Blocking calls honour the
+    timeout set with settimeout and raise socket.timeout when it passes.
+    Subclasses implement recv_into, sendall, shutdown and close.
+    """
+
+    def recv_into(self, buffer) -> int:
+        """
+        Read available bytes into a buffer, blocking until some arrive.
+
+        Args:
+            buffer: Writable buffer, e.g. a memoryview slice
+
+        Returns:
+            int: Bytes read, 0 once the peer has closed the stream
+        """
+        raise NotImplementedError
+
+    def recv(self, bufsize: int) -> bytes:
+        """
+        Read at most bufsize available bytes.
+
+        Args:
+            bufsize (int): Largest number of bytes to return
+
+        Returns:
+            bytes: The bytes read, empty once the peer has closed the stream
+        """
+        buffer = bytearray(bufsize)
+        received = self.recv_into(buffer)
+        return bytes(buffer[:received])
+
+    def sendall(self, data: bytes) -> None:
+        """
+        Write all of data.
+
+        Args:
+            data (bytes): Bytes to write
+        """
+        raise NotImplementedError
+
+    def send(self, data: bytes) -> int:
+        """
+        Write data.
+
+        Args:
+            data (bytes): Bytes to write
+
+        Returns:
+            int: Bytes written
+        """
+        self.sendall(data)
+        return len(data)
+
+    def send_buffers(self, buffers: List[bytes]) -> None:
+        """
+        Write several buffers as one contiguous stream, e.g. a frame header and payload.
+
+        Args:
+            buffers (List[bytes]): Buffers to write in order
+        """
+        self.sendall(b"".join(buffers))
+
+    def settimeout(self, timeout: Optional[float]) -> None:
+        """
+        Set the timeout of blocking calls.
+
+        Args:
+            timeout (Optional[float]): Seconds, 0 for non-blocking, None to block forever
+        """
+
+    def setblocking(self, flag: bool) -> None:
+        self.settimeout(None if flag else 0.0)
+
+    def shutdown(self, how: int) -> None:
+        """
+        Shut down one or both directions, waking a thread blocked receiving.
+
+        Args:
+            how (int): socket.SHUT_RD, socket.SHUT_WR or socket.SHUT_RDWR
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """
+        Close the stream; the peer reads end of stream.
+        """
+        raise NotImplementedError
+
+    def __enter__(self) -> "Transport":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class SocketTransport(Transport):
+    """
+    Transport over a connected TCP or TLS socket.
+
+    Socket Handling: The socket's own methods are bound onto the transport,
+    so receiving and sending cost no extra call. Plain sockets send several
+    buffers with one sendmsg; TLS sockets do not support sendmsg and join
+    them, which is also one record per frame.
+    """
+
+    def __init__(self, sock: socket.socket):
+        """
+        Initialize the transport.
+
+        Args:
+            sock (socket.socket): Connected socket, plain or ssl.SSLSocket
+        """
+        self.sock = sock
+        self.recv_into = sock.recv_into
+        self.recv = sock.recv
+        self.sendall = sock.sendall
+        self.send = sock.send
+        self.settimeout = sock.settimeout
+        self.setblocking = sock.setblocking
+        self.shutdown = sock.shutdown
+        self.close = sock.close
+        self._scatter = hasattr(sock, "sendmsg") and not isinstance(sock, ssl.SSLSocket)
+
+    def send_buffers(self, buffers: List[bytes]) -> None:
+        if not self._scatter:
+            self.sock.sendall(b"".join(buffers))
+            return
+
+        sent = self.sock.sendmsg(buffers)
+        # Finish whatever the kernel did not take, without copying the buffers
+        for buffer in buffers:
+            if sent >= len(buffer):
+                sent -= len(buffer)
+                continue
+            self.sock.sendall(memoryview(buffer)[sent:])
+            sent = 0
+
+
+class PipeTransport(Transport):
+    """
+    One end of an in-memory byte stream, created in connected pairs by pipe().
+
+    Behaves like a connected socket: reads block until the peer writes,
+    writes block while the peer has PIPE_CAPACITY bytes unread, and closing
+    one end makes the other read end of stream. No kernel, port or
+    certificate is involved, so handlers and servers can be run and
+    benchmarked in-process.
+
+    Shared Object Handling: Each end's unread bytes are guarded by that
+    end's condition variable, which writers on the peer end take too.
+    """
+
+    def __init__(self, capacity: int = PIPE_CAPACITY):
+        """
+        Initialize one end of a pipe; use pipe() to create a connected pair.
+
+        Args:
+            capacity (int): Unread bytes this end buffers before writers block
+        """
+        self.capacity = capacity
+        self.peer: Optional["PipeTransport"] = None
+        self.condition = threading.Condition()
+        self.timeout: Optional[float] = None
+        self._inbound = bytearray()
+        # No more bytes will arrive, because the peer closed or this end shut down
+        self._eof = False
+        self._closed = False
+
+    def _wait(self, condition: threading.Condition, ready) -> None:
+        """
+        Wait on a condition, held by the caller, until ready() is true.
+
+        Args:
+            condition (threading.Condition): Condition to wait on
+            ready: Predicate checked under the condition
+        """
+        if ready():
+            return
+        if self.timeout == 0:
+            raise BlockingIOError("Operation would block")
+        if self.timeout is None:
+            while not ready():
+                condition.wait()
+            return
+        deadline = time.monotonic() + self.timeout
+        while not ready():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise socket.timeout("timed out")
+            condition.wait(remaining)
+
+    def recv_into(self, buffer) -> int:
+        if self._closed:
+            raise OSError("Pipe is closed")
+        with self.condition:
+            self._wait(self.condition, lambda: self._inbound or self._eof)
+            received = min(len(buffer), len(self._inbound))
+            buffer[:received] = self._inbound[:received]
+            del self._inbound[:received]
+            self.condition.notify_all()
+        return received
+
+    def sendall(self, data: bytes) -> None:
+        if self._closed:
+            raise OSError("Pipe is closed")
+        peer = self.peer
+        view = memoryview(data)
+        with peer.condition:
+            while view:
+                self._wait(
+                    peer.condition,
+                    lambda: peer._eof or len(peer._inbound) < peer.capacity,
+                )
+                if peer._eof:
+                    raise BrokenPipeError("Pipe closed by peer")
+                chunk = view[: peer.capacity - len(peer._inbound)]
+                peer._inbound += chunk
+                view = view[len(chunk) :]
+                peer.condition.notify_all()
+
+    def settimeout(self, timeout: Optional[float]) -> None:
+        self.timeout = timeout
+
+    def shutdown(self, how: int) -> None:
+        if how in (socket.SHUT_RD, socket.SHUT_RDWR):
+            with self.condition:
+                self._eof = True
+                self.condition.notify_all()
+        if how in (socket.SHUT_WR, socket.SHUT_RDWR):
+            with self.peer.condition:
+                self.peer._eof = True
+                self.peer.condition.notify_all()
+
+    def close(self) -> None:
+        if not self._closed:
+            self.shutdown(socket.SHUT_RDWR)
+            self._closed = True
+
+
+def pipe(capacity: int = PIPE_CAPACITY) -> Tuple[PipeTransport, PipeTransport]:
+    """
+    Create a connected pair of in-memory transports.
+
+    Args:
+        capacity (int): Unread bytes each end buffers before writers block
+
+    Returns:
+        Tuple[PipeTransport, PipeTransport]: The two ends
+    """
+    first, second = PipeTransport(capacity), PipeTransport(capacity)
+    first.peer, second.peer = second, first
+    return first, second
+
+
+class PipeListener:
+    """
+    In-memory stand-in for a listening socket.
+
+    Assign one to TCPServer.listener before start() and the server accepts
+    the PipeTransport connections made with connect(), running its handlers
+    and admission control exactly as for TCP clients. TLS is not supported
+    over pipes, so the server must be created with tls=False.
+
+    Shared Object Handling: Pending connections wait in a thread-safe
+    queue until the accept loop takes them.
+    """
+
+    def __init__(self, host: str = "127.0.0.1"):
+        """
+        Initialize the listener.
+
+        Args:
+            host (str): Client address reported for connections made without one
+        """
+        self.host = host
+        self.timeout: Optional[float] = None
+        self.closed = False
+        self.lock = threading.Lock()
+        self._pending: queue.SimpleQueue = queue.SimpleQueue()
+        self._next_port = 1
+
+    def connect(
+        self, addr: Optional[Tuple[str, int]] = None, capacity: int = PIPE_CAPACITY
+    ) -> PipeTransport:
+        """
+        Open a connection to the server, as a client would.
+
+        Args:
+            addr (Optional[Tuple[str, int]]): Client address the server sees, the
+                listener's host and a new port if None
+            capacity (int): Unread bytes each end buffers before writers block
+
+        Returns:
+            PipeTransport: The client's end of the connection
+        """
+        if self.closed:
+            raise ConnectionRefusedError("Listener is closed")
+        if addr is None:
+            with self.lock:
+                addr = (self.host, self._next_port)
+                self._next_port += 1
+        client, server = pipe(capacity)
+        self._pending.put((server, addr))
+        return client
+
+    def accept(self) -> Tuple[PipeTransport, Tuple[str, int]]:
+        """
+        Wait for the next connection.
+
+        Returns:
+            Tuple[PipeTransport, Tuple[str, int]]: The server's end and the client address
+        """
+        try:
+            return self._pending.get(timeout=self.timeout)
+        except queue.Empty:
+            raise socket.timeout("timed out")
+
+    def settimeout(self, timeout: Optional[float]) -> None:
+        self.timeout = timeout
+
+    def close(self) -> None:
+        self.closed = True
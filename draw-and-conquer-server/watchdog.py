@@ -1,11 +1,19 @@
-import json
 import logging
 import time
 import uuid
-from typing import List
-
-from game_server import GameServerState, GameSession
+from typing import List, Optional
+
+import json_codec
+from bots import BotEngine
+from game_server import (
+    GAME_ROUTE,
+    PEN_UP_TIMEOUT,
+    PHASE_ENDED,
+    GameServerState,
+    GameSession,
+)
 from matchmaker import MatchmakerState
+from server import text_frame
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +38,9 @@ class QueueWatchdog:
         game_state: GameServerState,
         num_tiles: int,
         colour_selection_timeout: int,
+        carry_over_connections: bool = False,
+        bot_engine: Optional[BotEngine] = None,
+        bot_backfill_after: float = 0,
     ):
         """
         Initialize the queue watchdog.
@@ -39,11 +50,20 @@ class QueueWatchdog:
             game_state (GameServerState): The game server state for creating sessions
             num_tiles (int): Number of tiles for new game sessions
             colour_selection_timeout (int): Timeout for colour selection phase
+            carry_over_connections (bool): Move players' matchmaker WebSockets into
+                their game session instead of having them reconnect (single port only)
+            bot_engine (Optional[BotEngine]): Engine playing the bots that fill
+                lobbies, no lobbies are backfilled if None
+            bot_backfill_after (float): Seconds a player waits in a queue too short
+                for a lobby before the rest of the lobby is filled with bots
         """
         self.matchmaker_state = matchmaker_state
         self.game_state = game_state
         self.num_tiles = num_tiles
         self.colour_selection_timeout = colour_selection_timeout
+        self.carry_over_connections = carry_over_connections
+        self.bot_engine = bot_engine
+        self.bot_backfill_after = bot_backfill_after
 
     def run(self) -> None:
         """
@@ -58,9 +78,25 @@ class QueueWatchdog:
         """
         while True:
             time.sleep(1)
-            current_time = time.time()
+            try:
+                self.tick()
+            except Exception:
+                # Keep matchmaking; the next tick starts from the queue as it is
+                logger.exception("Queue watchdog tick failed")
+
+    def tick(self) -> None:
+        """
+        Run one round of checks: time out inactive players and form lobbies.
+
+        Called once a second by run(); in-process load tests call it directly
+        to drive matchmaking deterministically.
+        """
+        current_time = time.time()
+        # A heartbeat timeout of 0 leaves liveness to WebSocket pings
+        if self.matchmaker_state.heartbeat_timeout > 0:
             self._remove_inactive_players(current_time)
-            self._create_games()
+        self.matchmaker_state.expire_reservations()
+        self._create_games()
 
     def _remove_inactive_players(self, current_time: float) -> None:
         """
@@ -81,9 +117,9 @@ class QueueWatchdog:
         # Find timed out players
         with self.matchmaker_state.lock:
             for player_id in list(self.matchmaker_state.matchmaking_queue.keys()):
-                last_heartbeat = self.matchmaker_state.player_last_heartbeat.get(
+                last_heartbeat = self.matchmaker_state.player_last_heartbeat[
                     player_id
-                )
+                ].last
                 time_since_heartbeat = current_time - last_heartbeat
 
                 if time_since_heartbeat > self.matchmaker_state.heartbeat_timeout:
@@ -101,7 +137,7 @@ class QueueWatchdog:
                 timeout_reply = {
                     "command": "heartbeat_timeout",
                 }
-                player_ws.send(json.dumps(timeout_reply))
+                player_ws.send(json_codec.encode(timeout_reply))
                 player_ws.close()
                 logger.debug("Timeout notice sent to player %s", player_id)
             except (ConnectionError, OSError, BrokenPipeError):
@@ -109,78 +145,131 @@ class QueueWatchdog:
 
             self.matchmaker_state.remove_player(player_id)
 
+    def _should_backfill(self, queue_size: int) -> bool:
+        """
+        Check whether the queued players should get a lobby filled up with bots.
+
+        Args:
+            queue_size (int): Number of queued players, fewer than a lobby
+
+        Returns:
+            bool: True if bots are enabled and a queued player has waited long enough
+        """
+        return (
+            self.bot_engine is not None
+            and queue_size > 0
+            and self.matchmaker_state.longest_wait() >= self.bot_backfill_after
+        )
+
     def _create_games(self) -> None:
         """
         Create new game sessions when enough players are available.
         """
         while True:
-            # Check if we have enough players for a new game
+            # Check if we have enough players for a new game, or players who
+            # have waited long enough to be matched with bots; the queue is
+            # frozen while it is handed to a new server process
             with self.matchmaker_state.lock:
-                queue_size = len(self.matchmaker_state.matchmaking_queue)
-                if queue_size < self.matchmaker_state.lobby_size:
+                if self.matchmaker_state.draining:
                     break
+                queue_size = len(self.matchmaker_state.matchmaking_queue)
+            bot_count = max(0, self.matchmaker_state.lobby_size - queue_size)
+            if bot_count and not self._should_backfill(queue_size):
+                break
 
             # Create a new game session
             game_session_uuid = str(uuid.uuid4())
 
-            # Collect players for the game
-            player_ids = []
-            player_names = []
-            player_wss = []
-            for _ in range(self.matchmaker_state.lobby_size):
-                player_id, player_name, player_ws = (
-                    self.matchmaker_state.dequeue_player()
-                )
-                if player_id:
-                    player_ids.append(player_id)
-                    player_names.append(player_name)
-                    player_wss.append(player_ws)
-
-            # Verify we have the correct number of players
-            if len(player_ids) == self.matchmaker_state.lobby_size:
-                logger.info(
-                    "Session %s: Game created with players %s",
-                    game_session_uuid,
-                    player_ids,
-                )
-
-                player_names = {
-                    player_id: player_name
-                    for player_id, player_name in zip(player_ids, player_names)
-                }
-
-                # Create game session in game server state
+            # Collect players for the game; players may have left or the queue
+            # may have started draining since it was counted
+            lobby = self.matchmaker_state.dequeue_lobby(
+                self.matchmaker_state.lobby_size - bot_count
+            )
+            if not lobby:
+                break
+            player_ids = [player_id for player_id, _, _ in lobby]
+            player_names = [player_name for _, player_name, _ in lobby]
+            player_wss = [player_ws for _, _, player_ws in lobby]
+
+            self.matchmaker_state.record_lobby_formed()
+            tracer = self.matchmaker_state.tracer
+            if tracer is not None:
+                for player_id in player_ids:
+                    tracer.mark(player_id, "lobby_formed", game_session_uuid)
+            logger.info(
+                "Session %s: Game created with players %s and %d bots",
+                game_session_uuid,
+                player_ids,
+                bot_count,
+            )
+
+            player_names = {
+                player_id: player_name
+                for player_id, player_name in zip(player_ids, player_names)
+            }
+            bot_names = {}
+            if bot_count:
+                bot_names = self.bot_engine.create_bot_ids(bot_count)
+                player_names.update(bot_names)
+
+            # Create game session in game server state; if that fails the
+            # players keep their places at the front of the queue
+            try:
                 self.game_state.create_game_session(
                     game_session_uuid,
-                    player_ids,
+                    player_ids + list(bot_names),
                     player_names,
                     self.num_tiles,
                     self.colour_selection_timeout,
                 )
+            except Exception:
+                logger.exception(
+                    "Session %s: Creating the game failed, requeueing %s",
+                    game_session_uuid,
+                    player_ids,
+                )
+                self.matchmaker_state.requeue_lobby(lobby)
+                break
+            if bot_names:
+                self.bot_engine.add_bots(
+                    self.game_state.get_game_session(game_session_uuid),
+                    list(bot_names),
+                )
 
-                # Notify players that the game has started
-                for i, player_ws in enumerate(player_wss):
-                    try:
-                        game_start_reply = {
-                            "command": "game_start",
-                            "game_session_uuid": game_session_uuid,
-                            "lobby_size": self.matchmaker_state.lobby_size,
-                            "board_size": self.num_tiles,
-                            "colour_selection_timeout": self.colour_selection_timeout,
-                        }
-                        player_ws.send(json.dumps(game_start_reply))
-                        logger.debug(
-                            "Game start notice sent to player %s", player_ids[i]
-                        )
-                    except (ConnectionError, OSError, BrokenPipeError):
-                        logger.warning(
-                            "Game start notice failed: player %s", player_ids[i]
-                        )
+            if self.carry_over_connections:
+                # Route the players' existing connections to the game server
+                # before they learn about the game, so their next message
+                # on the same WebSocket reaches the game session
+                session = self.game_state.get_game_session(game_session_uuid)
+                for player_id, player_ws in zip(player_ids, player_wss):
+                    player_ws.route = GAME_ROUTE
+                    self.game_state.register_player_websocket(
+                        session, player_id, player_ws
+                    )
+
+            # Notify players that the game has started
+            for i, player_ws in enumerate(player_wss):
+                try:
+                    game_start_reply = {
+                        "command": "game_start",
+                        "game_session_uuid": game_session_uuid,
+                        "lobby_size": self.matchmaker_state.lobby_size,
+                        "board_size": self.num_tiles,
+                        "colour_selection_timeout": self.colour_selection_timeout,
+                        "same_connection": self.carry_over_connections,
+                    }
+                    player_ws.send(json_codec.encode(game_start_reply))
+                    if tracer is not None:
+                        tracer.mark(player_ids[i], "game_start", game_session_uuid)
+                    logger.debug("Game start notice sent to player %s", player_ids[i])
+                except (ConnectionError, OSError, BrokenPipeError):
+                    logger.warning("Game start notice failed: player %s", player_ids[i])
 
 
 class GameSessionWatchdog:
     """
-    Monitors game sessions for inactive players during the colour selection phase.
+    Monitors game sessions for inactive players during the colour selection phase,
+    and evicts sessions whose lifecycle deadline has passed.
 
     Args:
         game_state (GameServerState): The game server state to monitor
@@ -208,26 +297,44 @@ class GameSessionWatchdog:
         """
         while True:
             time.sleep(1)
+            try:
+                self.tick()
+            except Exception:
+                logger.exception("Game session watchdog tick failed")
 
-            # Get current game sessions to check
-            sessions_to_check = []
-            with self.game_state.lock:
-                sessions_to_check = list(self.game_state.game_sessions.items())
+    def tick(self) -> None:
+        """
+        Run one round of checks: evict expired sessions, close rematch windows
+        and remove players who did not pick a colour in time.
 
-            for game_session_uuid, session in sessions_to_check:
-                # Only monitor sessions that haven't started yet
-                if session.game_started:
-                    continue
+        Called once a second by run(); in-process load tests call it directly.
+        """
+        self._evict_expired_sessions()
+
+        # Get current game sessions to check
+        sessions_to_check = []
+        with self.game_state.lock:
+            sessions_to_check = list(self.game_state.game_sessions.items())
+
+        for game_session_uuid, session in sessions_to_check:
+            # Ended games may still be waiting on a rematch vote
+            if session.game_ended:
+                self.game_state.close_rematch(session)
+                continue
+
+            # Only monitor sessions that haven't started yet
+            if session.game_started:
+                continue
 
-                # Check for inactive players
-                inactive_players = session.get_inactive_players()
+            # Check for inactive players
+            inactive_players = session.get_inactive_players()
 
-                if inactive_players:
-                    # Remove inactive players and handle consequences
-                    self._remove_inactive_players(session, inactive_players)
+            if inactive_players:
+                # Remove inactive players and handle consequences
+                self._remove_inactive_players(session, inactive_players)
 
-                if not session.has_enough_players(2):
-                    self._end_game_insufficient_players(game_session_uuid, session)
+            if not session.has_enough_players(2) or not session.has_human_players():
+                self._end_game_insufficient_players(game_session_uuid, session)
 
     def _remove_inactive_players(
         self, session: GameSession, inactive_players: List[str]
@@ -240,7 +347,8 @@ class GameSessionWatchdog:
         don't request colours within the timeout period.
 
         Shared Object Handling: Modifies shared game session state by removing
-        players and their associated data from the session.
+        players and their associated data from the session, and forgets their
+        connections in the GameServerState.
 
         Args:
             session (GameSession): The game session object
@@ -252,18 +360,24 @@ class GameSessionWatchdog:
             len(inactive_players),
             inactive_players,
         )
+        if self.game_state.recorder is not None:
+            self.game_state.recorder.record_event(
+                session.game_session_uuid, "inactive", {"players": inactive_players}
+            )
 
         # Notify and remove inactive players
         for player_id in inactive_players:
-            if player_id in session.player_websockets:
+            # The player's connection may close concurrently
+            player_ws = session.player_websockets.get(player_id)
+            if player_ws is not None:
+                # The disconnect handler then finds nothing left to clean up
+                self.game_state.unregister_websocket(player_ws)
                 try:
                     inactive_message = {
                         "command": "inactive_player",
                     }
-                    session.player_websockets[player_id].send(
-                        json.dumps(inactive_message)
-                    )
-                    session.player_websockets[player_id].close()
+                    player_ws.send(json_codec.encode(inactive_message))
+                    player_ws.close()
                     logger.debug("Inactive notice sent to player %s", player_id)
                 except (ConnectionError, OSError, BrokenPipeError):
                     logger.debug("Inactive notice failed: player %s", player_id)
@@ -288,23 +402,146 @@ class GameSessionWatchdog:
             game_session_uuid (str): UUID of the game session to end
             session (GameSession): The game session object to end
         """
-        logger.info(
-            "Session %s: Ending game, insufficient players",
-            game_session_uuid,
-        )
+        self.game_state.end_game_insufficient_players(session)
+
+    def _evict_expired_sessions(self) -> None:
+        """
+        Evict ended and abandoned sessions whose lifecycle deadline has passed.
+
+        Players of ended sessions have already been sent the scoreboard, so
+        their connections are left to the clients. Connections of abandoned
+        sessions are closed.
+
+        Shared Object Handling: Removes sessions from the shared GameServerState
+        and drops the session's references to tiles and WebSocket connections.
+        """
+        for session, phase in self.game_state.evict_expired_sessions():
+            if phase != PHASE_ENDED:
+                for player_id, player_ws in list(session.player_websockets.items()):
+                    try:
+                        player_ws.close()
+                    except (ConnectionError, OSError, BrokenPipeError):
+                        logger.debug(
+                            "Abandoned session close failed: player %s", player_id
+                        )
+            session.release()
+
+
+class TileLeaseWatchdog:
+    """
+    Releases tile locks whose lease has run out and tells the players.
+
+    Args:
+        game_state (GameServerState): The game server state to monitor
+    """
+
+    def __init__(self, game_state: GameServerState):
+        """
+        Initialize the tile lease watchdog.
+
+        Args:
+            game_state (GameServerState): The game server state to monitor
+        """
+        self.game_state = game_state
+
+    def run(self) -> None:
+        """
+        Main monitoring loop that runs continuously.
+
+        Sleeps until the next lease deadline in the GameServerState lease
+        scheduler, then releases every expired lock and broadcasts a pen up
+        with a timeout status to all players of the session, including the
+        player that held the lock.
+
+        Shared Object Handling: Modifies the tile locks of shared game sessions
+        through the GameServerState.
+        """
+        while True:
+            for (
+                game_session_uuid,
+                tile_index,
+                deadline,
+            ) in self.game_state.leases.wait_expired():
+                try:
+                    self._expire(game_session_uuid, tile_index, deadline)
+                except Exception:
+                    # Keep releasing the other leases, or every lock would stick
+                    logger.exception(
+                        "Session %s: Expiring tile %d lease failed",
+                        game_session_uuid,
+                        tile_index,
+                    )
+
+    def _expire(self, game_session_uuid: str, tile_index: int, deadline: float) -> None:
+        """
+        Release one tile lock if its lease is still the one that came due.
 
-        not_enough_players_message = {
-            "command": "not_enough_players",
+        Args:
+            game_session_uuid (str): Session of the tile
+            tile_index (int): Index of the tile
+            deadline (float): Deadline of the lease that came due
+        """
+        expired = self.game_state.expire_tile_lease(
+            game_session_uuid, tile_index, deadline
+        )
+        if expired is None:
+            return
+
+        session, player_id = expired
+        broadcast_message = {
+            "command": "pen_up_broadcast",
+            "index": tile_index,
+            "colour": session.player_colours.get(player_id),
+            "status": PEN_UP_TIMEOUT,
         }
+        session.broadcast_tile_message(broadcast_message, tile_index)
 
-        # Notify remaining players
-        for player_id, player_ws in session.player_websockets.items():
-            try:
-                player_ws.send(json.dumps(not_enough_players_message))
-                player_ws.close()
-                logger.debug("Insufficient players notice sent to player %s", player_id)
-            except (ConnectionError, OSError, BrokenPipeError):
-                logger.debug("Insufficient players notice failed: player %s", player_id)
 
-        # Remove the game session
-        self.game_state.remove_game_session(game_session_uuid)
+class QueueLengthWatchdog:
+    """
+    Pushes the queue length to every queued player when the queue changes.
+
+    Args:
+        matchmaker_state (MatchmakerState): The matchmaker state to watch
+    """
+
+    def __init__(self, matchmaker_state: MatchmakerState):
+        """
+        Initialize the queue length watchdog.
+
+        Args:
+            matchmaker_state (MatchmakerState): The matchmaker state to watch;
+                its queue_updates scheduler must be enabled
+        """
+        self.matchmaker_state = matchmaker_state
+        self.updates_sent = 0
+
+    def run(self) -> None:
+        """
+        Main loop that runs continuously.
+
+        Waits for the MatchmakerState update scheduler to report a change,
+        at most once per update interval, then sends one queue_length message
+        to every queued player. The snapshot also caches each player's
+        position in their HeartbeatSlot for lock-free heartbeat replies.
+
+        Socket Handling: The message is serialized and framed once and the
+        same frame is written to every connection. Sockets are written after
+        the queue lock is released, so slow clients never block enqueues or
+        heartbeats.
+
+        Shared Object Handling: Takes a snapshot of the queue length and
+        queued connections and positions under the MatchmakerState lock.
+        """
+        while True:
+            self.matchmaker_state.queue_updates.wait_due()
+            queue_length, connections = self.matchmaker_state.get_queue_snapshot()
+
+            update_message = {"command": "queue_length", "queue_length": queue_length}
+            frame = text_frame(json_codec.encode(update_message))
+            for player_ws in connections:
+                player_ws.send_prepared(frame)
+            self.updates_sent += len(connections)
+            logger.debug(
+                "Queue length %d pushed to %d players", queue_length, len(connections)
+            )